@@ -0,0 +1,81 @@
+"""Measures the time spent compiling schemas.
+
+Compiles the meta-schemas and the schemas bundled with jsonspec, the
+examples and the tests, then generated schemas which are deep, and wide.
+The validator cache is disabled, so that every schema is compiled each
+time.
+
+    python examples/bench_compile.py [repeat]
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+from jsonspec.reference.providers import SpecProvider
+from jsonspec.validators import Factory
+import json
+import glob
+import os
+import sys
+import timeit
+
+here = os.path.dirname(os.path.abspath(__file__))
+repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+draft03 = 'http://json-schema.org/draft-03/schema#'
+draft04 = 'http://json-schema.org/draft-04/schema#'
+provider = SpecProvider()
+
+
+def bundled():
+    for pattern in ('*.json', '../tests/fixtures/*.schema.json'):
+        for filename in sorted(glob.glob(os.path.join(here, pattern))):
+            with open(filename) as file:
+                yield os.path.basename(filename), None, json.load(file)
+
+    # src/jsonspec/misc/schemas/**/*.json, the examples of json-schema.org
+    # are draft03 schemas
+    misc = os.path.join(here, '../src/jsonspec/misc/schemas')
+    for pattern in ('*.json', '*/*.json'):
+        for filename in sorted(glob.glob(os.path.join(misc, pattern))):
+            name = os.path.relpath(filename, misc)
+            spec = draft04 if name.startswith('draft-04') else draft03
+            with open(filename) as file:
+                schema = json.load(file)
+            # hyper-schemas are compiled by the spec they extend
+            if 'hyper-schema' in schema.get('$schema', ''):
+                schema['$schema'] = spec
+            yield name, spec, schema
+
+
+def deep(depth):
+    schema = {'type': 'string'}
+    for i in range(depth):
+        schema = {
+            'type': 'object',
+            'properties': {'child': schema, 'name': {'enum': ['a', 'b']}},
+            'required': ['child'],
+        }
+    return schema
+
+
+def wide(width):
+    return {
+        'definitions': {
+            'item': {'type': 'integer', 'minimum': 0},
+        },
+        'properties': dict(('prop%d' % i, {
+            'anyOf': [{'$ref': '#/definitions/item'}, {'type': 'null'}],
+        }) for i in range(width)),
+    }
+
+
+dataset = list(bundled()) + [
+    ('deep 100', None, deep(100)),
+    ('deep 200', None, deep(200)),
+    ('deep 400', None, deep(400)),
+    ('wide 1000', None, wide(1000)),
+]
+
+for name, spec, schema in dataset:
+    factory = Factory(provider=provider, spec=spec, cache=False)
+    timer = timeit.Timer(lambda: factory(schema, '#'))
+    elapsed = min(timer.repeat(repeat, 1))
+    print('{:<30} {:>10.2f} ms'.format(name, elapsed * 1000))
@@ -62,6 +62,7 @@ setup(
             'move = jsonspec.cli:MoveCommand',
             'copy = jsonspec.cli:CopyCommand',
             'check = jsonspec.cli:CheckCommand',
+            'compile = jsonspec.cli:CompileCommand',
         ],
         'jsonspec.reference.contributions': [
             'spec = jsonspec.reference.providers:SpecProvider',
@@ -245,6 +245,41 @@ class CheckCommand(Command):
             raise Exception('{} is not a valid pointer'.format(args.pointer))
 
 
+class CompileCommand(Command):
+    """Generate a python module which validates documents against a schema.
+
+    examples::
+
+        %(prog)s --schema-file=schema.json --output=validator.py
+        %(prog)s --schema-json='{"type": "string"}' --output=validator.py
+        %(prog)s --schema-file=schema.json > validator.py
+    """
+
+    help = 'compile a schema into a python module'
+
+    def arguments(self, parser):
+        schema_arguments(parser)
+        parser.add_argument('-o', '--output', help='python filename, defaults to stdout', dest='output', metavar='<module>')
+
+    def run(self, args):
+        parse_schema(args)
+
+        from jsonspec.validators import load
+        from jsonspec.validators import CompilationError
+        from jsonspec.validators.codegen import generate
+
+        try:
+            source = generate(load(args.schema))
+        except CompilationError as error:
+            raise Exception('schema cannot be compiled: {}'.format(error.args[0]))  # noqa
+        if args.output:
+            with open(args.output, 'w') as file:
+                file.write(source)
+        else:
+            sys.stdout.write(source)
+        return source
+
+
 class CopyCommand(Command):
     """Copies the value at a specified location to the target location.
 
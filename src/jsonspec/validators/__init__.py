@@ -5,20 +5,25 @@
 """
 
 __all__ = ['load', 'register', 'Factory', 'Context',
-           'Validator', 'ReferenceValidator',
+           'Validator', 'ReferenceValidator', 'LazyValidator',
+           'ValidationContext', 'ValidationMemo',
+           'ValidatorCache', 'memory_report',
            'Draft03Validator', 'Draft04Validator',
            'CompilationError', 'ReferenceError', 'ValidationError']
 
-from .bases import Validator, ReferenceValidator
+from .bases import Validator, ReferenceValidator, LazyValidator
+from .bases import ValidationContext, ValidationMemo
+from .bases import memory_report
 from .exceptions import CompilationError, ReferenceError, ValidationError
-from .factorize import register, Factory, Context
+from .factorize import register, Factory, Context, ValidatorCache
 from . import draft04  # noqa
 from . import draft03  # noqa
 from .draft03 import Draft03Validator  # noqa
 from .draft04 import Draft04Validator  # noqa
 
 
-def load(schema, uri=None, spec=None, provider=None):
+def load(schema, uri=None, spec=None, provider=None, lazy=False,
+         optimize=False, cache=False):
     """Scaffold a validator against a schema.
 
     :param schema: the schema to compile into a Validator
@@ -32,6 +37,14 @@ def load(schema, uri=None, spec=None, provider=None):
     :param provider: the other schemas, in case of cross
                      referencing
     :type provider: Mapping, Provider...
+    :param lazy: compile subschemas the first time they are validated
+    :type lazy: bool
+    :param optimize: simplify the schema before compiling it
+    :type optimize: bool
+    :param cache: reuse the validator of an equal schema loaded before,
+                  or a given :class:`ValidatorCache`
+    :type cache: bool, ValidatorCache
     """
-    factory = Factory(provider, spec)
+    factory = Factory(provider, spec, cache=cache, lazy=lazy,
+                      optimize=optimize)
     return factory(schema, uri or '#')
@@ -6,23 +6,183 @@
 
 from __future__ import absolute_import
 
-__all__ = ['ValidationError', 'Validator', 'ReferenceValidator']
+__all__ = ['ValidationError', 'Validator', 'ReferenceValidator',
+           'LazyValidator', 'ValidationContext', 'memory_report']
 
 import logging
+import sys
+from threading import RLock
 from abc import abstractmethod, ABCMeta
 from six import add_metaclass
 from jsonspec.pointer import DocumentPointer
 from .exceptions import ValidationError
+from .pointer_util import pointer_join
+from .util import Numbering
 
 
 logger = logging.getLogger(__name__)
 
 
+class ValidationContext(object):
+    """
+    Carries the state of one validation.
+
+    Compiled validators are shared between validations, and threads.
+    Everything that a validation accumulates belongs to its context.
+
+    :ivar errors: the errors found so far
+    :ivar path: the tokens leading from the evaluated pointer to the
+                current instance. Pointers are only joined when they are
+                reported.
+    :ivar fail_fast: stop at the first failure, without collecting errors
+    :ivar max_errors: stop once this many errors are collected
+    :ivar defaults: inject the defaults of missing properties
+    :ivar memo: the subtrees proven valid so far, if any
+    :ivar failed: tells if validation failed
+    :ivar stopped: tells if validation must stop right now
+    """
+
+    def __init__(self, fail_fast=False, defaults=True, max_errors=None,
+                 memo=None):
+        self.errors = []
+        self.path = []
+        self.fail_fast = fail_fast
+        self.max_errors = max_errors
+        self.defaults = defaults
+        self.memo = memo
+        self.failed = False
+        self.stopped = False
+
+    def branch(self):
+        """
+        Returns a context for evaluating a subschema which errors
+        must not leak into this one (anyOf, oneOf, not...).
+
+        Only the verdict of branches matters, so they stop at their first
+        failure.
+        """
+        return ValidationContext(fail_fast=True,
+                                 defaults=self.defaults,
+                                 memo=self.memo)
+
+    def fail(self, reason, obj, pointer=None):
+        """
+        Records a failure.
+
+        No error is built in fail fast mode, nor once validation must stop.
+        Failures without pointer are reported at the root, wherever they
+        happen.
+
+        :return: the recorded error, if any
+        """
+        self.failed = True
+        if self.stopped:
+            return None
+        if self.fail_fast:
+            self.stopped = True
+            return None
+        if pointer is None:
+            pointer = pointer_join(None)
+        else:
+            pointer = pointer_join(pointer, *self.path)
+        error = ValidationError(reason, obj, pointer)
+        self.add(error)
+        return error
+
+    def locate(self, pointer):
+        """
+        Returns the pointer of the current instance.
+        """
+        if self.path:
+            return pointer_join(pointer, *self.path)
+        return pointer
+
+    def evaluate(self, validator, obj, pointer):
+        """
+        Evaluates validator at pointer, regardless of the current path.
+        """
+        if not self.path:
+            return validator.evaluate(obj, pointer, self)
+        path, self.path = self.path, []
+        try:
+            return validator.evaluate(obj, pointer, self)
+        finally:
+            self.path = path
+
+    def add(self, error):
+        """
+        Records an error raised by a validator.
+
+        Errors are dropped once validation must stop, so that there are
+        never more than max_errors.
+        """
+        self.failed = True
+        if self.stopped:
+            return
+        if self.fail_fast:
+            self.stopped = True
+            return
+        self.errors.append(error)
+        if self.max_errors and len(self.errors) >= self.max_errors:
+            self.stopped = True
+
+
+class ValidationMemo(object):
+    """
+    Remembers the subtrees proven valid during one validation.
+
+    Subtrees are numbered by structure, so that a subtree repeated in a
+    document, or shared by identity, is validated once per validator. Only
+    the subtrees which were validated without injecting any default are
+    remembered, so that skipping them gives the same result.
+
+    :ivar maxsize: the maximum number of subtrees remembered
+    :ivar valid: the validators and numbers of the subtrees proven valid
+    :ivar numbering: numbers of the subtrees
+    :ivar hits: how many subtrees were skipped
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.valid = set()
+        self.numbering = Numbering()
+        self.hits = 0
+
+    def evaluate(self, validator, evaluate, obj, pointer, context):
+        """
+        Evaluates obj with evaluate, unless validator proved it valid
+        already.
+        """
+        if not isinstance(obj, (dict, list)):
+            return evaluate(obj, pointer, context)
+        numbered = self.numbering.number(obj)
+        if numbered is None:
+            return evaluate(obj, pointer, context)
+
+        key = validator, numbered[0]
+        if key in self.valid:
+            self.hits += 1
+            return obj
+        errors, failed = len(context.errors), context.failed
+        validated = evaluate(obj, pointer, context)
+        if validated is obj and len(context.errors) == errors \
+                and context.failed == failed \
+                and len(self.valid) < self.maxsize:
+            self.valid.add(key)
+        return validated
+
+
 @add_metaclass(ABCMeta)
 class Validator(object):
     """
     The mother of Validators.
+
+    It declares no slot, so that the compact validators can do without a
+    ``__dict__``.
     """
+
+    __slots__ = ()
+
     #: indicates current uri
     uri = None
 
@@ -52,6 +212,61 @@ class Validator(object):
         """
         pass
 
+    def evaluate(self, obj, pointer, context):
+        """
+        Validate object within a running validation.
+
+        Errors are accumulated into context instead of being raised.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        :param context: the current validation context
+        :type context: ValidationContext
+        :return: the validated object
+        """
+        try:
+            return self.validate(obj, context.locate(pointer))
+        except ValidationError as error:
+            context.add(error)
+            return obj
+
+    def is_valid(self, obj, pointer=None, memo=None):
+        """
+        Tells if object is valid.
+
+        Validation stops at the first failure, and no error is reported.
+        Defaults are not injected, so that object is checked as is.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        :param memo: remember up to this many subtrees proven valid, and
+                     skip them when they repeat
+        :rtype: bool
+        """
+        memo = ValidationMemo(memo) if memo else None
+        context = ValidationContext(fail_fast=True, defaults=False, memo=memo)
+        self.evaluate(obj, pointer or '#', context)
+        return not context.failed
+
+    def iter_errors(self, obj, pointer=None, max_errors=None):
+        """
+        Yields the errors of object, as soon as they are found.
+
+        Validation starts with the first iteration, and stops after
+        max_errors errors, or when iteration stops. Draft03 and draft04
+        validators are walked by :mod:`~jsonspec.validators.iterative`,
+        which suspends validation between subschemas. Other validators
+        are validated at once.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        :param max_errors: the maximum number of errors to look for
+        """
+        from .iterative import Walker, stream
+        context = ValidationContext(max_errors=max_errors)
+        frame = Walker().walk(self, obj, pointer or '#', context)
+        return stream(frame, context)
+
     def __call__(self, obj, pointer=None):
         """shortcut for validate()"""
         return self.validate(obj, pointer)
@@ -72,6 +287,9 @@ class ReferenceValidator(Validator):
     >>>     'longitude': 1.2345
     >>> })
     """
+
+    __slots__ = ('pointer', 'context', 'uri', '_validator')
+
     def __init__(self, pointer, context):
         super(ReferenceValidator, self).__init__()
         self.pointer = DocumentPointer(pointer)
@@ -81,7 +299,13 @@ class ReferenceValidator(Validator):
     @property
     def validator(self):
         if not hasattr(self, '_validator'):
-            self._validator = self.context.resolve(self.pointer)
+            # a reference to a reference is followed up to its target
+            validator, seen = self.context.resolve(self.pointer), set([self])
+            while isinstance(validator, ReferenceValidator) \
+                    and validator not in seen:
+                seen.add(validator)
+                validator = validator.context.resolve(validator.pointer)
+            self._validator = validator
         return self._validator
 
     def has_default(self):
@@ -94,11 +318,195 @@ class ReferenceValidator(Validator):
     def is_optional(self):
         return self.validator.is_optional()
 
-    def validate(self, obj, pointer=None):
+    def validate(self, obj, pointer=None, max_errors=None, memo=None):
         """
         Validate object against validator.
 
         :param obj: the object to validate
         :param pointer: the object pointer
+        :param max_errors: stop validation after this many errors
+        :param memo: remember up to this many subtrees proven valid
+        """
+        options = {}
+        if max_errors is not None:
+            options['max_errors'] = max_errors
+        if memo is not None:
+            options['memo'] = memo
+        return self.validator.validate(obj, pointer, **options)
+
+    def evaluate(self, obj, pointer, context):
+        return self.validator.evaluate(obj, pointer, context)
+
+
+#: serializes the compilation of lazy validators
+compiling = RLock()
+
+
+class LazyValidator(Validator):
+    """
+    Compiles a subschema the first time it is needed.
+
+    The subschema is compiled once, whatever the number of threads
+    validating against it. Its own subschemas are lazy too, so that only
+    the parts of a schema reached by validation are ever compiled.
+
+    :ivar compiler: the compiler of the subschema
+    :ivar schema: the subschema, until it is compiled
+    :ivar pointer: the pointer of the subschema
+    :ivar scope: the resolution scope of the subschema
+    :ivar context: the context object
+    :ivar validator: return the compiled validator
+    """
+
+    __slots__ = ('compiler', 'schema', 'pointer', 'scope', 'context',
+                 '_validator')
+
+    def __init__(self, compiler, schema, pointer, scope, context):
+        self.compiler = compiler
+        self.schema = schema
+        self.pointer = pointer
+        self.scope = scope
+        self.context = context
+
+    @property
+    def validator(self):
+        try:
+            return self._validator
+        except AttributeError:
+            pass
+        with compiling:
+            if not hasattr(self, '_validator'):
+                self._validator = self.context.subschema(self.compiler,
+                                                         self.schema,
+                                                         self.pointer,
+                                                         self.scope,
+                                                         lazy=False)
+                self.schema = None
+        return self._validator
+
+    @property
+    def uri(self):
+        return self.validator.uri
+
+    def peek(self, name):
+        """
+        Returns the hint of the compiler about the subschema, if it is not
+        compiled yet.
+
+        Objects ask all their properties for defaults and optionality,
+        including the missing ones, which compilers can tell from the
+        subschema.
         """
-        return self.validator.validate(obj, pointer)
+        schema = self.schema
+        hint = getattr(self.compiler, name, None)
+        if schema is None or hint is None:
+            return None
+        return hint(schema)
+
+    def has_default(self):
+        hint = self.peek('has_default')
+        if hint is not None:
+            return hint
+        return self.validator.has_default()
+
+    @property
+    def default(self):
+        return self.validator.default
+
+    def is_optional(self):
+        hint = self.peek('is_optional')
+        if hint is not None:
+            return hint
+        return self.validator.is_optional()
+
+    def validate(self, obj, pointer=None, max_errors=None, memo=None):
+        """
+        Validate object against validator.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        :param max_errors: stop validation after this many errors
+        :param memo: remember up to this many subtrees proven valid
+        """
+        options = {}
+        if max_errors is not None:
+            options['max_errors'] = max_errors
+        if memo is not None:
+            options['memo'] = memo
+        return self.validator.validate(obj, pointer, **options)
+
+    def evaluate(self, obj, pointer, context):
+        return self.validator.evaluate(obj, pointer, context)
+
+
+def memory_report(validator):
+    """
+    Reports the approximate memory held by a compiled validator.
+
+    Every validator reachable from validator is counted, with the values of
+    its slots or ``__dict__``. Objects shared by several validators, like
+    matchers, sentinels and the validators of identical subschemas, are
+    counted once, and ``reused`` tells how many times a validator was
+    reached again. Formats and the compilation
+    context of references belong to the process, and are left out.
+    References which are not resolved yet are not followed.
+
+    :param validator: a validator returned by
+                      :func:`~jsonspec.validators.load`
+    :return: the number of validators, their bytes, bytes per validator,
+             and how many times validators were reused
+    :rtype: dict
+    """
+    seen = set()
+    nodes = nbytes = reused = 0
+    pending = [validator]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            if isinstance(obj, Validator):
+                reused += 1
+            continue
+        if isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        nbytes += sys.getsizeof(obj)
+        if hasattr(obj, '__dict__'):
+            nbytes += sys.getsizeof(obj.__dict__)
+        if isinstance(obj, Validator):
+            nodes += 1
+            pending.extend(slot_values(obj))
+        elif isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif type(obj).__module__.startswith('jsonspec.validators'):
+            pending.extend(slot_values(obj))
+    return {
+        'nodes': nodes,
+        'bytes': nbytes,
+        'bytes_per_node': nbytes // nodes if nodes else 0,
+        'reused': reused,
+    }
+
+
+#: attributes left out of memory reports
+private = ('context', 'formats', 'schema')
+
+
+def slot_values(obj):
+    """Returns the attributes of obj, from its slots and ``__dict__``."""
+    values = []
+    if hasattr(obj, '__dict__'):
+        values.extend(value for name, value in obj.__dict__.items()
+                      if name not in private)
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name in private or name.startswith('__'):
+                continue
+            if hasattr(obj, name):
+                values.append(getattr(obj, name))
+    return values
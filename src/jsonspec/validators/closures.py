@@ -0,0 +1,610 @@
+"""
+    jsonspec.validators.closures
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Turns compiled draft04 validators into chains of closures.
+
+    Every schema node becomes a function that only holds the checks of the
+    keywords the schema actually declares, grouped by the kind of instance
+    they apply to. The kind of an instance is resolved once per Python type.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['build', 'ClosureValidator']
+
+import logging
+from copy import deepcopy
+from six import string_types
+from .bases import LazyValidator, ReferenceValidator, Validator
+from .draft04 import Draft04Validator, format_aliases
+from .draft04 import number_types, sequence_types
+from .exceptions import ValidationError
+from .pointer_util import pointer_join
+from .util import KeyMatcher, has_duplicates
+
+logger = logging.getLogger(__name__)
+
+#: kind of instances, by python type
+kinds = {}
+
+
+def kind_of(obj):
+    """Returns the kind of obj, which selects the checks to apply.
+
+    :param obj: the instance to inspect
+    :return: one of 'array', 'number', 'object', 'string' or None
+    """
+    cls = type(obj)
+    try:
+        return kinds[cls]
+    except KeyError:
+        pass
+    if isinstance(obj, sequence_types):
+        kind = 'array'
+    elif isinstance(obj, number_types) and not isinstance(obj, bool):
+        kind = 'number'
+    elif isinstance(obj, dict):
+        kind = 'object'
+    elif isinstance(obj, string_types):
+        kind = 'string'
+    else:
+        kind = None
+    kinds[cls] = kind
+    return kind
+
+
+def children(validator):
+    """Yields the direct subvalidators of a draft04 validator."""
+    attrs = validator.attrs
+    for name in ('additional_items', 'additional_properties', 'not'):
+        if isinstance(attrs.get(name), Validator):
+            yield attrs[name]
+    for name in ('all_of', 'any_of', 'one_of'):
+        for subvalidator in attrs.get(name, []):
+            yield subvalidator
+    items = attrs.get('items')
+    if isinstance(items, Validator):
+        yield items
+    elif isinstance(items, (list, tuple)):
+        for subvalidator in items:
+            yield subvalidator
+    for name in ('properties', 'pattern_properties', 'dependencies'):
+        for subvalidator in attrs.get(name, {}).values():
+            if isinstance(subvalidator, Validator):
+                yield subvalidator
+
+
+def injects(validator, seen=None):
+    """Tells if validator may inject defaults into the instance.
+
+    Engines copy instances only for the subschemas that may alter them
+    and which results are discarded (not, oneOf...).
+    """
+    seen = set() if seen is None else seen
+    while isinstance(validator, LazyValidator):
+        validator = validator.validator
+    if isinstance(validator, ReferenceValidator):
+        if validator.uri in seen:
+            return False
+        seen.add(validator.uri)
+        try:
+            validator = validator.validator
+        except Exception:
+            return True
+    if not isinstance(validator, Draft04Validator):
+        return True
+    if id(validator) in seen:
+        return False
+    seen.add(id(validator))
+
+    for subvalidator in validator.attrs['properties'].values():
+        if isinstance(subvalidator, ReferenceValidator):
+            try:
+                if subvalidator.has_default():
+                    return True
+            except Exception:
+                return True
+        elif subvalidator.has_default():
+            return True
+    for subvalidator in children(validator):
+        if injects(subvalidator, seen):
+            return True
+    return False
+
+
+def fail(errors, reason, obj, pointer=None):
+    errors.append(ValidationError(reason, obj, pointer_join(pointer)))
+
+
+class Builder(object):
+    """
+    Builds the closures of a validator graph.
+
+    Closures are called with an instance, its pointer and a list which
+    collects their errors, and return the validated instance. Branches
+    (not, anyOf, oneOf) pass their own list, and never raise.
+
+    :ivar nodes: closures of draft04 validators, by identity
+    :ivar references: closures of references, by uri
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.references = {}
+
+    def build(self, validator):
+        while isinstance(validator, LazyValidator):
+            validator = validator.validator
+        if isinstance(validator, ReferenceValidator):
+            return self.reference(validator)
+        if not isinstance(validator, Draft04Validator):
+            logger.debug('%r is not a draft04 validator', validator)
+            return self.foreign(validator)
+
+        key = id(validator)
+        if key not in self.nodes:
+            self.nodes[key] = validator, self.node(validator)
+        return self.nodes[key][1]
+
+    def foreign(self, validator):
+        validate = validator.validate
+
+        def foreign(obj, pointer, errors):
+            try:
+                return validate(obj, pointer)
+            except ValidationError as error:
+                errors.append(error)
+            return obj
+        return foreign
+
+    def reference(self, validator):
+        uri = validator.uri
+        if uri in self.references:
+            return self.references[uri]
+
+        resolved = []
+
+        def reference(obj, pointer, errors):
+            if not resolved:
+                resolved.append(self.build(validator.validator))
+            return resolved[0](obj, pointer, errors)
+        self.references[uri] = reference
+        return reference
+
+    def node(self, validator):
+        attrs = validator.attrs
+        common = []
+        for name in ('enum', 'type', 'not', 'all_of', 'any_of', 'one_of'):
+            if name in attrs:
+                common.append(getattr(self, 'check_' + name)(validator))
+
+        checks = {
+            'array': ('items', 'max_items', 'min_items', 'unique_items'),
+            'number': ('maximum', 'minimum', 'multiple_of'),
+            'object': ('required', 'max_properties', 'min_properties',
+                       'dependencies', 'properties', 'default_properties'),
+            'string': ('max_length', 'min_length', 'pattern', 'format'),
+        }
+        dispatch = {}
+        for kind, names in checks.items():
+            compiled = []
+            for name in names:
+                check = getattr(self, 'check_' + name)(validator)
+                if check:
+                    compiled.append(check)
+            if compiled:
+                dispatch[kind] = tuple(compiled)
+        common = tuple(common)
+
+        def node(obj, pointer, errors):
+            for check in common:
+                obj = check(obj, pointer, errors)
+            for check in dispatch.get(kind_of(obj), ()):
+                obj = check(obj, pointer, errors)
+            return obj
+        return node
+
+    def check_enum(self, validator):
+        enum = validator.attrs['enum']
+
+        def check(obj, pointer, errors):
+            if obj not in enum:
+                fail(errors, 'Forbidden value', obj, pointer)
+            return obj
+        return check
+
+    def check_type(self, validator):
+        matches = validator.type_matcher.matches
+
+        def check(obj, pointer, errors):
+            if not matches(obj):
+                fail(errors, 'Wrong type', obj, pointer)
+            return obj
+        return check
+
+    def check_not(self, validator):
+        subvalidator = validator.attrs['not']
+        node = self.build(subvalidator)
+        copy = injects(subvalidator)
+
+        def check(obj, pointer, errors):
+            branch = []
+            node(deepcopy(obj) if copy else obj, '#', branch)
+            if not branch:
+                fail(errors, 'Forbidden value', obj, pointer)
+            return obj
+        return check
+
+    def check_all_of(self, validator):
+        nodes = [self.build(v) for v in validator.attrs['all_of']]
+
+        def check(obj, pointer, errors):
+            for node in nodes:
+                obj = node(obj, '#', errors)
+            return obj
+        return check
+
+    def check_any_of(self, validator):
+        subvalidators = validator.attrs['any_of']
+        nodes = [self.build(v) for v in subvalidators]
+        copy = any(injects(v) for v in subvalidators)
+
+        select = validator.branch_indexes['any_of'].select
+
+        def check(obj, pointer, errors):
+            for index in select(obj):
+                branch = []
+                validated_obj = nodes[index](deepcopy(obj) if copy else obj, '#', branch)  # noqa
+                if not branch:
+                    return validated_obj
+            fail(errors, 'Not in any_of', obj, pointer)
+            return obj
+        return check
+
+    def check_one_of(self, validator):
+        subvalidators = validator.attrs['one_of']
+        nodes = [self.build(v) for v in subvalidators]
+        copy = any(injects(v) for v in subvalidators)
+
+        select = validator.branch_indexes['one_of'].select
+
+        def check(obj, pointer, errors):
+            validated, validated_obj = 0, obj
+            for index in select(obj):
+                branch = []
+                result = nodes[index](deepcopy(obj) if copy else obj, '#', branch)  # noqa
+                if not branch:
+                    validated_obj = result
+                    validated += 1
+                    if validated > 1:
+                        break
+            if validated == 1:
+                return validated_obj
+            if not validated:
+                fail(errors, 'Validates noone', obj)
+            else:
+                fail(errors, 'Validates more than once', obj)
+            return obj
+        return check
+
+    def check_items(self, validator):
+        if 'items' not in validator.attrs:
+            return
+        items = validator.attrs['items']
+        if isinstance(items, Validator):
+            node = self.build(items)
+
+            def check(obj, pointer, errors):
+                for index, element in enumerate(obj):
+                    obj[index] = node(element, pointer_join(pointer, index), errors)  # noqa
+                return obj
+            return check
+
+        nodes = [self.build(v) for v in items]
+        additionals = validator.attrs['additional_items']
+        if isinstance(additionals, Validator):
+            additionals = self.build(additionals)
+        uri = validator.uri
+
+        def check(obj, pointer, errors):
+            for index, element in enumerate(obj):
+                if index < len(nodes):
+                    node = nodes[index]
+                elif additionals is True:
+                    return obj
+                elif additionals is False:
+                    fail(errors, 'Forbidden value', obj, pointer_join(uri, index))  # noqa
+                    continue
+                else:
+                    node = additionals
+                obj[index] = node(element, pointer_join(pointer, index), errors)  # noqa
+            return obj
+        return check
+
+    def check_max_items(self, validator):
+        if 'max_items' not in validator.attrs:
+            return
+        limit = validator.attrs['max_items']
+
+        def check(obj, pointer, errors):
+            if len(obj) > limit:
+                fail(errors, 'Too many elements', obj, pointer)
+            return obj
+        return check
+
+    def check_min_items(self, validator):
+        if 'min_items' not in validator.attrs:
+            return
+        limit = validator.attrs['min_items']
+
+        def check(obj, pointer, errors):
+            if len(obj) < limit:
+                fail(errors, 'Too few elements', obj, pointer)
+            return obj
+        return check
+
+    def check_unique_items(self, validator):
+        if not validator.attrs.get('unique_items'):
+            return
+
+        def check(obj, pointer, errors):
+            if has_duplicates(obj):
+                fail(errors, 'Elements must be unique', obj, pointer)
+            return obj
+        return check
+
+    def check_maximum(self, validator):
+        if 'maximum' not in validator.attrs:
+            return
+        limit = validator.attrs['maximum']
+        exclusive = validator.attrs['exclusive_maximum']
+
+        def check(obj, pointer, errors):
+            if not (obj < limit or (not exclusive and obj == limit)):
+                fail(errors, 'Exceeded maximum', obj, pointer)
+            return obj
+        return check
+
+    def check_minimum(self, validator):
+        if 'minimum' not in validator.attrs:
+            return
+        limit = validator.attrs['minimum']
+        exclusive = validator.attrs['exclusive_minimum']
+
+        def check(obj, pointer, errors):
+            if not (obj > limit or (not exclusive and obj == limit)):
+                fail(errors, 'Too small', obj, pointer)
+            return obj
+        return check
+
+    def check_multiple_of(self, validator):
+        if 'multiple_of' not in validator.attrs:
+            return
+        divides = validator.attrs['multiple_of'].divides
+
+        def check(obj, pointer, errors):
+            if not divides(obj):
+                fail(errors, 'Forbidden value', obj, pointer)
+            return obj
+        return check
+
+    def check_required(self, validator):
+        if 'required' not in validator.attrs:
+            return
+        required = validator.attrs['required']
+
+        def check(obj, pointer, errors):
+            for name in required:
+                if name not in obj:
+                    fail(errors, 'Missing property', obj, pointer)
+            return obj
+        return check
+
+    def check_max_properties(self, validator):
+        if 'max_properties' not in validator.attrs:
+            return
+        limit = validator.attrs['max_properties']
+
+        def check(obj, pointer, errors):
+            if len(obj) > limit:
+                fail(errors, 'Too many properties', obj, pointer)
+            return obj
+        return check
+
+    def check_min_properties(self, validator):
+        if 'min_properties' not in validator.attrs:
+            return
+        limit = validator.attrs['min_properties']
+
+        def check(obj, pointer, errors):
+            if len(obj) < limit:
+                fail(errors, 'Too few properties', obj, pointer)
+            return obj
+        return check
+
+    def check_dependencies(self, validator):
+        if 'dependencies' not in validator.attrs:
+            return
+        dependencies = []
+        for key, value in validator.attrs['dependencies'].items():
+            if isinstance(value, Validator):
+                value = self.build(value), injects(value)
+            else:
+                value = set(value)
+            dependencies.append((key, value))
+
+        def check(obj, pointer, errors):
+            for key, value in dependencies:
+                if key not in obj:
+                    continue
+                if isinstance(value, set):
+                    for name in value.difference(obj):
+                        fail(errors, 'Missing property', obj, pointer)
+                else:
+                    node, copy = value
+                    node(deepcopy(obj) if copy else obj, '#', errors)
+            return obj
+        return check
+
+    def check_properties(self, validator):
+        attrs = validator.attrs
+        properties = [(name, self.build(v))
+                      for name, v in attrs['properties'].items()]
+        patterns = KeyMatcher((regex, self.build(v))
+                              for regex, v in attrs['pattern_properties'].items())  # noqa
+        additionals = attrs['additional_properties']
+        if isinstance(additionals, Validator):
+            additionals = self.build(additionals)
+        if not properties and not patterns and additionals is True:
+            return
+
+        def check(obj, pointer, errors):
+            if not obj:
+                return obj
+            pending = set(obj)
+            for name, node in properties:
+                if name in obj:
+                    pending.discard(name)
+                    obj[name] = node(obj[name], pointer_join(pointer, name), errors)  # noqa
+            if patterns:
+                for name in list(obj):
+                    nodes = patterns(name)
+                    if nodes:
+                        pending.discard(name)
+                    for node in nodes:
+                        obj[name] = node(obj[name], pointer_join(pointer, name), errors)  # noqa
+            if not pending or additionals is True:
+                return obj
+            if additionals is False:
+                fail(errors, 'Forbidden additional properties', obj, pointer)
+                return obj
+            for name in sorted(pending):
+                obj[name] = additionals(obj[name], pointer_join(pointer, name), errors)  # noqa
+            return obj
+        return check
+
+    def check_default_properties(self, validator):
+        defaults, references = [], []
+        for name, subvalidator in validator.attrs['properties'].items():
+            if isinstance(subvalidator, ReferenceValidator):
+                references.append((name, subvalidator))
+            elif subvalidator.has_default():
+                defaults.append((name, subvalidator.default))
+        if not defaults and not references:
+            return
+
+        def check(obj, pointer, errors):
+            for name, default in defaults:
+                if name not in obj:
+                    obj[name] = deepcopy(default)
+            for name, subvalidator in references:
+                if name not in obj and subvalidator.has_default():
+                    obj[name] = deepcopy(subvalidator.default)
+            return obj
+        return check
+
+    def check_max_length(self, validator):
+        if 'max_length' not in validator.attrs:
+            return
+        limit = validator.attrs['max_length']
+
+        def check(obj, pointer, errors):
+            if len(obj) > limit:
+                fail(errors, 'Too long', obj, pointer)
+            return obj
+        return check
+
+    def check_min_length(self, validator):
+        if 'min_length' not in validator.attrs:
+            return
+        limit = validator.attrs['min_length']
+
+        def check(obj, pointer, errors):
+            if len(obj) < limit:
+                fail(errors, 'Too short', obj, pointer)
+            return obj
+        return check
+
+    def check_pattern(self, validator):
+        if 'pattern' not in validator.attrs:
+            return
+        regex = validator.attrs['pattern']
+
+        def check(obj, pointer, errors):
+            if not regex.search(obj):
+                fail(errors, 'Forbidden value', obj, pointer)
+            return obj
+        return check
+
+    def check_format(self, validator):
+        if 'format' not in validator.attrs:
+            return
+        name = validator.attrs['format']
+        func = validator.formats[format_aliases.get(name, name)]
+
+        def check(obj, pointer, errors):
+            try:
+                return func(obj)
+            except ValidationError as error:
+                logger.error(error)
+                fail(errors, 'Forbidden value', obj, pointer)
+            return obj
+        return check
+
+
+class ClosureValidator(Validator):
+    """
+    Validates against the closures built from a draft04 validator.
+
+    :ivar validator: the compiled validator
+    :ivar node: the closure of the root schema
+    :ivar copy: tells if instances must be copied before validation
+
+    >>> validator = ClosureValidator(load({'minLength': 4}))
+    >>> assert validator('this is sparta')
+    """
+
+    def __init__(self, validator):
+        super(ClosureValidator, self).__init__()
+        self.validator = validator
+        self.uri = validator.uri
+        self.node = Builder().build(validator)
+        self.copy = injects(validator)
+
+    def has_default(self):
+        return self.validator.has_default()
+
+    @property
+    def default(self):
+        return self.validator.default
+
+    def is_optional(self):
+        return self.validator.is_optional()
+
+    def validate(self, obj, pointer=None):
+        """
+        Validate object against validator.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        """
+        if self.copy:
+            obj = deepcopy(obj)
+        errors = []
+        obj = self.node(obj, pointer or '#', errors)
+        if errors:
+            raise ValidationError('multiple errors', obj, errors=errors)
+        return obj
+
+
+def build(validator):
+    """Builds the closures of a compiled validator.
+
+    :param validator: a validator returned by
+                      :func:`~jsonspec.validators.load`
+    :type validator: Validator
+    :return: a validator which validates the same documents
+    :rtype: ClosureValidator
+    """
+    return ClosureValidator(validator)
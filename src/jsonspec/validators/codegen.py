@@ -0,0 +1,493 @@
+"""
+    jsonspec.validators.codegen
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Generates python modules from compiled draft04 validators.
+
+    Every schema node becomes a function made of straight-line checks,
+    with the ``properties`` loops inlined and the keyword values emitted
+    as module constants. References are resolved at generation time.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['generate']
+
+import logging
+from contextlib import contextmanager
+from decimal import Decimal
+from six import integer_types, string_types
+from .bases import LazyValidator, ReferenceValidator, Validator
+from .closures import injects
+from .draft04 import Draft04Validator, format_aliases
+from .exceptions import CompilationError
+
+logger = logging.getLogger(__name__)
+
+HEADER = '''"""
+    Validates documents against {uri!r}.
+
+    Generated by jsonspec, do not edit.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['validate']
+
+import re
+from copy import deepcopy
+from decimal import Decimal
+from six import integer_types, string_types
+from jsonspec.validators.exceptions import CompilationError, ValidationError
+from jsonspec.validators.formats import FormatRegistry
+from jsonspec.validators.pointer_util import pointer_join
+from jsonspec.validators.util import Divisor, KeyMatcher, ValueSet, has_duplicates  # noqa
+
+number_types = integer_types + (float, Decimal)
+formats = FormatRegistry()
+'''
+
+FOOTER = '''
+
+def validate(obj, pointer=None):
+    """
+    Validate object against the schema.
+
+    :param obj: the object to validate
+    :param pointer: the object pointer
+    """
+    errors = []
+    obj = {name}({copy}, pointer or '#', errors)
+    if errors:
+        raise ValidationError('multiple errors', obj, errors=errors)
+    return obj
+'''
+
+UNRESOLVED = '''
+
+def {name}(obj, pointer, errors):
+    raise CompilationError('cannot resolve {{}}'.format({uri!r}), obj)
+'''
+
+#: type names of draft04, with their python expression
+type_tests = {
+    'array': 'isinstance(obj, (list, set, tuple))',
+    'boolean': 'isinstance(obj, bool)',
+    'integer': '(isinstance(obj, integer_types) and not isinstance(obj, bool))',  # noqa
+    'number': '(isinstance(obj, number_types) and not isinstance(obj, bool))',
+    'null': 'obj is None',
+    'object': 'isinstance(obj, dict)',
+    'string': 'isinstance(obj, string_types)',
+}
+
+#: scalars which does not need to be copied
+immutable_types = integer_types + string_types + (float, Decimal, type(None))
+
+
+class Writer(object):
+    """Accumulates indented lines of code."""
+
+    def __init__(self, depth=0):
+        self.lines = []
+        self.depth = depth
+
+    def __call__(self, line):
+        self.lines.append('    ' * self.depth + line)
+
+    def fail(self, reason, obj='obj', pointer='pointer_join(pointer)'):
+        self('errors.append(ValidationError({!r}, {}, {}))'.format(reason, obj, pointer))  # noqa
+
+    @contextmanager
+    def indent(self):
+        self.depth += 1
+        yield
+        self.depth -= 1
+
+
+class Generator(object):
+    """
+    Generates the source of a validator graph.
+
+    :ivar names: function names of draft04 validators, by identity
+    :ivar references: function names of references, by uri
+    :ivar constants: source of module constants
+    :ivar functions: source of functions
+    :ivar matchers: source of the patternProperties matchers, which refer
+                    to functions
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.references = {}
+        self.pending = []
+        self.constants = []
+        self.functions = []
+        self.matchers = []
+
+    def __call__(self, validator):
+        header = HEADER.format(uri=validator.uri)
+        root = self.name(validator)
+        while self.pending:
+            node, name = self.pending.pop(0)
+            self.functions.append(self.function(node, name))
+        matchers = ['\n\n' + '\n'.join(self.matchers)] if self.matchers else []  # noqa
+        return '\n'.join([header] +
+                         self.constants +
+                         self.functions +
+                         matchers +
+                         [FOOTER.format(name=root,
+                                        copy=self.copy([validator]))])
+
+    def name(self, validator):
+        while isinstance(validator, LazyValidator):
+            validator = validator.validator
+        if isinstance(validator, ReferenceValidator):
+            uri = validator.uri
+            if uri not in self.references:
+                self.references[uri] = None
+                try:
+                    target = validator.validator
+                except Exception as error:
+                    logger.warning('cannot resolve %s: %r', uri, error)
+                    self.references[uri] = self.unresolved(uri)
+                else:
+                    self.references[uri] = self.name(target)
+            elif self.references[uri] is None:
+                raise CompilationError('circular reference', uri)
+            return self.references[uri]
+
+        if not isinstance(validator, Draft04Validator):
+            raise CompilationError('cannot generate {!r}'.format(validator),
+                                   validator.uri)
+        key = id(validator)
+        if key not in self.names:
+            name = 'validate_{}'.format(len(self.names))
+            self.names[key] = validator, name
+            self.pending.append((validator, name))
+        return self.names[key][1]
+
+    def unresolved(self, uri):
+        """Defers the failure of a reference until it is reached."""
+        name = 'unresolved_{}'.format(len(self.references))
+        self.functions.append(UNRESOLVED.format(name=name, uri=uri))
+        return name
+
+    def constant(self, prefix, source):
+        name = '{}_{}'.format(prefix, len(self.constants))
+        self.constants.append('{} = {}'.format(name, source))
+        return name
+
+    def matcher(self, patterns):
+        name = 'MATCHER_{}'.format(len(self.matchers))
+        items = ['({}, {})'.format(self.pattern(regex), self.name(sub))
+                 for regex, sub in patterns.items()]
+        self.matchers.append('{} = KeyMatcher([{}])'.format(name, ', '.join(items)))  # noqa
+        return name
+
+    def function(self, validator, name):
+        attrs = validator.attrs
+        w = Writer(1)
+        for keyword in ('enum', 'type', 'not', 'all_of', 'any_of', 'one_of'):
+            if keyword in attrs:
+                getattr(self, 'emit_' + keyword)(w, validator)
+
+        kinds = [
+            ('array', ('items', 'max_items', 'min_items', 'unique_items')),
+            ('number', ('maximum', 'minimum', 'multiple_of')),
+            ('object', ('required', 'max_properties', 'min_properties',
+                        'dependencies', 'properties', 'default_properties')),
+            ('string', ('max_length', 'min_length', 'pattern', 'format')),
+        ]
+        statement = 'if'
+        for kind, keywords in kinds:
+            sub = Writer(2)
+            for keyword in keywords:
+                getattr(self, 'emit_' + keyword)(sub, validator)
+            if sub.lines:
+                w('{} {}:'.format(statement, type_tests[kind]))
+                w.lines.extend(sub.lines)
+                statement = 'elif'
+
+        w('return obj')
+        return '\n\ndef {}(obj, pointer, errors):\n{}'.format(name, '\n'.join(w.lines))  # noqa
+
+    def copy(self, validators):
+        if any(injects(validator) for validator in validators):
+            return 'deepcopy(obj)'
+        return 'obj'
+
+    def emit_enum(self, w, validator):
+        enum = self.constant('ENUM', repr(validator.attrs['enum']))
+        w('if obj not in {}:'.format(enum))
+        with w.indent():
+            w.fail('Forbidden value')
+
+    def emit_type(self, w, validator):
+        tests = [type_tests[name] for name in validator.attrs['type']
+                 if name in type_tests]
+        w('if not ({}):'.format(' or '.join(tests) or 'False'))
+        with w.indent():
+            w.fail('Wrong type')
+
+    def emit_not(self, w, validator):
+        subvalidator = validator.attrs['not']
+        w('branch = []')
+        w("{}({}, '#', branch)".format(self.name(subvalidator),
+                                       self.copy([subvalidator])))
+        w('if not branch:')
+        with w.indent():
+            w.fail('Forbidden value')
+
+    def emit_all_of(self, w, validator):
+        for subvalidator in validator.attrs['all_of']:
+            w("obj = {}(obj, '#', errors)".format(self.name(subvalidator)))
+
+    def emit_any_of(self, w, validator):
+        subvalidators = validator.attrs['any_of']
+        names = ''.join(self.name(v) + ', ' for v in subvalidators)
+        w('for subvalidate in ({}):'.format(names))
+        with w.indent():
+            w('branch = []')
+            w("validated_obj = subvalidate({}, '#', branch)".format(self.copy(subvalidators)))  # noqa
+            w('if not branch:')
+            with w.indent():
+                w('obj = validated_obj')
+                w('break')
+        w('else:')
+        with w.indent():
+            w.fail('Not in any_of')
+
+    def emit_one_of(self, w, validator):
+        subvalidators = validator.attrs['one_of']
+        names = ''.join(self.name(v) + ', ' for v in subvalidators)
+        w('validated, validated_obj = 0, obj')
+        w('for subvalidate in ({}):'.format(names))
+        with w.indent():
+            w('branch = []')
+            w("result = subvalidate({}, '#', branch)".format(self.copy(subvalidators)))  # noqa
+            w('if not branch:')
+            with w.indent():
+                w('validated_obj = result')
+                w('validated += 1')
+                w('if validated > 1:')
+                with w.indent():
+                    w('break')
+        w('if validated == 1:')
+        with w.indent():
+            w('obj = validated_obj')
+        w('elif not validated:')
+        with w.indent():
+            w.fail('Validates noone', pointer='pointer_join(None)')
+        w('else:')
+        with w.indent():
+            w.fail('Validates more than once', pointer='pointer_join(None)')
+
+    def emit_items(self, w, validator):
+        if 'items' not in validator.attrs:
+            return
+        items = validator.attrs['items']
+        w('for index, element in enumerate(obj):')
+        with w.indent():
+            if isinstance(items, Validator):
+                node = self.name(items)
+            else:
+                node = 'node'
+                w('if index < {}:'.format(len(items)))
+                with w.indent():
+                    names = ''.join(self.name(v) + ', ' for v in items)
+                    w('node = ({})[index]'.format(names))
+                additionals = validator.attrs['additional_items']
+                if additionals is True:
+                    w('else:')
+                    with w.indent():
+                        w('break')
+                elif additionals is False:
+                    w('else:')
+                    with w.indent():
+                        w.fail('Forbidden value',
+                               pointer='pointer_join({!r}, index)'.format(validator.uri))  # noqa
+                        w('continue')
+                else:
+                    w('else:')
+                    with w.indent():
+                        w('node = {}'.format(self.name(additionals)))
+            w('obj[index] = {}(element, pointer_join(pointer, index), errors)'.format(node))  # noqa
+
+    def emit_max_items(self, w, validator):
+        if 'max_items' in validator.attrs:
+            w('if len(obj) > {!r}:'.format(validator.attrs['max_items']))
+            with w.indent():
+                w.fail('Too many elements')
+
+    def emit_min_items(self, w, validator):
+        if 'min_items' in validator.attrs:
+            w('if len(obj) < {!r}:'.format(validator.attrs['min_items']))
+            with w.indent():
+                w.fail('Too few elements')
+
+    def emit_unique_items(self, w, validator):
+        if validator.attrs.get('unique_items'):
+            w('if has_duplicates(obj):')
+            with w.indent():
+                w.fail('Elements must be unique')
+
+    def emit_maximum(self, w, validator):
+        if 'maximum' in validator.attrs:
+            limit = repr(validator.attrs['maximum'])
+            if validator.attrs['exclusive_maximum']:
+                w('if not obj < {}:'.format(limit))
+            else:
+                w('if not (obj < {0} or obj == {0}):'.format(limit))
+            with w.indent():
+                w.fail('Exceeded maximum')
+
+    def emit_minimum(self, w, validator):
+        if 'minimum' in validator.attrs:
+            limit = repr(validator.attrs['minimum'])
+            if validator.attrs['exclusive_minimum']:
+                w('if not obj > {}:'.format(limit))
+            else:
+                w('if not (obj > {0} or obj == {0}):'.format(limit))
+            with w.indent():
+                w.fail('Too small')
+
+    def emit_multiple_of(self, w, validator):
+        if 'multiple_of' in validator.attrs:
+            factor = repr(validator.attrs['multiple_of'])
+            factor = self.constant('FACTOR', factor)
+            w('if not {}.divides(obj):'.format(factor))
+            with w.indent():
+                w.fail('Forbidden value')
+
+    def emit_required(self, w, validator):
+        for name in validator.attrs.get('required', []):
+            w('if {!r} not in obj:'.format(name))
+            with w.indent():
+                w.fail('Missing property')
+
+    def emit_max_properties(self, w, validator):
+        if 'max_properties' in validator.attrs:
+            w('if len(obj) > {!r}:'.format(validator.attrs['max_properties']))
+            with w.indent():
+                w.fail('Too many properties')
+
+    def emit_min_properties(self, w, validator):
+        if 'min_properties' in validator.attrs:
+            w('if len(obj) < {!r}:'.format(validator.attrs['min_properties']))
+            with w.indent():
+                w.fail('Too few properties')
+
+    def emit_dependencies(self, w, validator):
+        dependencies = validator.attrs.get('dependencies', {})
+        for key, value in sorted(dependencies.items()):
+            w('if {!r} in obj:'.format(key))
+            with w.indent():
+                if isinstance(value, Validator):
+                    w("{}({}, '#', errors)".format(self.name(value), self.copy([value])))  # noqa
+                    continue
+                names = self.constant('DEPENDENCIES', repr(sorted(set(value))))
+                w('for name in set({}).difference(obj):'.format(names))
+                with w.indent():
+                    w.fail('Missing property')
+
+    def emit_properties(self, w, validator):
+        attrs = validator.attrs
+        properties = attrs['properties']
+        patterns = attrs['pattern_properties']
+        additionals = attrs['additional_properties']
+        if not properties and not patterns and additionals is True:
+            return
+
+        tracked = additionals is not True
+        w('if obj:')
+        with w.indent():
+            if tracked:
+                w('pending = set(obj)')
+            for name, subvalidator in properties.items():
+                w('if {!r} in obj:'.format(name))
+                with w.indent():
+                    if tracked:
+                        w('pending.discard({!r})'.format(name))
+                    w('obj[{0!r}] = {1}(obj[{0!r}], pointer_join(pointer, {0!r}), errors)'.format(name, self.name(subvalidator)))  # noqa
+            if patterns:
+                # one pass over obj, each regex runs once per distinct name
+                w('for name in list(obj):')
+                with w.indent():
+                    w('funcs = {}(name)'.format(self.matcher(patterns)))
+                    if tracked:
+                        w('if funcs:')
+                        with w.indent():
+                            w('pending.discard(name)')
+                    w('for func in funcs:')
+                    with w.indent():
+                        w('obj[name] = func(obj[name], pointer_join(pointer, name), errors)')  # noqa
+            if additionals is False:
+                w('if pending:')
+                with w.indent():
+                    w.fail('Forbidden additional properties')
+            elif additionals is not True:
+                w('for name in sorted(pending):')
+                with w.indent():
+                    w('obj[name] = {}(obj[name], pointer_join(pointer, name), errors)'.format(self.name(additionals)))  # noqa
+
+    def emit_default_properties(self, w, validator):
+        for name, subvalidator in validator.attrs['properties'].items():
+            if not subvalidator.has_default():
+                continue
+            default = subvalidator.default
+            if isinstance(default, immutable_types):
+                source = repr(default)
+            else:
+                source = 'deepcopy({})'.format(self.constant('DEFAULT', repr(default)))  # noqa
+            w('if {!r} not in obj:'.format(name))
+            with w.indent():
+                w('obj[{!r}] = {}'.format(name, source))
+
+    def emit_max_length(self, w, validator):
+        if 'max_length' in validator.attrs:
+            w('if len(obj) > {!r}:'.format(validator.attrs['max_length']))
+            with w.indent():
+                w.fail('Too long')
+
+    def emit_min_length(self, w, validator):
+        if 'min_length' in validator.attrs:
+            w('if len(obj) < {!r}:'.format(validator.attrs['min_length']))
+            with w.indent():
+                w.fail('Too short')
+
+    def emit_pattern(self, w, validator):
+        if 'pattern' in validator.attrs:
+            regex = self.pattern(validator.attrs['pattern'])
+            w('if not {}.search(obj):'.format(regex))
+            with w.indent():
+                w.fail('Forbidden value')
+
+    def emit_format(self, w, validator):
+        if 'format' in validator.attrs:
+            name = validator.attrs['format']
+            func = self.constant('FORMAT', 'formats[{!r}]'.format(format_aliases.get(name, name)))  # noqa
+            w('try:')
+            with w.indent():
+                w('obj = {}(obj)'.format(func))
+            w('except ValidationError:')
+            with w.indent():
+                w.fail('Forbidden value')
+
+    def pattern(self, regex):
+        return self.constant('PATTERN', 're.compile({!r}, {!r})'.format(regex.pattern, regex.flags))  # noqa
+
+
+def generate(validator):
+    """Generates the source of a python module which validates the same
+    documents than validator.
+
+    The module exposes a ``validate(obj, pointer=None)`` function. Formats
+    are looked up into the default :class:`FormatRegistry`.
+
+    :param validator: a validator returned by
+                      :func:`~jsonspec.validators.load`
+    :type validator: Validator
+    :return: the module source
+    :rtype: str
+    """
+    return Generator()(validator)
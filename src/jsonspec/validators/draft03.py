@@ -10,19 +10,21 @@ from __future__ import absolute_import
 __all__ = ['compile', 'Draft03Validator']
 
 import logging
-import os.path
-import re
 from copy import deepcopy
 from decimal import Decimal
 from six import integer_types, string_types
 from six.moves.urllib.parse import urljoin
-from .bases import ReferenceValidator, Validator
+from .bases import ReferenceValidator, ValidationContext, ValidationMemo
+from .bases import Validator
 from .exceptions import CompilationError
 from .factorize import register
+from .optimize import Optimizer
 from jsonspec.validators.exceptions import ValidationError
-from jsonspec.validators.util import uncamel
+from jsonspec.validators.util import Divisor, KeyMatcher, ValueSet
+from jsonspec.validators.util import compile_regex, empty, no_patterns
+from jsonspec.validators.util import type_matcher, types_of
+from jsonspec.validators.util import has_duplicates, set_item, uncamel
 from jsonspec.validators.pointer_util import pointer_join
-from jsonspec import driver as json
 
 sequence_types = (list, set, tuple)
 number_types = (integer_types, float, Decimal)
@@ -44,7 +46,11 @@ def compile(schema, pointer, context, scope=None):
     .. _`JSON Schema`: http://json-schema.org
     """
 
-    schm = deepcopy(schema)
+    schema = context.optimize(compile, schema)
+
+    # schema is read, never altered: only the values kept by the validator
+    # are copied, so that each subschema is copied once
+    schm = dict(schema)
 
     scope = urljoin(scope or str(pointer), schm.pop('id', None))
 
@@ -54,13 +60,13 @@ def compile(schema, pointer, context, scope=None):
     attrs = {}
 
     if 'additionalItems' in schm:
-        subpointer = os.path.join(pointer, 'additionalItems')
+        subpointer = pointer_join(pointer, 'additionalItems')
         attrs['additional_items'] = schm.pop('additionalItems')
         if isinstance(attrs['additional_items'], dict):
-            compiled = compile(attrs['additional_items'],
-                               subpointer,
-                               context,
-                               scope)
+            compiled = context.subschema(compile,
+                                         attrs['additional_items'],
+                                         subpointer,
+                                         scope)
             attrs['additional_items'] = compiled
         elif not isinstance(attrs['additional_items'], bool):
             raise CompilationError('wrong type for {}'.format('additional_items'), schema)  # noqa
@@ -68,41 +74,45 @@ def compile(schema, pointer, context, scope=None):
     if 'additionalProperties' in schm:
         attrs['additional_properties'] = schm.pop('additionalProperties')
         if isinstance(attrs['additional_properties'], dict):
-            subpointer = os.path.join(pointer, 'additionalProperties')
+            subpointer = pointer_join(pointer, 'additionalProperties')
             value = attrs['additional_properties']
-            attrs['additional_properties'] = compile(value,
-                                                     subpointer,
-                                                     context,
-                                                     scope)
+            attrs['additional_properties'] = context.subschema(compile,
+                                                               value,
+                                                               subpointer,
+                                                               scope)
         elif not isinstance(attrs['additional_properties'], bool):
             raise CompilationError('additionalProperties must be an object or boolean', schema)  # noqa
 
     if 'dependencies' in schm:
-        attrs['dependencies'] = schm.pop('dependencies')
-        if not isinstance(attrs['dependencies'], dict):
+        dependencies = schm.pop('dependencies')
+        if not isinstance(dependencies, dict):
             raise CompilationError('dependencies must be an object', schema)
-        for key, value in attrs['dependencies'].items():
+        attrs['dependencies'] = {}
+        for key, value in dependencies.items():
             if isinstance(value, dict):
-                subpointer = os.path.join(pointer, 'dependencies', key)
-                attrs['dependencies'][key] = compile(value,
-                                                     subpointer,
-                                                     context,
-                                                     scope)
+                subpointer = pointer_join(pointer, 'dependencies', key)
+                attrs['dependencies'][key] = context.subschema(compile,
+                                                               value,
+                                                               subpointer,
+                                                               scope)
             elif isinstance(value, sequence_types):
-                continue
-            elif not isinstance(value, string_types):
+                attrs['dependencies'][key] = list(value)
+            elif isinstance(value, string_types):
+                attrs['dependencies'][key] = value
+            else:
                 raise CompilationError('dependencies must be an array, object or string', schema)  # noqa
 
     if 'disallow' in schm:
         attrs['disallow'] = schm.pop('disallow')
         if isinstance(attrs['disallow'], sequence_types):
+            attrs['disallow'] = list(attrs['disallow'])
             for index, value in enumerate(attrs['disallow']):
                 if isinstance(value, dict):
-                    subpointer = os.path.join(pointer, 'disallow', str(index))
-                    attrs['disallow'][index] = compile(value,
-                                                       subpointer,
-                                                       context,
-                                                       scope)
+                    subpointer = pointer_join(pointer, 'disallow', str(index))
+                    attrs['disallow'][index] = context.subschema(compile,
+                                                                 value,
+                                                                 subpointer,
+                                                                 scope)
                 elif not isinstance(value, string_types):
                     raise CompilationError('disallow must be an object or string', schema)  # noqa
         elif not isinstance(attrs['disallow'], string_types):
@@ -117,6 +127,7 @@ def compile(schema, pointer, context, scope=None):
         attrs['enum'] = schm.pop('enum')
         if not isinstance(attrs['enum'], sequence_types):
             raise CompilationError('enum must be a sequence', schema)
+        attrs['enum'] = deepcopy(attrs['enum'])
 
     if 'exclusiveMaximum' in schm:
         attrs['exclusive_maximum'] = schm.pop('exclusiveMaximum')
@@ -130,18 +141,19 @@ def compile(schema, pointer, context, scope=None):
 
     if 'extends' in schm:
         attrs['extends'] = schm.pop('extends')
-        subpointer = os.path.join(pointer, 'extends')
+        subpointer = pointer_join(pointer, 'extends')
         if isinstance(attrs['extends'], dict):
-            attrs['extends'] = compile(attrs['extends'],
-                                       subpointer,
-                                       context,
-                                       scope)
+            attrs['extends'] = context.subschema(compile,
+                                                 attrs['extends'],
+                                                 subpointer,
+                                                 scope)
         elif isinstance(attrs['extends'], sequence_types):
+            attrs['extends'] = list(attrs['extends'])
             for index, value in enumerate(attrs['extends']):
-                attrs['extends'][index] = compile(value,
-                                                  subpointer,
-                                                  context,
-                                                  scope)
+                attrs['extends'][index] = context.subschema(compile,
+                                                            value,
+                                                            subpointer,
+                                                            scope)
         else:
             raise CompilationError('extends must be an object or array', schema)  # noqa
 
@@ -151,14 +163,14 @@ def compile(schema, pointer, context, scope=None):
             raise CompilationError('format must be a string', schema)
 
     if 'items' in schm:
-        subpointer = os.path.join(pointer, 'items')
+        subpointer = pointer_join(pointer, 'items')
         attrs['items'] = schm.pop('items')
         if isinstance(attrs['items'], (list, tuple)):
             # each value must be a json schema
-            attrs['items'] = [compile(element, subpointer, context, scope) for element in attrs['items']]  # noqa
+            attrs['items'] = [context.subschema(compile, element, subpointer, scope) for element in attrs['items']]  # noqa
         elif isinstance(attrs['items'], dict):
             # value must be a json schema
-            attrs['items'] = compile(attrs['items'], subpointer, context, scope)  # noqa
+            attrs['items'] = context.subschema(compile, attrs['items'], subpointer, scope)  # noqa
         else:
             # should be a boolean
             raise CompilationError('wrong type for {}'.format('items'), schema)  # noqa
@@ -197,28 +209,32 @@ def compile(schema, pointer, context, scope=None):
         attrs['pattern'] = schm.pop('pattern')
         if not isinstance(attrs['pattern'], string_types):
             raise CompilationError('pattern must be a string', schema)
+        attrs['pattern'] = compile_regex(attrs['pattern'], schema)
 
     if 'patternProperties' in schm:
-        attrs['pattern_properties'] = schm.pop('patternProperties')
-        if not isinstance(attrs['pattern_properties'], dict):
+        patterns = schm.pop('patternProperties')
+        if not isinstance(patterns, dict):
             raise CompilationError('patternProperties must be an object', schema)  # noqa
-        for name, value in attrs['pattern_properties'].items():
-            subpointer = os.path.join(pointer, 'patternProperties', name)
-            attrs['pattern_properties'][name] = compile(value,
-                                                        subpointer,
-                                                        context,
-                                                        scope)
+        attrs['pattern_properties'] = {}
+        for name, value in patterns.items():
+            subpointer = pointer_join(pointer, 'patternProperties', name)
+            regex = compile_regex(name, schema)
+            attrs['pattern_properties'][regex] = context.subschema(compile,
+                                                                   value,
+                                                                   subpointer,
+                                                                   scope)
 
     if 'properties' in schm:
-        attrs['properties'] = schm.pop('properties')
-        if not isinstance(attrs['properties'], dict):
+        properties = schm.pop('properties')
+        if not isinstance(properties, dict):
             raise CompilationError('properties must be an object', schema)
-        for name, value in attrs['properties'].items():
-            subpointer = os.path.join(pointer, 'properties', name)
-            attrs['properties'][name] = compile(value,
-                                                subpointer,
-                                                context,
-                                                scope)
+        attrs['properties'] = {}
+        for name, value in properties.items():
+            subpointer = pointer_join(pointer, 'properties', name)
+            attrs['properties'][name] = context.subschema(compile,
+                                                          value,
+                                                          subpointer,
+                                                          scope)
 
     if 'required' in schm:
         attrs['required'] = schm.pop('required')
@@ -228,13 +244,14 @@ def compile(schema, pointer, context, scope=None):
     if 'type' in schm:
         attrs['type'] = schm.pop('type')
         if isinstance(attrs['type'], sequence_types):
+            attrs['type'] = list(attrs['type'])
             for index, value in enumerate(attrs['type']):
                 if isinstance(value, dict):
-                    subpointer = os.path.join(pointer, 'type', str(index))
-                    attrs['type'][index] = compile(value,
-                                                   subpointer,
-                                                   context,
-                                                   scope)
+                    subpointer = pointer_join(pointer, 'type', str(index))
+                    attrs['type'][index] = context.subschema(compile,
+                                                             value,
+                                                             subpointer,
+                                                             scope)
                 elif not isinstance(value, string_types):
                     raise CompilationError('type must be an object or string', schema)  # noqa
         elif not isinstance(attrs['type'], string_types):
@@ -248,6 +265,42 @@ def compile(schema, pointer, context, scope=None):
     return Draft03Validator(attrs, scope, context.formats)
 
 
+def has_default(schema):
+    """Tells if the validator of schema has a default, without compiling."""
+    return False
+
+
+def is_optional(schema):
+    """Tells if the validator of schema is optional, without compiling."""
+    return not schema.get('required', False)
+
+
+# lazy validators answer these before compiling their subschema
+compile.has_default = has_default
+compile.is_optional = is_optional
+
+# rewrites schemas before they are compiled, when the factory optimizes
+compile.optimizer = Optimizer(
+    conjunction='extends',
+    inert=['default', 'required'],
+    everything=['any'],
+    zeros=['minItems', 'minLength'],
+    falses=['exclusiveMaximum', 'exclusiveMinimum', 'uniqueItems'])
+
+
+def split_types(types):
+    """Splits a type or disallow attribute into its names and its schemas.
+
+    :param types: a type name, or a list of type names and validators
+    :return: a :class:`TypeMatcher` of the names, and the tuple of validators
+    """
+    if not isinstance(types, sequence_types):
+        types = [types]
+    names = [type for type in types if not isinstance(type, Validator)]
+    schemas = tuple(type for type in types if isinstance(type, Validator))
+    return type_matcher(names, wildcard='any'), schemas
+
+
 class Draft03Validator(Validator):
     """
     Implements `JSON Schema`_ draft-03 validation.
@@ -262,21 +315,44 @@ class Draft03Validator(Validator):
     .. _`JSON Schema`: http://json-schema.org
     """
 
+    __slots__ = ('attrs', 'default', 'disallow_matcher', 'disallow_schemas',
+                 'formats', 'key_matcher', 'type_matcher', 'type_schemas',
+                 'uri')
+
     def __init__(self, attrs, uri=None, formats=None):
         attrs = {uncamel(k): v for k, v in attrs.items()}
 
         self.attrs = attrs
         self.attrs.setdefault('additional_items', True)
-        self.attrs.setdefault('pattern_properties', {})
+        self.attrs.setdefault('pattern_properties', empty)
         self.attrs.setdefault('exclusive_maximum', False)
         self.attrs.setdefault('exclusive_minimum', False)
         self.attrs.setdefault('additional_properties', True)
-        self.attrs.setdefault('properties', {})
+        self.attrs.setdefault('properties', empty)
+        if 'enum' in self.attrs:
+            self.attrs['enum'] = ValueSet(self.attrs['enum'])
+        if 'divisible_by' in self.attrs:
+            self.attrs['divisible_by'] = Divisor(self.attrs['divisible_by'])
+        self.type_matcher, self.type_schemas = split_types(
+            self.attrs.get('type', []))
+        self.disallow_matcher, self.disallow_schemas = split_types(
+            self.attrs.get('disallow', []))
+        if 'pattern' in self.attrs:
+            self.attrs['pattern'] = compile_regex(self.attrs['pattern'])
+        if self.attrs['pattern_properties']:
+            self.attrs['pattern_properties'] = {
+                compile_regex(pattern): validator
+                for pattern, validator
+                in self.attrs['pattern_properties'].items()
+            }
+            self.key_matcher = KeyMatcher(
+                self.attrs['pattern_properties'].items())
+        else:
+            self.attrs['pattern_properties'] = empty
+            self.key_matcher = no_patterns
         self.uri = uri
-        self.formats = formats or {}
+        self.formats = formats or empty
         self.default = self.attrs.get('default', None)
-        self.fail_fast = True
-        self.errors = []
 
     def is_array(self, obj):
         return isinstance(obj, sequence_types)
@@ -299,61 +375,84 @@ class Draft03Validator(Validator):
     def is_string(self, obj):
         return isinstance(obj, string_types)
 
-    def validate(self, obj, pointer=None):
+    def validate(self, obj, pointer=None, max_errors=None, memo=None):
         """
         Validate object against validator
 
         :param obj: the object to validate
+        :param pointer: the object pointer
+        :param max_errors: stop validation after this many errors
+        :param memo: remember up to this many subtrees proven valid, and
+                     skip them when they repeat
         """
 
-        pointer = pointer or '#'
-
-        validator = deepcopy(self)
-        validator.errors = []
-        validator.fail_fast = False
-
-        obj = deepcopy(obj)
-        obj = validator.validate_enum(obj, pointer)
-        obj = validator.validate_type(obj, pointer)
-        obj = validator.validate_disallow(obj, pointer)
-        obj = validator.validate_extends(obj, pointer)
-
-        if validator.is_array(obj):
-            obj = validator.validate_max_items(obj, pointer)
-            obj = validator.validate_min_items(obj, pointer)
-            obj = validator.validate_items(obj, pointer)
-            obj = validator.validate_unique_items(obj, pointer)
-
-        if validator.is_number(obj):
-            obj = validator.validate_maximum(obj, pointer)
-            obj = validator.validate_minimum(obj, pointer)
-            obj = validator.validate_divisible_by(obj, pointer)
+        memo = ValidationMemo(memo) if memo else None
+        context = ValidationContext(max_errors=max_errors, memo=memo)
+        obj = self.evaluate(obj, pointer or '#', context)
+        if context.errors:
+            raise ValidationError('multiple errors',
+                                  obj,
+                                  errors=context.errors)
 
-        if validator.is_object(obj):
-            obj = validator.validate_dependencies(obj, pointer)
-            obj = validator.validate_properties(obj, pointer)
+        return obj
 
-        if validator.is_string(obj):
-            obj = validator.validate_max_length(obj, pointer)
-            obj = validator.validate_min_length(obj, pointer)
-            obj = validator.validate_pattern(obj, pointer)
-            obj = validator.validate_format(obj, pointer)
+    def evaluate(self, obj, pointer, context):
+        """
+        Validate object within a running validation.
 
-        if validator.errors:
-            raise ValidationError('multiple errors',
-                                  obj,
-                                  errors=validator.errors)
+        Stops as soon as the context tells so.
+        """
+        if context.memo is not None:
+            return context.memo.evaluate(self, self.check, obj, pointer,
+                                         context)
+        return self.check(obj, pointer, context)
 
+    def check(self, obj, pointer, context):
+        """
+        Checks the keywords of the validator against object.
+        """
+        validators = [self.validate_enum,
+                      self.validate_type,
+                      self.validate_disallow,
+                      self.validate_extends]
+
+        if self.is_array(obj):
+            validators.extend([self.validate_max_items,
+                               self.validate_min_items,
+                               self.validate_items,
+                               self.validate_unique_items])
+
+        if self.is_number(obj):
+            validators.extend([self.validate_maximum,
+                               self.validate_minimum,
+                               self.validate_divisible_by])
+
+        if self.is_object(obj):
+            validators.extend([self.validate_dependencies,
+                               self.validate_properties])
+
+        if self.is_string(obj):
+            validators.extend([self.validate_max_length,
+                               self.validate_min_length,
+                               self.validate_pattern,
+                               self.validate_format])
+
+        for validate in validators:
+            obj = validate(obj, pointer, context)
+            if context.stopped:
+                break
         return obj
 
-    def validate_dependencies(self, obj, pointer=None):
+    def validate_dependencies(self, obj, pointer=None, context=None):
         if 'dependencies' in self.attrs:
             missings = set()
             for name, dependencies in self.attrs['dependencies'].items():
                 if name not in obj:
                     continue
                 if isinstance(dependencies, Validator):
-                    obj[name] = dependencies(obj)
+                    context.evaluate(dependencies, obj, '#')
+                    if context.stopped:
+                        return obj
                 elif isinstance(dependencies, sequence_types):
                     for d in dependencies:
                         if d not in obj:
@@ -362,67 +461,47 @@ class Draft03Validator(Validator):
                     missings.add(dependencies)
             if missings:
                 missings = sorted(missings)
-                self.fail('Missing properties', obj, pointer)
+                self.fail('Missing properties', obj, pointer, context)
         return obj
 
-    def validate_disallow(self, obj, pointer=None):
+    def validate_disallow(self, obj, pointer=None, context=None):
         if 'disallow' in self.attrs:
-            disallows = self.attrs['disallow']
-            if not isinstance(disallows, sequence_types):
-                disallows = [disallows]
-            disallowed = 0
-            for type in disallows:
-                try:
-                    if isinstance(type, Validator):
-                        type(obj)
-                        disallowed += 1
-                    elif type == "any":
-                        disallowed += 1
-                    elif type == "array" and self.is_array(obj):
-                        disallowed += 1
-                    elif type == "boolean" and self.is_boolean(obj):
-                        disallowed += 1
-                    elif type == "integer" and self.is_integer(obj):
-                        disallowed += 1
-                    elif type == "null" and self.is_null(obj):
-                        disallowed += 1
-                    elif type == "number" and self.is_number(obj):
-                        disallowed += 1
-                    elif type == "object" and self.is_object(obj):
-                        disallowed += 1
-                    elif type == "string" and self.is_string(obj):
-                        disallowed += 1
-                except ValidationError:
-                    # let it, it may be good
-                    pass
+            disallowed = self.disallow_matcher.matches(obj)
+            if not disallowed:
+                for validator in self.disallow_schemas:
+                    branch = context.branch()
+                    validator.evaluate(obj, '#', branch)
+                    if not branch.failed:
+                        disallowed = True
+                        break
             if disallowed:
-                self.fail('Wrong type', obj, pointer)
+                self.fail('Wrong type', obj, pointer, context)
         return obj
 
-    def validate_divisible_by(self, obj, pointer=None):
+    def validate_divisible_by(self, obj, pointer=None, context=None):
         if 'divisible_by' in self.attrs:
-            factor = Decimal(str(self.attrs['divisible_by']))
-            orig = Decimal(str(obj))
-            if orig % factor != 0:
-                self.fail('Not a multiple of {}', obj, pointer)
+            if not self.attrs['divisible_by'].divides(obj):
+                self.fail('Not a multiple of {}', obj, pointer, context)
         return obj
 
-    def validate_enum(self, obj, pointer=None):
+    def validate_enum(self, obj, pointer=None, context=None):
         if 'enum' in self.attrs:
             if not obj in self.attrs['enum']:
-                self.fail('Forbidden value', obj, pointer)
+                self.fail('Forbidden value', obj, pointer, context)
         return obj
 
-    def validate_extends(self, obj, pointer=None):
+    def validate_extends(self, obj, pointer=None, context=None):
         if 'extends' in self.attrs:
             extends = self.attrs['extends']
             if not isinstance(extends, sequence_types):
                 extends = [extends]
             for type in extends:
-                obj = type(obj)
+                obj = context.evaluate(type, obj, '#')
+                if context.stopped:
+                    break
         return obj
 
-    def validate_format(self, obj, pointer=None):
+    def validate_format(self, obj, pointer=None, context=None):
         """
         ================= ============
         Expected draft03  Alias of
@@ -461,169 +540,204 @@ class Draft03Validator(Validator):
                 'host-name': 'hostname',
             }.get(self.attrs['format'], self.attrs['format'])
             logger.debug('use %s', substituted)
-            return self.formats[substituted](obj)
+            try:
+                return self.formats[substituted](obj)
+            except ValidationError as error:
+                context.add(error)
         return obj
 
-    def validate_items(self, obj, pointer=None):
+    def validate_items(self, obj, pointer=None, context=None):
         if 'items' in self.attrs:
             items = self.attrs['items']
             if isinstance(items, Validator):
                 validator = items
+                validated = obj
+                path = context.path
                 for index, element in enumerate(obj):
-                    with self.catch_fail():
-                        obj[index] = validator(element, pointer_join(pointer, index))  # noqa
-                return obj
+                    path.append(index)
+                    value = validator.evaluate(element, pointer, context)
+                    path.pop()
+                    if value is not element:
+                        validated = set_item(validated, obj, index, value)
+                    if context.stopped:
+                        return validated
+                return validated
             elif isinstance(items, (list, tuple)):
                 additionals = self.attrs['additional_items']
                 validators = items
+                validated = obj
+                path = context.path
                 for index, element in enumerate(obj):
-                    with self.catch_fail():
-                        try:
-                            validator = validators[index]
-                        except IndexError:
-                            if additionals is True:
-                                return obj
-                            elif additionals is False:
-                                self.fail('Additional elements are forbidden',
-                                          obj,
-                                          pointer_join(pointer, index))
-                                continue
-                            validator = additionals
-                        obj[index] = validator(element, pointer_join(pointer, index))  # noqa
-                return obj
+                    try:
+                        validator = validators[index]
+                    except IndexError:
+                        if additionals is True:
+                            return validated
+                        elif additionals is False:
+                            path.append(index)
+                            self.fail('Additional elements are forbidden',
+                                      obj,
+                                      pointer,
+                                      context)
+                            path.pop()
+                            if context.stopped:
+                                return validated
+                            continue
+                        validator = additionals
+                    path.append(index)
+                    value = validator.evaluate(element, pointer, context)
+                    path.pop()
+                    if value is not element:
+                        validated = set_item(validated, obj, index, value)
+                    if context.stopped:
+                        return validated
+                return validated
             else:
                 raise NotImplementedError(items)
         return obj
 
-    def validate_max_items(self, obj, pointer=None):
+    def validate_max_items(self, obj, pointer=None, context=None):
         if 'max_items' in self.attrs:
             count = len(obj)
             if count > self.attrs['max_items']:
-                self.fail('Too many items', obj, pointer)
+                self.fail('Too many items', obj, pointer, context)
         return obj
 
-    def validate_max_length(self, obj, pointer=None):
+    def validate_max_length(self, obj, pointer=None, context=None):
         if 'max_length' in self.attrs:
             length = len(obj)
             if length > self.attrs['max_length']:
-                self.fail('Too long', obj, pointer)
+                self.fail('Too long', obj, pointer, context)
         return obj
 
-    def validate_maximum(self, obj, pointer=None):
+    def validate_maximum(self, obj, pointer=None, context=None):
         if 'maximum' in self.attrs:
             if obj > self.attrs['maximum']:
-                self.fail('Too big number', obj, pointer)
+                self.fail('Too big number', obj, pointer, context)
             if self.attrs['exclusive_maximum'] and obj == self.attrs['maximum']:  # noqa
-                self.fail('Too big number', obj, pointer)
+                self.fail('Too big number', obj, pointer, context)
         return obj
 
-    def validate_min_items(self, obj, pointer=None):
+    def validate_min_items(self, obj, pointer=None, context=None):
         if 'min_items' in self.attrs:
             count = len(obj)
             if count < self.attrs['min_items']:
-                self.fail('Too few items', obj, pointer)
+                self.fail('Too few items', obj, pointer, context)
         return obj
 
-    def validate_min_length(self, obj, pointer=None):
+    def validate_min_length(self, obj, pointer=None, context=None):
         if 'min_length' in self.attrs:
             length = len(obj)
             if length < self.attrs['min_length']:
-                self.fail('Too short', obj, pointer)
+                self.fail('Too short', obj, pointer, context)
         return obj
 
-    def validate_minimum(self, obj, pointer=None):
+    def validate_minimum(self, obj, pointer=None, context=None):
         if 'minimum' in self.attrs:
             if obj < self.attrs['minimum']:
-                self.fail('Too low number', obj, pointer)
+                self.fail('Too low number', obj, pointer, context)
             if self.attrs['exclusive_minimum'] and obj == self.attrs['minimum']:  # noqa
                 self.fail('Too low number',
                           obj,
-                          pointer)
+                          pointer,
+                          context)
         return obj
 
-    def validate_pattern(self, obj, pointer=None):
+    def validate_pattern(self, obj, pointer=None, context=None):
         if 'pattern' in self.attrs:
-            regex = re.compile(self.attrs['pattern'])
-            if not regex.search(obj):
-                self.fail('Does not match pattern', obj, pointer)
+            if not self.attrs['pattern'].search(obj):
+                self.fail('Does not match pattern', obj, pointer, context)
         return obj
 
-    def validate_properties(self, obj, pointer=None):
+    def validate_properties(self, obj, pointer=None, context=None):
         validated = set()
         pending = set(obj.keys())
+        response = obj
+        path = context.path
 
         for name, validator in self.attrs['properties'].items():
             if name in obj:
-                with self.catch_fail():
-                    pending.discard(name)
-                    obj[name] = validator(obj[name], pointer_join(pointer, name))  # noqa
-                    validated.add(name)
+                pending.discard(name)
+                element = response[name]
+                path.append(name)
+                value = validator.evaluate(element, pointer, context)
+                path.pop()
+                if value is not element:
+                    response = set_item(response, obj, name, value)
+                if context.stopped:
+                    return response
+                validated.add(name)
             elif not validator.is_optional():
-                self.fail('Required property', obj, pointer)
-
-        for pattern, validator in self.attrs['pattern_properties'].items():
-            regex = re.compile(pattern)
-            for name, value in obj.items():
-                if regex.search(name):
-                    with self.catch_fail():
-                        pending.discard(name)
-                        obj[name] = validator(obj[name], pointer_join(pointer, name))  # noqa
-                        validated.add(name)
+                self.fail('Required property', obj, pointer, context)
+                if context.stopped:
+                    return response
+
+        matcher = self.key_matcher
+        if matcher:
+            for name in obj:
+                validators = matcher(name)
+                if not validators:
+                    continue
+                pending.discard(name)
+                for validator in validators:
+                    element = response[name]
+                    path.append(name)
+                    value = validator.evaluate(element, pointer, context)
+                    path.pop()
+                    if value is not element:
+                        response = set_item(response, obj, name, value)
+                    if context.stopped:
+                        return response
+                validated.add(name)
 
         if not pending:
-            return obj
+            return response
 
         if self.attrs['additional_properties'] is True:
-            return obj
+            return response
 
         if self.attrs['additional_properties'] is False:
             if len(obj) > len(validated):
-                self.fail('Additional properties are forbidden', obj, pointer)  # noqa
-            return obj
+                self.fail('Additional properties are forbidden', obj, pointer, context)  # noqa
+            return response
 
         validator = self.attrs['additional_properties']
-        for name, value in obj.items():
+        for name, element in obj.items():
             if name not in validated:
-                obj[name] = validator(value, pointer_join(pointer, name))
+                path.append(name)
+                value = validator.evaluate(element, pointer, context)
+                path.pop()
+                if value is not element:
+                    response = set_item(response, obj, name, value)
+                if context.stopped:
+                    return response
                 validated.add(name)
 
-        return obj
+        return response
 
-    def validate_type(self, obj, pointer=None):
+    def validate_type(self, obj, pointer=None, context=None):
         if 'type' in self.attrs:
+            if not self.type_schemas:
+                if not self.type_matcher.matches(obj):
+                    self.fail('Wrong type', obj, pointer, context)
+                return obj
             types = self.attrs['type']
-            if not isinstance(types, sequence_types):
-                types = [types]
+            names = types_of(obj.__class__)
             for type in types:
-                try:
-                    if isinstance(type, Validator):
-                        return type(obj)
-                    elif type == "any":
-                        return obj
-                    elif type == "array" and self.is_array(obj):
-                        return obj
-                    elif type == "boolean" and self.is_boolean(obj):
-                        return obj
-                    elif type == "integer" and self.is_integer(obj):
-                        return obj
-                    elif type == "null" and self.is_null(obj):
-                        return obj
-                    elif type == "number" and self.is_number(obj):
-                        return obj
-                    elif type == "object" and self.is_object(obj):
-                        return obj
-                    elif type == "string" and self.is_string(obj):
-                        return obj
-                except ValidationError:
-                    # let it, it may be good
-                    pass
-            self.fail('Wrong type', obj, pointer)
+                if isinstance(type, Validator):
+                    branch = context.branch()
+                    validated_obj = type.evaluate(obj, '#', branch)
+                    if not branch.failed:
+                        return validated_obj
+                elif type == 'any' or type in names:
+                    return obj
+            self.fail('Wrong type', obj, pointer, context)
         return obj
 
-    def validate_unique_items(self, obj, pointer=None):
+    def validate_unique_items(self, obj, pointer=None, context=None):
         if self.attrs.get('unique_items'):
-            if len(obj) > len(set(json.dumps(element) for element in obj)):
-                self.fail('Elements must be unique', obj, pointer)
+            if has_duplicates(obj):
+                self.fail('Elements must be unique', obj, pointer, context)
         return obj
 
     def has_default(self):
@@ -636,31 +750,12 @@ class Draft03Validator(Validator):
         """
         return not self.attrs.get('required', False)
 
-    def fail(self, reason, obj, pointer=None):
+    def fail(self, reason, obj, pointer=None, context=None):
         """
         Called when validation fails.
-        """
-        pointer = pointer_join(pointer)
-        err = ValidationError(reason, obj, pointer)
-        if self.fail_fast:
-            raise err
-        else:
-            self.errors.append(err)
-        return err
-
-    def catch_fail(self):
-        return FailCatcher(self)
-
-
-class FailCatcher(object):
-    def __init__(self, validator):
-        self.validator = validator
 
-    def __enter__(self):
-        return self
-
-    def __exit__(self, type, value, tb):
-        if isinstance(value, ValidationError) and not self.validator.fail_fast:
-            self.validator.errors.append(value)
-            return True
-        return False
+        The error is accumulated into context, or raised without context.
+        """
+        if context is None:
+            raise ValidationError(reason, obj, pointer_join(pointer))
+        return context.fail(reason, obj, pointer)
@@ -10,24 +10,37 @@ from __future__ import absolute_import
 __all__ = ['compile', 'Draft04Validator']
 
 import logging
-import os.path
-import re
 from copy import deepcopy
 from decimal import Decimal
 from six import integer_types, string_types
 from six.moves.urllib.parse import urljoin
-from .bases import ReferenceValidator, Validator
+from .bases import LazyValidator, ReferenceValidator, ValidationContext
+from .bases import ValidationMemo, Validator
 from .exceptions import CompilationError
 from .factorize import register
+from .optimize import Optimizer
 from jsonspec.validators.exceptions import ValidationError
+from jsonspec.validators.util import Divisor, KeyMatcher, ValueSet
+from jsonspec.validators.util import compile_regex, empty, no_patterns
+from jsonspec.validators.util import type_matcher
+from jsonspec.validators.util import canonical, has_duplicates, set_item
 from jsonspec.validators.util import uncamel
 from jsonspec.validators.pointer_util import pointer_join
-from jsonspec import driver as json
 
 sequence_types = (list, set, tuple)
 number_types = (integer_types, float, Decimal)
 logger = logging.getLogger(__name__)
 
+#: formats expected by draft04, aliased to the registered ones
+format_aliases = {
+    'date-time': 'rfc3339.datetime',
+    'email': 'email',
+    'hostname': 'hostname',
+    'ipv4': 'ipv4',
+    'ipv6': 'ipv6',
+    'uri': 'uri',
+}
+
 
 @register(spec='http://json-schema.org/draft-04/schema#')
 def compile(schema, pointer, context, scope=None):
@@ -44,7 +57,11 @@ def compile(schema, pointer, context, scope=None):
     .. _`JSON Schema`: http://json-schema.org
     """
 
-    schm = deepcopy(schema)
+    schema = context.optimize(compile, schema)
+
+    # schema is read, never altered: only the values kept by the validator
+    # are copied, so that each subschema is copied once
+    schm = dict(schema)
 
     scope = urljoin(scope or str(pointer), schm.pop('id', None))
 
@@ -54,68 +71,72 @@ def compile(schema, pointer, context, scope=None):
     attrs = {}
 
     if 'additionalItems' in schm:
-        subpointer = os.path.join(pointer, 'additionalItems')
+        subpointer = pointer_join(pointer, 'additionalItems')
         attrs['additional_items'] = schm.pop('additionalItems')
         if isinstance(attrs['additional_items'], dict):
-            compiled = compile(attrs['additional_items'],
-                               subpointer,
-                               context,
-                               scope)
+            compiled = context.subschema(compile,
+                                         attrs['additional_items'],
+                                         subpointer,
+                                         scope)
             attrs['additional_items'] = compiled
         elif not isinstance(attrs['additional_items'], bool):
             raise CompilationError('wrong type for {}'.format('additional_items'), schema)  # noqa
 
     if 'additionalProperties' in schm:
-        subpointer = os.path.join(pointer, 'additionalProperties')
+        subpointer = pointer_join(pointer, 'additionalProperties')
         attrs['additional_properties'] = schm.pop('additionalProperties')
         if isinstance(attrs['additional_properties'], dict):
-            compiled = compile(attrs['additional_properties'],
-                               subpointer,
-                               context,
-                               scope)
+            compiled = context.subschema(compile,
+                                         attrs['additional_properties'],
+                                         subpointer,
+                                         scope)
             attrs['additional_properties'] = compiled
         elif not isinstance(attrs['additional_properties'], bool):
             raise CompilationError('wrong type for {}'.format('additional_properties'), schema)  # noqa
 
     if 'allOf' in schm:
-        subpointer = os.path.join(pointer, 'allOf')
+        subpointer = pointer_join(pointer, 'allOf')
         attrs['all_of'] = schm.pop('allOf')
         if isinstance(attrs['all_of'], (list, tuple)):
-            attrs['all_of'] = [compile(element, subpointer, context, scope) for element in attrs['all_of']]  # noqa
+            attrs['all_of'] = [context.subschema(compile, element, subpointer, scope) for element in attrs['all_of']]  # noqa
         else:
             # should be a boolean
             raise CompilationError('wrong type for {}'.format('allOf'), schema)  # noqa
 
     if 'anyOf' in schm:
-        subpointer = os.path.join(pointer, 'anyOf')
+        subpointer = pointer_join(pointer, 'anyOf')
         attrs['any_of'] = schm.pop('anyOf')
         if isinstance(attrs['any_of'], (list, tuple)):
-            attrs['any_of'] = [compile(element, subpointer, context, scope) for element in attrs['any_of']]  # noqa
+            attrs['any_of'] = [context.subschema(compile, element, subpointer, scope) for element in attrs['any_of']]  # noqa
         else:
             # should be a boolean
             raise CompilationError('wrong type for {}'.format('anyOf'), schema)  # noqa
 
     if 'default' in schm:
-        attrs['default'] = schm.pop('default')
+        attrs['default'] = deepcopy(schm.pop('default'))
 
     if 'dependencies' in schm:
-        attrs['dependencies'] = schm.pop('dependencies')
-        if not isinstance(attrs['dependencies'], dict):
+        dependencies = schm.pop('dependencies')
+        if not isinstance(dependencies, dict):
             raise CompilationError('dependencies must be an object', schema)
-        for key, value in attrs['dependencies'].items():
+        attrs['dependencies'] = {}
+        for key, value in dependencies.items():
             if isinstance(value, dict):
-                subpointer = os.path.join(pointer, 'dependencies', key)
-                attrs['dependencies'][key] = compile(value,
-                                                     subpointer,
-                                                     context,
-                                                     scope)
-            elif not isinstance(value, sequence_types):
+                subpointer = pointer_join(pointer, 'dependencies', key)
+                attrs['dependencies'][key] = context.subschema(compile,
+                                                               value,
+                                                               subpointer,
+                                                               scope)
+            elif isinstance(value, sequence_types):
+                attrs['dependencies'][key] = list(value)
+            else:
                 raise CompilationError('dependencies must be an array or object', schema)  # noqa
 
     if 'enum' in schm:
         attrs['enum'] = schm.pop('enum')
         if not isinstance(attrs['enum'], sequence_types):
             raise CompilationError('enum must be a sequence', schema)
+        attrs['enum'] = deepcopy(attrs['enum'])
 
     if 'exclusiveMaximum' in schm:
         attrs['exclusive_maximum'] = schm.pop('exclusiveMaximum')
@@ -133,14 +154,14 @@ def compile(schema, pointer, context, scope=None):
             raise CompilationError('format must be a string', schema)
 
     if 'items' in schm:
-        subpointer = os.path.join(pointer, 'items')
+        subpointer = pointer_join(pointer, 'items')
         attrs['items'] = schm.pop('items')
         if isinstance(attrs['items'], (list, tuple)):
             # each value must be a json schema
-            attrs['items'] = [compile(element, subpointer, context, scope) for element in attrs['items']]  # noqa
+            attrs['items'] = [context.subschema(compile, element, subpointer, scope) for element in attrs['items']]  # noqa
         elif isinstance(attrs['items'], dict):
             # value must be a json schema
-            attrs['items'] = compile(attrs['items'], subpointer, context, scope)  # noqa
+            attrs['items'] = context.subschema(compile, attrs['items'], subpointer, scope)  # noqa
         else:
             # should be a boolean
             raise CompilationError('wrong type for {}'.format('items'), schema)  # noqa
@@ -194,15 +215,18 @@ def compile(schema, pointer, context, scope=None):
         attrs['not'] = schm.pop('not')
         if not isinstance(attrs['not'], dict):
             raise CompilationError('not must be an object', schema)
-        subpointer = os.path.join(pointer, 'not')
-        attrs['not'] = compile(attrs['not'], subpointer, context, scope)
+        subpointer = pointer_join(pointer, 'not')
+        attrs['not'] = context.subschema(compile,
+                                         attrs['not'],
+                                         subpointer,
+                                         scope)
 
     if 'oneOf' in schm:
-        subpointer = os.path.join(pointer, 'oneOf')
+        subpointer = pointer_join(pointer, 'oneOf')
         attrs['one_of'] = schm.pop('oneOf')
         if isinstance(attrs['one_of'], (list, tuple)):
             # each value must be a json schema
-            attrs['one_of'] = [compile(element, subpointer, context, scope) for element in attrs['one_of']]  # noqa
+            attrs['one_of'] = [context.subschema(compile, element, subpointer, scope) for element in attrs['one_of']]  # noqa
         else:
             # should be a boolean
             raise CompilationError('wrong type for {}'.format('oneOf'), schema)
@@ -211,24 +235,28 @@ def compile(schema, pointer, context, scope=None):
         attrs['pattern'] = schm.pop('pattern')
         if not isinstance(attrs['pattern'], string_types):
             raise CompilationError('pattern must be a string', schema)
+        attrs['pattern'] = compile_regex(attrs['pattern'], schema)
 
     if 'properties' in schm:
-        attrs['properties'] = schm.pop('properties')
-        if not isinstance(attrs['properties'], dict):
+        properties = schm.pop('properties')
+        if not isinstance(properties, dict):
             raise CompilationError('properties must be an object', schema)
-        for subname, subschema in attrs['properties'].items():
+        attrs['properties'] = {}
+        for subname, subschema in properties.items():
             subpointer = pointer_join(pointer, subname)
-            compiled = compile(subschema, subpointer, context, scope)
+            compiled = context.subschema(compile, subschema, subpointer, scope)
             attrs['properties'][subname] = compiled
 
     if 'patternProperties' in schm:
-        attrs['pattern_properties'] = schm.pop('patternProperties')
-        if not isinstance(attrs['pattern_properties'], dict):
+        patterns = schm.pop('patternProperties')
+        if not isinstance(patterns, dict):
             raise CompilationError('patternProperties must be an object', schema)
-        for subname, subschema in attrs['pattern_properties'].items():
-            subpointer = os.path.join(pointer, 'patternProperties', subname)
-            compiled = compile(subschema, subpointer, context, scope)
-            attrs['pattern_properties'][subname] = compiled
+        attrs['pattern_properties'] = {}
+        for subname, subschema in patterns.items():
+            subpointer = pointer_join(pointer, 'patternProperties', subname)
+            compiled = context.subschema(compile, subschema, subpointer, scope)
+            regex = compile_regex(subname, schema)
+            attrs['pattern_properties'][regex] = compiled
 
     if 'required' in schm:
         attrs['required'] = schm.pop('required')
@@ -236,12 +264,15 @@ def compile(schema, pointer, context, scope=None):
             raise CompilationError('required must be a list', schema)
         if len(attrs['required']) < 1:
             raise CompilationError('required cannot be empty', schema)
+        attrs['required'] = list(attrs['required'])
 
     if 'type' in schm:
         attrs['type'] = schm.pop('type')
         if isinstance(attrs['type'], string_types):
             attrs['type'] = [attrs['type']]
-        elif not isinstance(attrs['type'], sequence_types):
+        elif isinstance(attrs['type'], sequence_types):
+            attrs['type'] = list(attrs['type'])
+        else:
             raise CompilationError('type must be string or sequence', schema)
 
     if 'uniqueItems' in schm:
@@ -252,6 +283,119 @@ def compile(schema, pointer, context, scope=None):
     return Draft04Validator(attrs, str(pointer), context.formats)
 
 
+def has_default(schema):
+    """Tells if the validator of schema has a default, without compiling."""
+    return 'default' in schema
+
+
+def is_optional(schema):
+    """Tells if the validator of schema is optional, without compiling."""
+    return True
+
+
+# lazy validators answer these before compiling their subschema
+compile.has_default = has_default
+compile.is_optional = is_optional
+
+# rewrites schemas before they are compiled, when the factory optimizes
+compile.optimizer = Optimizer(
+    conjunction='allOf',
+    inert=['default'],
+    everything=['array', 'boolean', 'null', 'number', 'object', 'string'],
+    zeros=['minItems', 'minLength', 'minProperties'],
+    falses=['exclusiveMaximum', 'exclusiveMinimum', 'uniqueItems'])
+
+
+def compiled(validator):
+    """Returns the compiled validator of a lazy one."""
+    while isinstance(validator, LazyValidator):
+        validator = validator.validator
+    return validator
+
+
+class BranchIndex(object):
+    """
+    Selects the branches of anyOf and oneOf which may accept an instance.
+
+    A branch is left out only when it would fail for sure: its ``type``
+    does not match the instance, it requires a missing property, or the
+    ``enum`` of the discriminating property does not accept its value. The
+    discriminating property is the one with an ``enum`` in most branches.
+    Other branches are kept, in their declared order.
+
+    :ivar key: the name of the discriminating property, if any
+    """
+
+    __slots__ = ('branches', 'all', 'key', 'values', 'absent', 'others')
+
+    def __init__(self, validators):
+        self.branches = []
+        counts = {}
+        for validator in validators:
+            validator = compiled(validator)
+            if not isinstance(validator, Draft04Validator):
+                self.branches.append((None, (), {}))
+                continue
+            attrs = validator.attrs
+            matcher = validator.type_matcher if 'type' in attrs else None
+            enums = {}
+            for name, subvalidator in attrs['properties'].items():
+                subvalidator = compiled(subvalidator)
+                if isinstance(subvalidator, Draft04Validator) \
+                        and 'enum' in subvalidator.attrs:
+                    enums[name] = subvalidator.attrs['enum']
+                    counts[name] = counts.get(name, 0) + 1
+            self.branches.append((matcher,
+                                  tuple(attrs.get('required', ())),
+                                  enums))
+        self.all = tuple(range(len(self.branches)))
+        self.key = None
+        self.values = {}
+        self.absent = self.others = self.all
+        if counts:
+            self.key = max(sorted(counts), key=counts.get)
+            values, others, absent = {}, [], []
+            for index, (_, required, enums) in enumerate(self.branches):
+                if self.key not in required:
+                    absent.append(index)
+                if self.key not in enums:
+                    others.append(index)
+                    continue
+                for value in enums[self.key]:
+                    values.setdefault(canonical(value), set()).add(index)
+            self.values = {
+                value: tuple(sorted(indices.union(others)))
+                for value, indices in values.items()
+            }
+            self.others = tuple(others)
+            self.absent = tuple(absent)
+
+    def select(self, obj):
+        """
+        Returns the positions of the branches which may accept obj.
+        """
+        if isinstance(obj, dict):
+            if self.key is None:
+                indices = self.all
+            elif self.key in obj:
+                value = canonical(obj[self.key])
+                indices = self.values.get(value, self.others)
+            else:
+                indices = self.absent
+        else:
+            indices = self.all
+        selected = []
+        for index in indices:
+            matcher, required, _ = self.branches[index]
+            if matcher is not None and not matcher.matches(obj):
+                continue
+            if required and isinstance(obj, dict):
+                if not all(name in obj for name in required):
+                    continue
+            selected.append(index)
+        return selected
+
+
 class Draft04Validator(Validator):
     """
     Implements `JSON Schema`_ draft-04 validation.
@@ -266,70 +410,122 @@ class Draft04Validator(Validator):
     .. _`JSON Schema`: http://json-schema.org
     """
 
+    __slots__ = ('attrs', 'branch_indexes', 'default', 'formats',
+                 'key_matcher', 'type_matcher', 'uri')
+
     def __init__(self, attrs, uri=None, formats=None):
         attrs = {uncamel(k): v for k, v in attrs.items()}
 
-        self.formats = formats or {}
+        self.formats = formats or empty
         self.attrs = attrs
         self.attrs.setdefault('additional_items', True)
         self.attrs.setdefault('additional_properties', True)
         self.attrs.setdefault('exclusive_maximum', False),
         self.attrs.setdefault('exclusive_minimum', False),
-        self.attrs.setdefault('pattern_properties', {})
-        self.attrs.setdefault('properties', {})
+        self.attrs.setdefault('pattern_properties', empty)
+        self.attrs.setdefault('properties', empty)
+        if 'enum' in self.attrs:
+            self.attrs['enum'] = ValueSet(self.attrs['enum'])
+        if 'multiple_of' in self.attrs:
+            self.attrs['multiple_of'] = Divisor(self.attrs['multiple_of'])
+        types = self.attrs.get('type', [])
+        if isinstance(types, string_types):
+            types = [types]
+        self.type_matcher = type_matcher(types)
+        self.branch_indexes = {
+            name: BranchIndex(self.attrs[name])
+            for name in ('any_of', 'one_of') if name in self.attrs
+        } or empty
+        if 'pattern' in self.attrs:
+            self.attrs['pattern'] = compile_regex(self.attrs['pattern'])
+        if self.attrs['pattern_properties']:
+            self.attrs['pattern_properties'] = {
+                compile_regex(pattern): validator
+                for pattern, validator
+                in self.attrs['pattern_properties'].items()
+            }
+            self.key_matcher = KeyMatcher(
+                self.attrs['pattern_properties'].items())
+        else:
+            self.attrs['pattern_properties'] = empty
+            self.key_matcher = no_patterns
         self.uri = uri
         self.default = self.attrs.get('default', None)
-        self.fail_fast = True
-        self.errors = []
 
-    def validate(self, obj, pointer=None):
+    def validate(self, obj, pointer=None, max_errors=None, memo=None):
         """
         Validate object against validator
 
         :param obj: the object to validate
+        :param pointer: the object pointer
+        :param max_errors: stop validation after this many errors
+        :param memo: remember up to this many subtrees proven valid, and
+                     skip them when they repeat
         """
 
-        pointer = pointer or '#'
+        memo = ValidationMemo(memo) if memo else None
+        context = ValidationContext(max_errors=max_errors, memo=memo)
+        obj = self.evaluate(obj, pointer or '#', context)
+        if context.errors:
+            raise ValidationError('multiple errors',
+                                  obj,
+                                  errors=context.errors)
+
+        return obj
 
-        validator = deepcopy(self)
-        validator.errors = []
-        validator.fail_fast = False
+    def evaluate(self, obj, pointer, context):
+        """
+        Validate object within a running validation.
 
-        obj = deepcopy(obj)
-        obj = validator.validate_enum(obj, pointer)
-        obj = validator.validate_type(obj, pointer)
-        obj = validator.validate_not(obj, pointer)
-        obj = validator.validate_all_of(obj, pointer)
-        obj = validator.validate_any_of(obj, pointer)
-        obj = validator.validate_one_of(obj, pointer)
+        Stops as soon as the context tells so.
+        """
+        if context.memo is not None:
+            return context.memo.evaluate(self, self.check, obj, pointer,
+                                         context)
+        return self.check(obj, pointer, context)
+
+    def check(self, obj, pointer, context):
+        """
+        Checks the keywords of the validator against object.
+        """
+        for validate in (self.validate_enum,
+                         self.validate_type,
+                         self.validate_not,
+                         self.validate_all_of,
+                         self.validate_any_of,
+                         self.validate_one_of):
+            obj = validate(obj, pointer, context)
+            if context.stopped:
+                return obj
 
         if self.is_array(obj):
-            obj = validator.validate_items(obj, pointer)
-            obj = validator.validate_max_items(obj, pointer)
-            obj = validator.validate_min_items(obj, pointer)
-            obj = validator.validate_unique_items(obj, pointer)
+            validators = (self.validate_items,
+                          self.validate_max_items,
+                          self.validate_min_items,
+                          self.validate_unique_items)
         elif self.is_number(obj):
-            obj = validator.validate_maximum(obj, pointer)
-            obj = validator.validate_minimum(obj, pointer)
-            obj = validator.validate_multiple_of(obj, pointer)
+            validators = (self.validate_maximum,
+                          self.validate_minimum,
+                          self.validate_multiple_of)
         elif self.is_object(obj):
-            obj = validator.validate_required(obj, pointer)
-            obj = validator.validate_max_properties(obj, pointer)
-            obj = validator.validate_min_properties(obj, pointer)
-            obj = validator.validate_dependencies(obj, pointer)
-            obj = validator.validate_properties(obj, pointer)
-            obj = validator.validate_default_properties(obj, pointer)
+            validators = (self.validate_required,
+                          self.validate_max_properties,
+                          self.validate_min_properties,
+                          self.validate_dependencies,
+                          self.validate_properties,
+                          self.validate_default_properties)
         elif self.is_string(obj):
-            obj = validator.validate_max_length(obj, pointer)
-            obj = validator.validate_min_length(obj, pointer)
-            obj = validator.validate_pattern(obj, pointer)
-            obj = validator.validate_format(obj, pointer)
-
-        if validator.errors:
-            raise ValidationError('multiple errors',
-                                  obj,
-                                  errors=validator.errors)
+            validators = (self.validate_max_length,
+                          self.validate_min_length,
+                          self.validate_pattern,
+                          self.validate_format)
+        else:
+            return obj
 
+        for validate in validators:
+            obj = validate(obj, pointer, context)
+            if context.stopped:
+                return obj
         return obj
 
     def is_array(self, obj):
@@ -353,46 +549,57 @@ class Draft04Validator(Validator):
     def has_default(self):
         return 'default' in self.attrs
 
-    def validate_all_of(self, obj, pointer=None):
+    def validate_all_of(self, obj, pointer=None, context=None):
         for validator in self.attrs.get('all_of', []):
-            obj = validator(obj)
+            obj = context.evaluate(validator, obj, '#')
+            if context.stopped:
+                break
         return obj
 
-    def validate_any_of(self, obj, pointer=None):
+    def validate_any_of(self, obj, pointer=None, context=None):
         if 'any_of' in self.attrs:
-            for validator in self.attrs['any_of']:
-                try:
-                    obj = validator(obj)
-                    return obj
-                except ValidationError:
-                    pass
-            self.fail('Not in any_of', obj, pointer)
+            validators = self.attrs['any_of']
+            for index in self.branch_indexes['any_of'].select(obj):
+                validator = validators[index]
+                branch = context.branch()
+                validated_obj = validator.evaluate(obj, '#', branch)
+                if not branch.failed:
+                    return validated_obj
+            self.fail('Not in any_of', obj, pointer, context)
         return obj
 
-    def validate_default_properties(self, obj, pointer=None):
+    def validate_default_properties(self, obj, pointer=None, context=None):
         # Reinject defaults from properties.
+        if not context.defaults:
+            return obj
+        validated = obj
         for name, validator in self.attrs.get('properties', {}).items():
             if name not in obj and validator.has_default():
-                obj[name] = deepcopy(validator.default)
-        return obj
+                default = deepcopy(validator.default)
+                validated = set_item(validated, obj, name, default)
+        return validated
 
-    def validate_dependencies(self, obj, pointer=None):
+    def validate_dependencies(self, obj, pointer=None, context=None):
         for key, dependencies in self.attrs.get('dependencies', {}).items():
             if key in obj:
                 if isinstance(dependencies, sequence_types):
                     for dep in set(dependencies) - set(obj.keys()):
-                        self.fail('Missing property', obj, pointer)
+                        self.fail('Missing property', obj, pointer, context)
+                        if context.stopped:
+                            break
                 else:
-                    dependencies(obj)
+                    context.evaluate(dependencies, obj, '#')
+                if context.stopped:
+                    break
         return obj
 
-    def validate_enum(self, obj, pointer=None):
+    def validate_enum(self, obj, pointer=None, context=None):
         if 'enum' in self.attrs:
             if obj not in self.attrs['enum']:
-                self.fail('Forbidden value', obj, pointer)
+                self.fail('Forbidden value', obj, pointer, context)
         return obj
 
-    def validate_format(self, obj, pointer=None):
+    def validate_format(self, obj, pointer=None, context=None):
         """
         ================= ============
         Expected draft04  Alias of
@@ -407,54 +614,68 @@ class Draft04Validator(Validator):
 
         """
         if 'format' in self.attrs:
-            substituted = {
-                'date-time': 'rfc3339.datetime',
-                'email': 'email',
-                'hostname': 'hostname',
-                'ipv4': 'ipv4',
-                'ipv6': 'ipv6',
-                'uri': 'uri',
-            }.get(self.attrs['format'], self.attrs['format'])
+            substituted = format_aliases.get(self.attrs['format'],
+                                             self.attrs['format'])
             logger.debug('use %s', substituted)
             try:
                 return self.formats[substituted](obj)
             except ValidationError as error:
                 logger.error(error)
-                self.fail('Forbidden value', obj, pointer)
+                self.fail('Forbidden value', obj, pointer, context)
         return obj
 
-    def validate_items(self, obj, pointer=None):
+    def validate_items(self, obj, pointer=None, context=None):
         if 'items' in self.attrs:
             items = self.attrs['items']
             if isinstance(items, Validator):
                 validator = items
+                validated = obj
+                path = context.path
                 for index, element in enumerate(obj):
-                    with self.catch_fail():
-                        obj[index] = validator(element, pointer_join(pointer, index))  # noqa
-                return obj
+                    path.append(index)
+                    value = validator.evaluate(element, pointer, context)
+                    path.pop()
+                    if value is not element:
+                        validated = set_item(validated, obj, index, value)
+                    if context.stopped:
+                        return validated
+                return validated
             elif isinstance(items, (list, tuple)):
                 additionals = self.attrs['additional_items']
                 validators = items
+                validated = obj
+                path = context.path
                 for index, element in enumerate(obj):
-                    with self.catch_fail():
-                        try:
-                            validator = validators[index]
-                        except IndexError:
-                            if additionals is True:
-                                return obj
-                            elif additionals is False:
-                                self.fail('Forbidden value',
-                                          obj,
-                                          pointer=pointer_join(self.uri, index))
-                                continue
-                            validator = additionals
-                        obj[index] = validator(element, pointer_join(pointer, index))  # noqa
-                return obj
+                    try:
+                        validator = validators[index]
+                    except IndexError:
+                        if additionals is True:
+                            return validated
+                        elif additionals is False:
+                            # reported against the schema uri, not the path
+                            context.path = []
+                            self.fail('Forbidden value',
+                                      obj,
+                                      pointer_join(self.uri, index),
+                                      context)
+                            context.path = path
+                            if context.stopped:
+                                return validated
+                            continue
+                        validator = additionals
+                    path.append(index)
+                    value = validator.evaluate(element, pointer, context)
+                    path.pop()
+                    if value is not element:
+                        validated = set_item(validated, obj, index, value)
+                    if context.stopped:
+                        return validated
+                return validated
             else:
                 raise NotImplementedError(items)
         return obj
 
-    def validate_maximum(self, obj, pointer=None):
+    def validate_maximum(self, obj, pointer=None, context=None):
         if 'maximum' in self.attrs:
             m = self.attrs['maximum']
             if obj < m:
@@ -462,31 +683,31 @@ class Draft04Validator(Validator):
             exclusive = self.attrs['exclusive_maximum']
             if not exclusive and (obj == m):
                 return obj
-            self.fail('Exceeded maximum', obj, pointer)
+            self.fail('Exceeded maximum', obj, pointer, context)
         return obj
 
-    def validate_max_items(self, obj, pointer=None):
+    def validate_max_items(self, obj, pointer=None, context=None):
         if 'max_items' in self.attrs:
             count = len(obj)
             if count > self.attrs['max_items']:
-                self.fail('Too many elements', obj, pointer)
+                self.fail('Too many elements', obj, pointer, context)
         return obj
 
-    def validate_max_length(self, obj, pointer=None):
+    def validate_max_length(self, obj, pointer=None, context=None):
         if 'max_length' in self.attrs:
             length = len(obj)
             if length > self.attrs['max_length']:
-                self.fail('Too long', obj, pointer)
+                self.fail('Too long', obj, pointer, context)
         return obj
 
-    def validate_max_properties(self, obj, pointer=None):
+    def validate_max_properties(self, obj, pointer=None, context=None):
         if 'max_properties' in self.attrs:
             count = len(obj)
             if count > self.attrs['max_properties']:
-                self.fail('Too many properties', obj, pointer)
+                self.fail('Too many properties', obj, pointer, context)
         return obj
 
-    def validate_minimum(self, obj, pointer=None):
+    def validate_minimum(self, obj, pointer=None, context=None):
         if 'minimum' in self.attrs:
             m = self.attrs['minimum']
             if obj > m:
@@ -494,150 +715,151 @@ class Draft04Validator(Validator):
             exclusive = self.attrs['exclusive_minimum']
             if not exclusive and (obj == m):
                 return obj
-            self.fail('Too small', obj, pointer)
+            self.fail('Too small', obj, pointer, context)
         return obj
 
-    def validate_min_items(self, obj, pointer=None):
+    def validate_min_items(self, obj, pointer=None, context=None):
         if 'min_items' in self.attrs:
             count = len(obj)
             if count < self.attrs['min_items']:
-                self.fail('Too few elements', obj, pointer)
+                self.fail('Too few elements', obj, pointer, context)
         return obj
 
-    def validate_min_length(self, obj, pointer=None):
+    def validate_min_length(self, obj, pointer=None, context=None):
         if 'min_length' in self.attrs:
             length = len(obj)
             if length < self.attrs['min_length']:
-                self.fail('Too short', obj, pointer)
+                self.fail('Too short', obj, pointer, context)
         return obj
 
-    def validate_min_properties(self, obj, pointer=None):
+    def validate_min_properties(self, obj, pointer=None, context=None):
         if 'min_properties' in self.attrs:
             count = len(obj)
             if count < self.attrs['min_properties']:
-                self.fail('Too few properties', obj, pointer)
+                self.fail('Too few properties', obj, pointer, context)
         return obj
 
-    def validate_multiple_of(self, obj, pointer=None):
+    def validate_multiple_of(self, obj, pointer=None, context=None):
         if 'multiple_of' in self.attrs:
-            factor = Decimal(str(self.attrs['multiple_of']))
-            orig = Decimal(str(obj))
-            if orig % factor != 0:
-                self.fail('Forbidden value', obj, pointer)
+            if not self.attrs['multiple_of'].divides(obj):
+                self.fail('Forbidden value', obj, pointer, context)
         return obj
 
-    def validate_not(self, obj, pointer=None):
+    def validate_not(self, obj, pointer=None, context=None):
         if 'not' in self.attrs:
-            try:
-                validator = self.attrs['not']
-                validator(obj)
-            except ValidationError:
-                return obj
-            else:
-                self.fail('Forbidden value', obj, pointer)
+            branch = context.branch()
+            self.attrs['not'].evaluate(obj, '#', branch)
+            if not branch.failed:
+                self.fail('Forbidden value', obj, pointer, context)
         return obj
 
-    def validate_one_of(self, obj, pointer=None):
+    def validate_one_of(self, obj, pointer=None, context=None):
         if 'one_of' in self.attrs:
             validated = 0
-            for validator in self.attrs['one_of']:
-                try:
-                    validated_obj = validator(obj)
+            validators = self.attrs['one_of']
+            for index in self.branch_indexes['one_of'].select(obj):
+                validator = validators[index]
+                branch = context.branch()
+                result = validator.evaluate(obj, '#', branch)
+                if not branch.failed:
+                    validated_obj = result
                     validated += 1
-                except ValidationError:
-                    pass
+                    if validated > 1:
+                        break
             if not validated:
-                self.fail('Validates noone', obj)
+                self.fail('Validates noone', obj, None, context)
             elif validated == 1:
                 return validated_obj
             else:
-                self.fail('Validates more than once', obj)
+                self.fail('Validates more than once', obj, None, context)
         return obj
 
-    def validate_pattern(self, obj, pointer=None):
+    def validate_pattern(self, obj, pointer=None, context=None):
         if 'pattern' in self.attrs:
-            pattern = self.attrs['pattern']
-            if re.search(pattern, obj):
+            if self.attrs['pattern'].search(obj):
                 return obj
-            self.fail('Forbidden value', obj, pointer)
+            self.fail('Forbidden value', obj, pointer, context)
         return obj
 
-    def validate_properties(self, obj, pointer=None):
-        validated = set()
-        pending = set(obj.keys())
-        response = {}
-
+    def validate_properties(self, obj, pointer=None, context=None):
         if not obj:
-            return response
+            return obj
+
+        validated = obj
+        pending = set(obj.keys())
+        path = context.path
 
         for name, validator in self.attrs['properties'].items():
             if name in obj:
-                with self.catch_fail():
-                    pending.discard(name)
-                    obj[name] = validator(obj[name], pointer_join(pointer, name))  # noqa
-                    validated.add(name)
-
-        for pattern, validator in self.attrs['pattern_properties'].items():
-            for name in sorted(obj.keys()):
-                if re.search(pattern, name):
-                    with self.catch_fail():
-                        pending.discard(name)
-                        obj[name] = validator(obj[name], pointer_join(pointer, name))  # noqa
-                        validated.add(name)
+                pending.discard(name)
+                element = validated[name]
+                path.append(name)
+                value = validator.evaluate(element, pointer, context)
+                path.pop()
+                if value is not element:
+                    validated = set_item(validated, obj, name, value)
+                if context.stopped:
+                    return validated
+
+        matcher = self.key_matcher
+        if matcher:
+            for name in obj:
+                validators = matcher(name)
+                if not validators:
+                    continue
+                pending.discard(name)
+                for validator in validators:
+                    element = validated[name]
+                    path.append(name)
+                    value = validator.evaluate(element, pointer, context)
+                    path.pop()
+                    if value is not element:
+                        validated = set_item(validated, obj, name, value)
+                    if context.stopped:
+                        return validated
 
         if not pending:
-            return obj
+            return validated
 
         additionals = self.attrs['additional_properties']
         if additionals is True:
-            return obj
+            return validated
 
         if additionals is False:
-            self.fail('Forbidden additional properties', obj, pointer)
-            return obj
+            self.fail('Forbidden additional properties', obj, pointer, context)
+            return validated
 
         validator = additionals
         for name in sorted(pending):
-            obj[name] = validator(obj.pop(name), pointer_join(pointer, name))  # noqa
-            validated.add(name)
-        return obj
-
-    def validate_required(self, obj, pointer=None):
+            element = validated[name]
+            path.append(name)
+            value = validator.evaluate(element, pointer, context)
+            path.pop()
+            if value is not element:
+                validated = set_item(validated, obj, name, value)
+            if context.stopped:
+                return validated
+        return validated
+
+    def validate_required(self, obj, pointer=None, context=None):
         if 'required' in self.attrs:
             for name in self.attrs['required']:
                 if name not in obj:
-                    self.fail('Missing property', obj, pointer)
+                    self.fail('Missing property', obj, pointer, context)
+                    if context.stopped:
+                        break
         return obj
 
-    def validate_type(self, obj, pointer=None):
+    def validate_type(self, obj, pointer=None, context=None):
         if 'type' in self.attrs:
-            types = self.attrs['type']
-            if isinstance(types, string_types):
-                types = [types]
-
-            for t in types:
-                if t == 'array' and self.is_array(obj):
-                    return obj
-                if t == 'boolean' and self.is_boolean(obj):
-                    return obj
-                if t == 'integer' and self.is_integer(obj):
-                    return obj
-                if t == 'number' and self.is_number(obj):
-                    return obj
-                if t == 'null' and obj is None:
-                    return obj
-                if t == 'object' and self.is_object(obj):
-                    return obj
-                if t == 'string' and self.is_string(obj):
-                    return obj
-
-            self.fail('Wrong type', obj, pointer)
+            if not self.type_matcher.matches(obj):
+                self.fail('Wrong type', obj, pointer, context)
         return obj
 
-    def validate_unique_items(self, obj, pointer=None):
+    def validate_unique_items(self, obj, pointer=None, context=None):
         if self.attrs.get('unique_items'):
-            if len(obj) > len(set(json.dumps(element) for element in obj)):
-                self.fail('Elements must be unique', obj, pointer)
+            if has_duplicates(obj):
+                self.fail('Elements must be unique', obj, pointer, context)
         return obj
 
     def is_optional(self):
@@ -647,31 +869,12 @@ class Draft04Validator(Validator):
         logger.warn('asking for is_optional')
         return True
 
-    def fail(self, reason, obj, pointer=None):
+    def fail(self, reason, obj, pointer=None, context=None):
         """
         Called when validation fails.
-        """
-        pointer = pointer_join(pointer)
-        err = ValidationError(reason, obj, pointer)
-        if self.fail_fast:
-            raise err
-        else:
-            self.errors.append(err)
-        return err
-
-    def catch_fail(self):
-        return FailCatcher(self)
 
-
-class FailCatcher(object):
-    def __init__(self, validator):
-        self.validator = validator
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, type, value, tb):
-        if isinstance(value, ValidationError) and not self.validator.fail_fast:
-            self.validator.errors.append(value)
-            return True
-        return False
+        The error is accumulated into context, or raised without context.
+        """
+        if context is None:
+            raise ValidationError(reason, obj, pointer_join(pointer))
+        return context.fail(reason, obj, pointer)
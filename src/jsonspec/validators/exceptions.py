@@ -25,7 +25,12 @@ class ReferenceError(Exception):
 
 
 class ValidationError(ValueError):
-    """Raised when validation fails"""
+    """Raised when validation fails
+
+    Errors only record their reason, which may be a template like
+    ``'{!r} is not a valid date'``. It is formatted with the failing obj
+    on demand, by :attr:`message`.
+    """
     def __init__(self, reason, obj=None, pointer=None, errors=None):
         """
         :param reason: the reason failing
@@ -36,11 +41,21 @@ class ValidationError(ValueError):
         self.obj = obj
         self.pointer = pointer
 
-        self.errors = set()
         if isinstance(errors, (list, tuple, set)):
-            self.errors.update(errors)
+            self.errors = set(errors)
         elif isinstance(errors, Exception):
-            self.errors.add(errors)
+            self.errors = set([errors])
+        else:
+            self.errors = set()
+
+    @property
+    def message(self):
+        """The reason, formatted with the failing obj."""
+        reason = self.args[0]
+        try:
+            return reason.format(self.obj)
+        except (AttributeError, IndexError, KeyError, ValueError):
+            return reason
 
     def flatten(self):
         """
@@ -52,19 +67,15 @@ class ValidationError(ValueError):
 
 
 def flatten(error):
-    def iter_it(src):
+    data = defaultdict(set)
+    pending = [error]
+    while pending:
+        src = pending.pop()
         if isinstance(src, (list, set, tuple)):
-            for error in src:
-                for pointer, reason in iter_it(error):
-                    yield pointer, reason
-        if isinstance(src, ValidationError):
+            pending.extend(src)
+        elif isinstance(src, ValidationError):
             if src.errors:
-                for pointer, reason in iter_it(src.errors):
-                    yield pointer, reason
+                pending.extend(src.errors)
             if src.pointer:
-                yield src.pointer, src.args[0]
-
-    data = defaultdict(set)
-    for pointer, reason in iter_it(error):
-        data[pointer].add(reason)
+                data[src.pointer].add(src.args[0])
     return dict(data)
@@ -4,15 +4,22 @@
 
 """
 
-__all__ = ['Context', 'Factory', 'register']
+__all__ = ['Context', 'Factory', 'ValidatorCache', 'register']
 
+import hashlib
 import logging
+from collections import OrderedDict
+from copy import deepcopy
 from functools import partial
+from threading import Lock
+from jsonspec import driver as json
 from jsonspec.pointer import DocumentPointer
 from jsonspec.pointer.exceptions import ExtractError
 from jsonspec.reference import LocalRegistry
+from .bases import LazyValidator
 from .exceptions import CompilationError
 from .formats import FormatRegistry
+from .util import Numbering
 
 logger = logging.getLogger(__name__)
 
@@ -24,32 +31,233 @@ class Context(object):
     :ivar registry: the current registry
     :ivar spec: the current spec
     :ivar formats: the current formats exposed
+    :ivar resolved: validators of the references resolved so far,
+                    shared by the contexts of a compilation
+    :ivar subschemas: validators of the subschemas compiled so far,
+                      shared by the contexts of a compilation
     """
-    def __init__(self, factory, registry, spec=None, formats=None):
+    def __init__(self, factory, registry, spec=None, formats=None,
+                 resolved=None, subschemas=None):
         self.factory = factory
         self.registry = registry
         self.spec = spec
         self.formats = formats
+        self.resolved = {} if resolved is None else resolved
+        self.subschemas = Subschemas() if subschemas is None else subschemas
 
     def __call__(self, schema, pointer):
         return self.factory(schema, pointer, self.spec)
 
+    def subschema(self, compiler, schema, pointer, scope, lazy=None):
+        """
+        Compiles a subschema, or defers it if the factory is lazy.
+
+        Structurally identical subschemas, with the same resolution scope,
+        share the same validator.
+
+        :param compiler: the compiler of the subschema
+        :param schema: the subschema to compile
+        :param pointer: the pointer of the subschema
+        :param scope: the resolution scope of the subschema
+        :param lazy: defer the compilation, defaults to the factory setting
+        """
+        if lazy is None:
+            lazy = self.factory.lazy
+        if lazy and isinstance(schema, dict) and '$ref' not in schema:
+            return LazyValidator(compiler, schema, pointer, scope, self)
+        key = self.subschemas.key(compiler, schema, pointer, scope)
+        validator = self.subschemas.get(key)
+        if validator is None:
+            validator = compiler(schema, pointer, self, scope)
+            self.subschemas.set(key, validator)
+        return validator
+
+    def optimize(self, compiler, schema):
+        """
+        Returns schema rewritten by the optimizer of its compiler, if the
+        factory optimizes.
+
+        :param compiler: the compiler of the schema
+        :param schema: the schema to optimize
+        """
+        if self.factory.optimize:
+            return compiler.optimizer(schema)
+        return schema
+
     def resolve(self, pointer):
+        """
+        Returns the validator of pointer.
+
+        Each target is compiled once per compilation, whatever the number
+        of references to it, and recursive references close into a cycle.
+        """
+        key = str(pointer), self.spec
+        try:
+            return self.resolved[key]
+        except KeyError:
+            pass
         try:
             dp = DocumentPointer(pointer)
             if dp.is_inner():
                 logger.debug('resolve inner %s', pointer)
-                return self.factory.local(self.registry.resolve(pointer),
-                                          pointer,
-                                          self.registry,
-                                          self.spec)
-
-            logger.debug('resolve outside %s', pointer)
-            return self.factory(self.registry.resolve(pointer),
-                                pointer,
-                                self.spec)
+                validator = self.factory.local(self.registry.resolve(pointer),
+                                               pointer,
+                                               self.registry,
+                                               self.spec,
+                                               self.resolved,
+                                               self.subschemas)
+            else:
+                logger.debug('resolve outside %s', pointer)
+                validator = self.factory(self.registry.resolve(pointer),
+                                         pointer,
+                                         self.spec)
         except ExtractError as error:
             raise CompilationError({}, error)
+        return self.resolved.setdefault(key, validator)
+
+
+def fingerprint(schema):
+    """
+    Computes the canonical fingerprint of a schema.
+
+    :return: the digest, and the length of the canonical form,
+             or None if schema is not plain json
+    """
+    try:
+        canonical = json.dumps(schema,
+                               sort_keys=True,
+                               separators=(',', ':'),
+                               ensure_ascii=True)
+    except (TypeError, ValueError):
+        return None
+    canonical = canonical.encode('ascii')
+    return hashlib.sha1(canonical).hexdigest(), len(canonical)
+
+
+class Subschemas(object):
+    """
+    Validators of the subschemas of a compilation, hash-consed.
+
+    Subschemas are numbered by structure, so that structurally identical
+    subschemas get the same number, and each value is numbered once.
+    Validators of ``additionalItems: false`` report errors against their
+    own location, which is then part of their key.
+
+    :ivar validators: validators by number, scope and location
+    :ivar numbering: numbers of the subschemas
+    """
+
+    def __init__(self):
+        self.validators = {}
+        self.numbering = Numbering(mark=located)
+
+    def key(self, compiler, schema, pointer, scope):
+        """
+        Returns the key of schema, or None if it is not plain json.
+        """
+        if not isinstance(schema, dict):
+            return None
+        numbered = self.numbering.number(schema)
+        if numbered is None:
+            return None
+        number, marked = numbered
+        return compiler, number, scope, str(pointer) if marked else None
+
+    def get(self, key):
+        return self.validators.get(key) if key else None
+
+    def set(self, key, validator):
+        if key:
+            self.validators[key] = validator
+
+
+def located(schema):
+    """Tells if the errors of schema depend on its location."""
+    return isinstance(schema, dict) \
+        and schema.get('additionalItems') is False \
+        and isinstance(schema.get('items'), (list, tuple))
+
+
+class ValidatorCache(object):
+    """
+    LRU cache of compiled validators.
+
+    Entries are keyed by the fingerprint of their schema, with the pointer,
+    spec, provider and formats they were compiled with. The size of an
+    entry is approximated by the length of its canonical schema.
+
+    :ivar maxsize: the maximum number of entries
+    :ivar maxbytes: the approximate maximum size of all entries
+    :ivar hits: how many times a validator was reused
+    :ivar misses: how many times a schema had to be compiled
+    :ivar evictions: how many validators were dropped
+    """
+
+    def __init__(self, maxsize=256, maxbytes=16 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, key, identity):
+        """
+        Returns the validator cached under key, or None.
+
+        :param identity: the objects the validator depends on;
+                         they must be the very same
+        """
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or any(a is not b for a, b in zip(entry[0],
+                                                                 identity)):
+                self.misses += 1
+                if entry is not None:
+                    self.nbytes -= entry[2]
+                return None
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, identity, validator, nbytes):
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[2]
+            self.entries[key] = (identity, validator, nbytes)
+            self.nbytes += nbytes
+            while self.entries and (len(self.entries) > self.maxsize or
+                                    self.nbytes > self.maxbytes):
+                _, (_, _, size) = self.entries.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """
+        Returns hits, misses, evictions, entries and bytes.
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.nbytes,
+            }
+
+
+#: the compiled validators shared by the factories which ask for them
+shared_cache = ValidatorCache()
 
 
 class Factory(object):
@@ -57,17 +265,31 @@ class Factory(object):
 
     :ivar provider: global registry
     :ivar spec: default spec
+    :ivar cache: compiled validators, if any. True shares the validators
+                 compiled by other factories of the process
+    :ivar lazy: compile subschemas the first time they are validated
+    :ivar optimize: simplify schemas before compiling them
     """
 
     spec = 'http://json-schema.org/draft-04/schema#'
     compilers = {}
+    cache = None
 
-    def __init__(self, provider=None, spec=None, formats=None):
+    def __init__(self, provider=None, spec=None, formats=None, cache=None,
+                 lazy=False, optimize=False):
+        # validators compiled with the same provider and formats objects
+        # can be shared
+        self.identity = (provider, formats)
         self.provider = provider or {}
         self.spec = spec or self.spec
         if not isinstance(formats, FormatRegistry):
             formats = FormatRegistry(formats)
         self.formats = formats
+        if cache is True:
+            cache = shared_cache
+        self.cache = cache or None
+        self.lazy = lazy
+        self.optimize = optimize
 
     def __call__(self, schema, pointer, spec=None):
         try:
@@ -76,6 +298,20 @@ class Factory(object):
         except KeyError:
             raise CompilationError('{!r} not registered'.format(spec), schema)
 
+        key = None
+        if self.cache:
+            fingerprinted = fingerprint(schema)
+            if fingerprinted:
+                digest, nbytes = fingerprinted
+                key = (digest, str(pointer), spec, self.lazy, self.optimize,
+                       id(self.identity[0]), id(self.identity[1]))
+                validator = self.cache.get(key, self.identity)
+                if validator is not None:
+                    return validator
+                # references are resolved lazily, against a schema that
+                # the caller must not be able to alter anymore
+                schema = deepcopy(schema)
+
         registry = LocalRegistry(schema, self.provider)
         local = DocumentPointer(pointer)
 
@@ -83,16 +319,21 @@ class Factory(object):
             registry[local.document] = schema
         local.document = '<local>'
         context = Context(self, registry, spec, self.formats)
-        return compiler(schema, pointer, context)
+        validator = compiler(schema, pointer, context)
+        if key:
+            self.cache.set(key, self.identity, validator, nbytes)
+        return validator
 
-    def local(self, schema, pointer, registry, spec=None):
+    def local(self, schema, pointer, registry, spec=None, resolved=None,
+              subschemas=None):
         try:
             spec = schema.get('$schema', spec or self.spec)
             compiler = self.compilers[spec]
         except KeyError:
             raise CompilationError('{!r} not registered'.format(spec))
 
-        context = Context(self, registry, spec, self.formats)
+        context = Context(self, registry, spec, self.formats, resolved,
+                          subschemas)
         return compiler(schema, pointer, context)
 
     @classmethod
@@ -0,0 +1,445 @@
+"""
+    jsonspec.validators.incremental
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Revalidates a document after a JSON Patch.
+
+    The operations are applied on a copy of the containers leading to their
+    locations, and the modified locations are recorded as a tree of tokens.
+    Only the subschemas which apply to these locations are evaluated again,
+    with the keywords of their ancestors which depend on their members or
+    elements, like ``required`` or ``uniqueItems``.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['revalidate', 'Changes', 'Patch']
+
+from copy import deepcopy
+from jsonspec.operations import Error, NonexistentTarget
+from jsonspec.operations.patch import UnknownOperation
+from jsonspec.pointer import Pointer
+from jsonspec.pointer.bases import StagesToken
+from .bases import LazyValidator, ReferenceValidator, ValidationContext
+from .draft04 import Draft04Validator, sequence_types
+from .exceptions import ValidationError
+from .pointer_util import pointer_join
+from .util import set_item
+
+#: keywords which need the whole instance, whatever changed in it
+branching = ('enum', 'not', 'any_of', 'one_of')
+
+
+class Changes(object):
+    """
+    The locations of a document modified by a patch.
+
+    :ivar children: the changes of members by name, or of elements by index
+    :ivar whole: tells if the location was replaced, added or removed
+    :ivar spliced: tells if elements were inserted or removed before the end
+                   of the array, so that the next ones were shifted
+    """
+
+    __slots__ = ('children', 'whole', 'spliced')
+
+    def __init__(self, whole=False):
+        self.children = {}
+        self.whole = whole
+        self.spliced = False
+
+    def node(self, keys):
+        """
+        Returns the changes at keys, or None when they belong to a location
+        already replaced.
+        """
+        node = self
+        for key in keys:
+            if node.whole:
+                return None
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = Changes()
+            node = child
+        if node.whole:
+            return None
+        return node
+
+    def replace(self, keys):
+        """Records the location at keys as replaced."""
+        if not keys:
+            self.whole = True
+            self.children = {}
+            return
+        node = self.node(keys[:-1])
+        if node is not None:
+            node.children[keys[-1]] = Changes(whole=True)
+
+    def insert(self, keys, index, size):
+        """
+        Records an element inserted at index into the array at keys, which
+        now has size elements.
+        """
+        node = self.node(keys)
+        if node is not None:
+            node.shift(index, 1)
+            node.children[index] = Changes(whole=True)
+            node.spliced = node.spliced or index < size - 1
+
+    def remove(self, keys, index, size):
+        """
+        Records the element removed at index from the array at keys, which
+        now has size elements.
+        """
+        node = self.node(keys)
+        if node is not None:
+            node.children.pop(index, None)
+            node.shift(index + 1, -1)
+            node.spliced = node.spliced or index < size
+
+    def shift(self, start, offset):
+        self.children = dict(
+            (index + offset if index >= start else index, child)
+            for index, child in self.children.items())
+
+
+class Patch(object):
+    """
+    Applies operations to a document, without altering it.
+
+    Only the objects and arrays leading to the modified locations are
+    copied, and the rest of the document is shared.
+
+    :ivar document: the patched document
+    :ivar changes: the modified locations
+    :type changes: Changes
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.changes = Changes()
+        self.owned = {}
+
+    def apply(self, operation):
+        """
+        Applies one operation of `JSON Patch`_.
+
+        The operation is not altered. ``check`` is accepted for ``test``,
+        like :func:`jsonspec.operations.patch.patch` does.
+
+        .. _`JSON Patch`: http://tools.ietf.org/html/rfc6902
+        """
+        name = operation.get('op')
+        if name == 'add':
+            self.add(operation['path'], deepcopy(operation['value']))
+        elif name == 'remove':
+            self.remove(operation['path'])
+        elif name == 'replace':
+            self.replace(operation['path'], operation['value'])
+        elif name == 'move':
+            value = self.get(operation['from'])
+            self.remove(operation['from'])
+            self.add(operation['path'], value)
+        elif name == 'copy':
+            self.add(operation['path'], deepcopy(self.get(operation['from'])))
+        elif name in ('test', 'check'):
+            if self.get(operation['path']) != operation['value']:
+                raise Error('test failed', operation['path'])
+        else:
+            raise UnknownOperation("Operation '%s' is not known." % name)
+        return self
+
+    def get(self, path):
+        obj = self.document
+        for token in self.tokens(path):
+            obj = obj[self.key(obj, token)]
+        return obj
+
+    def add(self, path, value):
+        tokens = self.tokens(path)
+        if not tokens:
+            self.document = value
+            self.changes.replace([])
+            return
+        parent, keys = self.walk(tokens)
+        token = tokens[-1]
+        if isinstance(parent, dict):
+            parent[str(token)] = value
+            self.changes.replace(keys + [str(token)])
+        elif token == '-':
+            parent.append(value)
+            self.changes.insert(keys, len(parent) - 1, len(parent))
+        elif token.isdigit() and int(token) <= len(parent):
+            parent.insert(int(token), value)
+            self.changes.insert(keys, int(token), len(parent))
+        else:
+            raise NonexistentTarget(parent)
+
+    def remove(self, path):
+        tokens = self.tokens(path)
+        if not tokens:
+            raise Error('the document cannot be removed')
+        parent, keys = self.walk(tokens)
+        key = self.key(parent, tokens[-1])
+        del parent[key]
+        if isinstance(parent, dict):
+            self.changes.replace(keys + [key])
+        else:
+            self.changes.remove(keys, key, len(parent))
+
+    def replace(self, path, value):
+        tokens = self.tokens(path)
+        value = deepcopy(value)
+        if not tokens:
+            self.document = value
+            self.changes.replace([])
+            return
+        parent, keys = self.walk(tokens)
+        key = self.key(parent, tokens[-1])
+        parent[key] = value
+        self.changes.replace(keys + [key])
+
+    def tokens(self, path):
+        tokens = Pointer(path).tokens
+        if tokens and isinstance(tokens[0], StagesToken):
+            raise Error('relative pointers are not allowed', path)
+        return tokens
+
+    def key(self, obj, token):
+        """Returns the key of token into obj, which must exist."""
+        if isinstance(obj, dict):
+            if token in obj:
+                return str(token)
+        elif isinstance(obj, list):
+            if token.isdigit() and int(token) < len(obj):
+                return int(token)
+        raise NonexistentTarget(obj)
+
+    def walk(self, tokens):
+        """
+        Returns the container of the last token, copied if needed, and the
+        keys leading to it.
+        """
+        obj = self.document = self.own(self.document)
+        keys = []
+        for token in tokens[:-1]:
+            key = self.key(obj, token)
+            child = self.own(obj[key])
+            obj[key] = child
+            obj = child
+            keys.append(key)
+        return obj, keys
+
+    def own(self, obj):
+        """Returns a copy of obj that operations can alter."""
+        if id(obj) in self.owned:
+            return obj
+        if isinstance(obj, dict):
+            obj = dict(obj)
+        elif isinstance(obj, list):
+            obj = list(obj)
+        else:
+            raise NonexistentTarget(obj)
+        self.owned[id(obj)] = obj
+        return obj
+
+
+def revalidate(validator, document, operations, max_errors=None):
+    """
+    Applies operations to a valid document, and validates the result.
+
+    document must be valid against validator, and hold the defaults that
+    it injects, like the documents returned by ``validate()``. Only the
+    modified locations are validated again, so that the cost of a small
+    patch does not depend on the size of document. Draft04 validators are
+    evaluated incrementally, and other validators validate the whole
+    document.
+
+    The result is the one of validating the patched document, which is
+    returned with the defaults of its modified parts, or raises a
+    :class:`ValidationError`. document and operations are not altered.
+
+    :param validator: the validator of document
+    :param document: the document to patch
+    :param operations: the operations of a JSON Patch
+    :param max_errors: stop validation after this many errors
+    :raises jsonspec.operations.Error: an operation cannot be applied
+    """
+    patch = Patch(document)
+    for operation in operations:
+        patch.apply(operation)
+
+    changes = patch.changes
+    if not changes.whole and not patch.owned:
+        # only tests were applied, no container was modified
+        return patch.document
+
+    context = ValidationContext(max_errors=max_errors)
+    obj = evaluate(validator, patch.document, changes, '#', context)
+    if context.errors:
+        raise ValidationError('multiple errors',
+                              obj,
+                              errors=context.errors)
+    return obj
+
+
+def target(validator):
+    """Follows lazy validators and references up to their target."""
+    seen = set()
+    while isinstance(validator, (LazyValidator, ReferenceValidator)) \
+            and validator not in seen:
+        seen.add(validator)
+        validator = validator.validator
+    return validator
+
+
+def evaluate(validator, obj, changes, pointer, context):
+    """
+    Evaluates the changes of obj, like ``validator.evaluate()`` evaluates
+    obj as a whole.
+    """
+    validator = target(validator)
+    if changes.whole or type(validator) is not Draft04Validator \
+            or not isinstance(obj, (dict, list)) \
+            or any(name in validator.attrs for name in branching):
+        return validator.evaluate(obj, pointer, context)
+
+    for member in validator.attrs.get('all_of', []):
+        obj = conjunct(member, obj, changes, context)
+        if context.stopped:
+            return obj
+
+    if isinstance(obj, list):
+        validators = (evaluate_items,
+                      skip(validator.validate_max_items),
+                      skip(validator.validate_min_items),
+                      skip(validator.validate_unique_items))
+    else:
+        validators = (skip(validator.validate_required),
+                      skip(validator.validate_max_properties),
+                      skip(validator.validate_min_properties),
+                      evaluate_dependencies,
+                      evaluate_properties,
+                      skip(validator.validate_default_properties))
+
+    for validate in validators:
+        obj = validate(validator, obj, changes, pointer, context)
+        if context.stopped:
+            return obj
+    return obj
+
+
+def skip(validate):
+    """Adapts a keyword which checks obj as a whole, whatever changed."""
+    def evaluate(validator, obj, changes, pointer, context):
+        return validate(obj, pointer, context)
+    return evaluate
+
+
+def conjunct(validator, obj, changes, context):
+    """Evaluates the changes of obj at the root, like allOf does."""
+    path, context.path = context.path, []
+    try:
+        return evaluate(validator, obj, changes, '#', context)
+    finally:
+        context.path = path
+
+
+def evaluate_child(validator, validated, obj, key, changes, pointer,
+                   context):
+    element = validated[key]
+    context.path.append(key)
+    value = evaluate(validator, element, changes, pointer, context)
+    context.path.pop()
+    if value is not element:
+        validated = set_item(validated, obj, key, value)
+    return validated
+
+
+def evaluate_dependencies(validator, obj, changes, pointer, context):
+    for key, dependencies in validator.attrs.get('dependencies', {}).items():
+        if key in obj:
+            if isinstance(dependencies, sequence_types):
+                for dep in set(dependencies):
+                    if dep not in obj:
+                        validator.fail('Missing property', obj, pointer,
+                                       context)
+                        if context.stopped:
+                            break
+            elif key in changes.children:
+                # obj may have matched none of its properties so far
+                context.evaluate(dependencies, obj, '#')
+            else:
+                conjunct(dependencies, obj, changes, context)
+            if context.stopped:
+                break
+    return obj
+
+
+def evaluate_properties(validator, obj, changes, pointer, context):
+    properties = validator.attrs['properties']
+    additionals = validator.attrs['additional_properties']
+    matcher = validator.key_matcher
+    validated = obj
+    forbidden = False
+
+    # other members were validated already
+    for name, child in changes.children.items():
+        if name not in obj:
+            continue
+        validators = list(matcher(name))
+        if name in properties:
+            validators.insert(0, properties[name])
+        elif not validators:
+            if additionals is False:
+                forbidden = True
+                continue
+            if additionals is True:
+                continue
+            validators = [additionals]
+        for sub in validators:
+            validated = evaluate_child(sub, validated, obj, name, child,
+                                       pointer, context)
+            if context.stopped:
+                return validated
+
+    if forbidden:
+        validator.fail('Forbidden additional properties', obj, pointer,
+                       context)
+    return validated
+
+
+def evaluate_items(validator, obj, changes, pointer, context):
+    if 'items' not in validator.attrs:
+        return obj
+    items = validator.attrs['items']
+    if isinstance(items, (list, tuple)) and changes.spliced:
+        # shifted elements are checked against other subschemas
+        return validator.validate_items(obj, pointer, context)
+
+    additionals = validator.attrs['additional_items']
+    validated = obj
+    for index in sorted(changes.children):
+        if index >= len(obj):
+            continue
+        if not isinstance(items, (list, tuple)):
+            sub = items
+        elif index < len(items):
+            sub = items[index]
+        elif additionals is True:
+            continue
+        elif additionals is False:
+            # reported against the schema uri, not the path
+            path, context.path = context.path, []
+            validator.fail('Forbidden value', obj,
+                           pointer_join(validator.uri, index), context)
+            context.path = path
+            if context.stopped:
+                return validated
+            continue
+        else:
+            sub = additionals
+        validated = evaluate_child(sub, validated, obj, index,
+                                   changes.children[index], pointer, context)
+        if context.stopped:
+            return validated
+    return validated
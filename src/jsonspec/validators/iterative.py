@@ -0,0 +1,640 @@
+"""
+    jsonspec.validators.iterative
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Validates draft03 and draft04 schemas with an explicit stack.
+
+    Compiled validators evaluate their subschemas with nested Python calls,
+    which limits the depth of the documents they can validate to the
+    recursion limit. This engine walks the same validators, but every
+    keyword that evaluates a subschema is a generator suspended on a heap
+    allocated stack, instead of a Python frame.
+
+    A walking generator yields the generator of each subschema to evaluate,
+    and is sent back its result. It yields a 1-tuple holding its own result
+    once done.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['build', 'IterativeValidator']
+
+import logging
+from functools import partial
+from .bases import LazyValidator, ReferenceValidator, ValidationContext
+from .bases import Validator
+from .closures import kind_of
+from .draft03 import Draft03Validator
+from .draft04 import Draft04Validator, sequence_types
+from .exceptions import ValidationError
+from .pointer_util import pointer_join
+from .util import set_item, types_of
+
+logger = logging.getLogger(__name__)
+
+
+def run(frame):
+    """Runs a walking generator to completion, and returns its result.
+
+    :param frame: the generator to run
+    """
+    stack = [frame]
+    value = None
+    while True:
+        step = stack[-1].send(value)
+        if isinstance(step, tuple):
+            stack.pop()
+            value = step[0]
+            if not stack:
+                return value
+        else:
+            stack.append(step)
+            value = None
+
+
+def stream(frame, context):
+    """Runs a walking generator, and yields the errors of context as soon
+    as they are recorded.
+
+    :param frame: the generator to run
+    :param context: the context of its validation
+    """
+    stack = [frame]
+    value = None
+    errors = context.errors
+    reported = 0
+    while stack:
+        step = stack[-1].send(value)
+        if isinstance(step, tuple):
+            stack.pop()
+            value = step[0]
+        else:
+            stack.append(step)
+            value = None
+        while reported < len(errors):
+            yield errors[reported]
+            reported += 1
+
+
+class Walker(object):
+    """
+    Turns validators into walking generators.
+
+    The keywords of each validator are planned once, in the order of its
+    ``evaluate()`` method. Keywords without subschemas are delegated to the
+    validator itself, the others are reimplemented as generators.
+    Validators of other classes, subclasses included, are evaluated as is.
+
+    :ivar plans: the planned keywords, by validator id
+    """
+
+    def __init__(self):
+        self.plans = {}
+        self.planners = {
+            Draft03Validator: self.plan_draft03,
+            Draft04Validator: self.plan_draft04,
+        }
+
+    def walk(self, validator, obj, pointer, context):
+        """Returns the walking generator of validator for obj."""
+        while isinstance(validator, (LazyValidator, ReferenceValidator)):
+            validator = validator.validator
+        try:
+            head, kinds = self.plans[id(validator)][1:]
+        except KeyError:
+            planner = self.planners.get(type(validator))
+            if planner is None:
+                return self.foreign(validator, obj, pointer, context)
+            head, kinds = planner(validator)
+            self.plans[id(validator)] = validator, head, kinds
+        return self.node(head, kinds, obj, pointer, context)
+
+    def foreign(self, validator, obj, pointer, context):
+        yield (validator.evaluate(obj, pointer, context),)
+
+    def node(self, head, kinds, obj, pointer, context):
+        """Applies the planned keywords to obj.
+
+        When head is None, every keyword depends on the kind of obj.
+        """
+        if head is None:
+            head, kinds = kinds.get(kind_of(obj), ()), {}
+        for step, walks in head:
+            if walks:
+                obj = yield step(obj, pointer, context)
+            else:
+                obj = step(obj, pointer, context)
+            if context.stopped:
+                break
+        else:
+            for step, walks in kinds.get(kind_of(obj), ()):
+                if walks:
+                    obj = yield step(obj, pointer, context)
+                else:
+                    obj = step(obj, pointer, context)
+                if context.stopped:
+                    break
+        yield (obj,)
+
+    def plan_draft04(self, validator):
+        attrs = validator.attrs
+
+        def walking(name, method):
+            if name in attrs:
+                return partial(method, validator), True
+            return None
+
+        head = [
+            (validator.validate_enum, False),
+            (validator.validate_type, False),
+            walking('not', self.draft04_not),
+            walking('all_of', self.draft04_all_of),
+            walking('any_of', self.draft04_any_of),
+            walking('one_of', self.draft04_one_of),
+        ]
+        kinds = {
+            'array': [
+                walking('items', self.draft04_items),
+                (validator.validate_max_items, False),
+                (validator.validate_min_items, False),
+                (validator.validate_unique_items, False),
+            ],
+            'number': [
+                (validator.validate_maximum, False),
+                (validator.validate_minimum, False),
+                (validator.validate_multiple_of, False),
+            ],
+            'object': [
+                (validator.validate_required, False),
+                (validator.validate_max_properties, False),
+                (validator.validate_min_properties, False),
+                walking('dependencies', self.draft04_dependencies),
+                walking('properties', self.draft04_properties),
+                (validator.validate_default_properties, False),
+            ],
+            'string': [
+                (validator.validate_max_length, False),
+                (validator.validate_min_length, False),
+                (validator.validate_pattern, False),
+                (validator.validate_format, False),
+            ],
+        }
+        return strip(head), {kind: strip(steps)
+                             for kind, steps in kinds.items()}
+
+    def plan_draft03(self, validator):
+        attrs = validator.attrs
+
+        def walking(name, method):
+            if name in attrs:
+                return partial(method, validator), True
+            return None
+
+        if validator.type_schemas:
+            type_step = walking('type', self.draft03_type)
+        else:
+            type_step = (validator.validate_type, False)
+        if validator.disallow_schemas:
+            disallow_step = walking('disallow', self.draft03_disallow)
+        else:
+            disallow_step = (validator.validate_disallow, False)
+        head = [
+            (validator.validate_enum, False),
+            type_step,
+            disallow_step,
+            walking('extends', self.draft03_extends),
+        ]
+        kinds = {
+            'array': [
+                (validator.validate_max_items, False),
+                (validator.validate_min_items, False),
+                walking('items', self.draft03_items),
+                (validator.validate_unique_items, False),
+            ],
+            'number': [
+                (validator.validate_maximum, False),
+                (validator.validate_minimum, False),
+                (validator.validate_divisible_by, False),
+            ],
+            'object': [
+                walking('dependencies', self.draft03_dependencies),
+                walking('properties', self.draft03_properties),
+            ],
+            'string': [
+                (validator.validate_max_length, False),
+                (validator.validate_min_length, False),
+                (validator.validate_pattern, False),
+                (validator.validate_format, False),
+            ],
+        }
+        kinds[None] = []
+        # draft03 selects its keywords from the kind of the given instance
+        return None, {kind: strip(head + steps)
+                      for kind, steps in kinds.items()}
+
+    def draft04_not(self, validator, obj, pointer, context):
+        branch = context.branch()
+        yield self.walk(validator.attrs['not'], obj, '#', branch)
+        if not branch.failed:
+            validator.fail('Forbidden value', obj, pointer, context)
+        yield (obj,)
+
+    def draft04_all_of(self, validator, obj, pointer, context):
+        path, context.path = context.path, []
+        for subvalidator in validator.attrs['all_of']:
+            obj = yield self.walk(subvalidator, obj, '#', context)
+            if context.stopped:
+                break
+        context.path = path
+        yield (obj,)
+
+    def draft04_any_of(self, validator, obj, pointer, context):
+        validators = validator.attrs['any_of']
+        for index in validator.branch_indexes['any_of'].select(obj):
+            branch = context.branch()
+            validated_obj = yield self.walk(validators[index], obj, '#', branch)  # noqa
+            if not branch.failed:
+                break
+        else:
+            validator.fail('Not in any_of', obj, pointer, context)
+            validated_obj = obj
+        yield (validated_obj,)
+
+    def draft04_one_of(self, validator, obj, pointer, context):
+        validated = 0
+        validators = validator.attrs['one_of']
+        for index in validator.branch_indexes['one_of'].select(obj):
+            branch = context.branch()
+            result = yield self.walk(validators[index], obj, '#', branch)
+            if not branch.failed:
+                validated_obj = result
+                validated += 1
+                if validated > 1:
+                    break
+        if not validated:
+            validator.fail('Validates noone', obj, None, context)
+        elif validated == 1:
+            obj = validated_obj
+        else:
+            validator.fail('Validates more than once', obj, None, context)
+        yield (obj,)
+
+    def draft04_dependencies(self, validator, obj, pointer, context):
+        for key, dependencies in validator.attrs['dependencies'].items():
+            if key in obj:
+                if isinstance(dependencies, sequence_types):
+                    for dep in set(dependencies) - set(obj.keys()):
+                        validator.fail('Missing property', obj, pointer, context)  # noqa
+                        if context.stopped:
+                            break
+                else:
+                    path, context.path = context.path, []
+                    yield self.walk(dependencies, obj, '#', context)
+                    context.path = path
+                if context.stopped:
+                    break
+        yield (obj,)
+
+    def draft04_items(self, validator, obj, pointer, context):
+        items = validator.attrs['items']
+        validated = obj
+        path = context.path
+        if isinstance(items, Validator):
+            for index, element in enumerate(obj):
+                path.append(index)
+                value = yield self.walk(items, element, pointer, context)
+                path.pop()
+                if value is not element:
+                    validated = set_item(validated, obj, index, value)
+                if context.stopped:
+                    break
+            yield (validated,)
+        elif not isinstance(items, (list, tuple)):
+            raise NotImplementedError(items)
+
+        additionals = validator.attrs['additional_items']
+        for index, element in enumerate(obj):
+            if index < len(items):
+                subvalidator = items[index]
+            elif additionals is True:
+                break
+            elif additionals is False:
+                # reported against the schema uri, not the path
+                context.path = []
+                validator.fail('Forbidden value',
+                               obj,
+                               pointer_join(validator.uri, index),
+                               context)
+                context.path = path
+                if context.stopped:
+                    break
+                continue
+            else:
+                subvalidator = additionals
+            path.append(index)
+            value = yield self.walk(subvalidator, element, pointer, context)
+            path.pop()
+            if value is not element:
+                validated = set_item(validated, obj, index, value)
+            if context.stopped:
+                break
+        yield (validated,)
+
+    def draft04_properties(self, validator, obj, pointer, context):
+        if not obj:
+            yield (obj,)
+
+        validated = obj
+        pending = set(obj.keys())
+        path = context.path
+
+        for name, subvalidator in validator.attrs['properties'].items():
+            if name in obj:
+                pending.discard(name)
+                element = validated[name]
+                path.append(name)
+                value = yield self.walk(subvalidator, element, pointer, context)  # noqa
+                path.pop()
+                if value is not element:
+                    validated = set_item(validated, obj, name, value)
+                if context.stopped:
+                    yield (validated,)
+
+        matcher = validator.key_matcher
+        if matcher:
+            for name in obj:
+                validators = matcher(name)
+                if not validators:
+                    continue
+                pending.discard(name)
+                for subvalidator in validators:
+                    element = validated[name]
+                    path.append(name)
+                    value = yield self.walk(subvalidator, element, pointer, context)  # noqa
+                    path.pop()
+                    if value is not element:
+                        validated = set_item(validated, obj, name, value)
+                    if context.stopped:
+                        yield (validated,)
+
+        additionals = validator.attrs['additional_properties']
+        if not pending or additionals is True:
+            yield (validated,)
+
+        if additionals is False:
+            validator.fail('Forbidden additional properties', obj, pointer, context)  # noqa
+            yield (validated,)
+
+        for name in sorted(pending):
+            element = validated[name]
+            path.append(name)
+            value = yield self.walk(additionals, element, pointer, context)
+            path.pop()
+            if value is not element:
+                validated = set_item(validated, obj, name, value)
+            if context.stopped:
+                break
+        yield (validated,)
+
+    def draft03_type(self, validator, obj, pointer, context):
+        names = types_of(obj.__class__)
+        for type in validator.attrs['type']:
+            if isinstance(type, Validator):
+                branch = context.branch()
+                validated_obj = yield self.walk(type, obj, '#', branch)
+                if not branch.failed:
+                    yield (validated_obj,)
+            elif type == 'any' or type in names:
+                yield (obj,)
+        validator.fail('Wrong type', obj, pointer, context)
+        yield (obj,)
+
+    def draft03_disallow(self, validator, obj, pointer, context):
+        disallowed = validator.disallow_matcher.matches(obj)
+        if not disallowed:
+            for subvalidator in validator.disallow_schemas:
+                branch = context.branch()
+                yield self.walk(subvalidator, obj, '#', branch)
+                if not branch.failed:
+                    disallowed = True
+                    break
+        if disallowed:
+            validator.fail('Wrong type', obj, pointer, context)
+        yield (obj,)
+
+    def draft03_extends(self, validator, obj, pointer, context):
+        extends = validator.attrs['extends']
+        if not isinstance(extends, sequence_types):
+            extends = [extends]
+        path, context.path = context.path, []
+        for type in extends:
+            obj = yield self.walk(type, obj, '#', context)
+            if context.stopped:
+                break
+        context.path = path
+        yield (obj,)
+
+    def draft03_dependencies(self, validator, obj, pointer, context):
+        missings = set()
+        for name, dependencies in validator.attrs['dependencies'].items():
+            if name not in obj:
+                continue
+            if isinstance(dependencies, Validator):
+                path, context.path = context.path, []
+                yield self.walk(dependencies, obj, '#', context)
+                context.path = path
+                if context.stopped:
+                    yield (obj,)
+            elif isinstance(dependencies, sequence_types):
+                for d in dependencies:
+                    if d not in obj:
+                        missings.add(d)
+            elif dependencies not in obj:
+                missings.add(dependencies)
+        if missings:
+            validator.fail('Missing properties', obj, pointer, context)
+        yield (obj,)
+
+    def draft03_items(self, validator, obj, pointer, context):
+        items = validator.attrs['items']
+        validated = obj
+        path = context.path
+        if isinstance(items, Validator):
+            for index, element in enumerate(obj):
+                path.append(index)
+                value = yield self.walk(items, element, pointer, context)
+                path.pop()
+                if value is not element:
+                    validated = set_item(validated, obj, index, value)
+                if context.stopped:
+                    break
+            yield (validated,)
+        elif not isinstance(items, (list, tuple)):
+            raise NotImplementedError(items)
+
+        additionals = validator.attrs['additional_items']
+        for index, element in enumerate(obj):
+            if index < len(items):
+                subvalidator = items[index]
+            elif additionals is True:
+                break
+            elif additionals is False:
+                path.append(index)
+                validator.fail('Additional elements are forbidden',
+                               obj,
+                               pointer,
+                               context)
+                path.pop()
+                if context.stopped:
+                    break
+                continue
+            else:
+                subvalidator = additionals
+            path.append(index)
+            value = yield self.walk(subvalidator, element, pointer, context)
+            path.pop()
+            if value is not element:
+                validated = set_item(validated, obj, index, value)
+            if context.stopped:
+                break
+        yield (validated,)
+
+    def draft03_properties(self, validator, obj, pointer, context):
+        validated = set()
+        pending = set(obj.keys())
+        response = obj
+        path = context.path
+
+        for name, subvalidator in validator.attrs['properties'].items():
+            if name in obj:
+                pending.discard(name)
+                element = response[name]
+                path.append(name)
+                value = yield self.walk(subvalidator, element, pointer, context)  # noqa
+                path.pop()
+                if value is not element:
+                    response = set_item(response, obj, name, value)
+                if context.stopped:
+                    yield (response,)
+                validated.add(name)
+            elif not subvalidator.is_optional():
+                validator.fail('Required property', obj, pointer, context)
+                if context.stopped:
+                    yield (response,)
+
+        matcher = validator.key_matcher
+        if matcher:
+            for name in obj:
+                validators = matcher(name)
+                if not validators:
+                    continue
+                pending.discard(name)
+                for subvalidator in validators:
+                    element = response[name]
+                    path.append(name)
+                    value = yield self.walk(subvalidator, element, pointer, context)  # noqa
+                    path.pop()
+                    if value is not element:
+                        response = set_item(response, obj, name, value)
+                    if context.stopped:
+                        yield (response,)
+                validated.add(name)
+
+        additionals = validator.attrs['additional_properties']
+        if not pending or additionals is True:
+            yield (response,)
+
+        if additionals is False:
+            if len(obj) > len(validated):
+                validator.fail('Additional properties are forbidden', obj, pointer, context)  # noqa
+            yield (response,)
+
+        for name, element in obj.items():
+            if name not in validated:
+                path.append(name)
+                value = yield self.walk(additionals, element, pointer, context)  # noqa
+                path.pop()
+                if value is not element:
+                    response = set_item(response, obj, name, value)
+                if context.stopped:
+                    break
+                validated.add(name)
+        yield (response,)
+
+
+def strip(steps):
+    """Drops the keywords that a validator does not declare."""
+    return [step for step in steps if step is not None]
+
+
+class IterativeValidator(Validator):
+    """
+    Validates against a compiled validator, without recursion.
+
+    :ivar validator: the compiled validator
+    :ivar walker: the walker of its subvalidators
+
+    >>> validator = IterativeValidator(load({'minLength': 4}))
+    >>> assert validator('this is sparta')
+    """
+
+    def __init__(self, validator):
+        super(IterativeValidator, self).__init__()
+        self.validator = validator
+        self.uri = validator.uri
+        self.walker = Walker()
+
+    def has_default(self):
+        return self.validator.has_default()
+
+    @property
+    def default(self):
+        return self.validator.default
+
+    def is_optional(self):
+        return self.validator.is_optional()
+
+    def validate(self, obj, pointer=None, max_errors=None):
+        """
+        Validate object against validator.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        :param max_errors: stop validation after this many errors
+        """
+        context = ValidationContext(max_errors=max_errors)
+        obj = self.evaluate(obj, pointer or '#', context)
+        if context.errors:
+            raise ValidationError('multiple errors', obj, errors=context.errors)  # noqa
+        return obj
+
+    def evaluate(self, obj, pointer, context):
+        frame = self.walker.walk(self.validator, obj, pointer, context)
+        return run(frame)
+
+    def iter_errors(self, obj, pointer=None, max_errors=None):
+        """
+        Yields the errors of object, as soon as they are found.
+
+        :param obj: the object to validate
+        :param pointer: the object pointer
+        :param max_errors: the maximum number of errors to look for
+        """
+        context = ValidationContext(max_errors=max_errors)
+        frame = self.walker.walk(self.validator, obj, pointer or '#', context)
+        return stream(frame, context)
+
+
+def build(validator):
+    """Builds an iterative validator of a compiled validator.
+
+    Draft03 and draft04 validators are walked with an explicit stack, and
+    may validate documents nested deeper than the recursion limit.
+
+    :param validator: a validator returned by
+                      :func:`~jsonspec.validators.load`
+    :type validator: Validator
+    :return: a validator which validates the same documents
+    :rtype: IterativeValidator
+    """
+    return IterativeValidator(validator)
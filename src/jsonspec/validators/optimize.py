@@ -0,0 +1,238 @@
+"""
+    jsonspec.validators.optimize
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Rewrites schemas into simpler schemas which accept the same instances.
+
+    The intermediate representation is the schema itself: each pass takes
+    a node, a mapping of keywords, and returns a new node, leaving the
+    original untouched. Subschemas are optimized when they are compiled, so
+    each node is optimized once, by the compiler of its draft.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['Optimizer']
+
+from six import integer_types, string_types
+
+#: keywords which never alter a validation
+annotations = frozenset(['$schema', 'definitions', 'description', 'id',
+                         'title'])
+
+
+def is_zero(value):
+    return isinstance(value, integer_types) \
+        and not isinstance(value, bool) and value == 0
+
+
+class Optimizer(object):
+    """
+    Runs the passes over the nodes of a draft.
+
+    :ivar conjunction: the keyword of subschemas which must all be valid
+    :ivar inert: the keywords ignored when their node is a conjunct,
+                 a dependency, or a branch
+    :ivar everything: the types which, all together, accept any instance
+    :ivar zeros: the keywords which always pass when they are 0
+    :ivar falses: the keywords which always pass when they are false
+    """
+
+    # the keywords of a group depend on each other, and are never merged
+    # with the keywords of another node
+    groups = (
+        frozenset(['properties', 'patternProperties',
+                   'additionalProperties']),
+        frozenset(['items', 'additionalItems']),
+        frozenset(['maximum', 'exclusiveMaximum']),
+        frozenset(['minimum', 'exclusiveMinimum']),
+    )
+
+    def __init__(self, conjunction, inert, everything, zeros, falses):
+        self.conjunction = conjunction
+        self.inert = annotations.union(inert)
+        self.everything = frozenset(everything)
+        self.zeros = frozenset(zeros)
+        self.falses = frozenset(falses)
+        self.passes = [self.unwrap, self.prune, self.merge, self.fold,
+                       self.collapse]
+
+    def __call__(self, schema):
+        if not isinstance(schema, dict) or '$ref' in schema:
+            return schema
+        node = dict(schema)
+        for rewrite in self.passes:
+            node = rewrite(node)
+        return node
+
+    def trivial(self, schema):
+        """Tells if schema accepts any instance, with no side effect."""
+        return isinstance(schema, dict) and self.inert.issuperset(schema)
+
+    def unwrap(self, node):
+        """Turns anyOf and oneOf of one branch into conjuncts."""
+        for keyword in ('anyOf', 'oneOf'):
+            branches = node.get(keyword)
+            if isinstance(branches, list) and len(branches) == 1 \
+                    and isinstance(branches[0], dict):
+                conjuncts = node.get(self.conjunction, [])
+                if isinstance(conjuncts, dict):
+                    conjuncts = [conjuncts]
+                if isinstance(conjuncts, list):
+                    node[self.conjunction] = conjuncts + branches
+                    del node[keyword]
+        return node
+
+    def prune(self, node):
+        """Drops the subschemas which always pass."""
+        conjuncts = node.get(self.conjunction)
+        if isinstance(conjuncts, dict):
+            conjuncts = [conjuncts]
+        if isinstance(conjuncts, list):
+            conjuncts = [sub for sub in conjuncts if not self.trivial(sub)]
+            if conjuncts:
+                node[self.conjunction] = conjuncts
+            else:
+                del node[self.conjunction]
+
+        # the first branch which passes is the one kept
+        branches = node.get('anyOf')
+        if isinstance(branches, list) and branches \
+                and self.trivial(branches[0]):
+            del node['anyOf']
+
+        for keyword in ('additionalItems', 'additionalProperties', 'items'):
+            if self.trivial(node.get(keyword)):
+                node[keyword] = True
+                if keyword == 'items':
+                    del node[keyword]
+                    node.pop('additionalItems', None)
+
+        dependencies = node.get('dependencies')
+        if isinstance(dependencies, dict):
+            node['dependencies'] = dict(
+                (name, sub) for name, sub in dependencies.items()
+                if not self.trivial(sub))
+            if not node['dependencies']:
+                del node['dependencies']
+
+        # other properties are checked by additionalProperties
+        properties = node.get('properties')
+        if isinstance(properties, dict) \
+                and node.get('additionalProperties', True) is True:
+            node['properties'] = dict(
+                (name, sub) for name, sub in properties.items()
+                if not (isinstance(sub, dict) and annotations.issuperset(sub)))  # noqa
+            if not node['properties']:
+                del node['properties']
+        return node
+
+    def merge(self, node):
+        """Merges the compatible conjuncts into their node."""
+        conjuncts = node.get(self.conjunction)
+        if isinstance(conjuncts, dict):
+            conjuncts = [conjuncts]
+        if not isinstance(conjuncts, list):
+            return node
+
+        kept, pending = [], list(reversed(conjuncts))
+        while pending:
+            sub = pending.pop()
+            if not isinstance(sub, dict) or '$ref' in sub or 'id' in sub \
+                    or '$schema' in sub:
+                kept.append(sub)
+                continue
+            sub = self(sub)
+            if '$ref' in sub:
+                kept.append(sub)
+                continue
+            sub = dict((keyword, value) for keyword, value in sub.items()
+                       if keyword not in self.inert)
+            nested = sub.pop(self.conjunction, None)
+            if not self.compatible(node, sub):
+                if nested is not None:
+                    sub[self.conjunction] = nested
+                kept.append(sub)
+                continue
+            for keyword, value in sub.items():
+                if keyword in node:
+                    value = self.union(node[keyword], value)
+                node[keyword] = value
+            if isinstance(nested, dict):
+                pending.append(nested)
+            elif isinstance(nested, list):
+                pending.extend(reversed(nested))
+            elif nested is not None:
+                kept.append({self.conjunction: nested})
+
+        if kept:
+            node[self.conjunction] = kept
+        else:
+            del node[self.conjunction]
+        return node
+
+    def compatible(self, node, sub):
+        """Tells if sub can be merged into node without changing it."""
+        for group in self.groups:
+            mine, theirs = group.intersection(node), group.intersection(sub)
+            if mine and theirs and (mine, theirs) != (set(['properties']),) * 2:  # noqa
+                return False
+        for keyword, value in sub.items():
+            if keyword not in node:
+                continue
+            if keyword in ('properties', 'dependencies'):
+                if not isinstance(value, dict) \
+                        or not isinstance(node[keyword], dict) \
+                        or set(value).intersection(node[keyword]):
+                    return False
+            elif keyword != 'required' \
+                    or not isinstance(value, list) \
+                    or not isinstance(node[keyword], list):
+                return False
+        return True
+
+    def union(self, value, other):
+        if isinstance(value, dict):
+            merged = dict(value)
+            merged.update(other)
+            return merged
+        return value + [name for name in other if name not in value]
+
+    def fold(self, node):
+        """Drops the checks which always pass."""
+        for keyword in self.zeros.intersection(node):
+            if is_zero(node[keyword]):
+                del node[keyword]
+        for keyword in self.falses.intersection(node):
+            if node[keyword] is False:
+                del node[keyword]
+
+        if node.get('additionalProperties') is True:
+            del node['additionalProperties']
+
+        # additionalItems only applies after an array of items
+        if isinstance(node.get('additionalItems'), (bool, dict)) \
+                and not isinstance(node.get('items'), list):
+            del node['additionalItems']
+
+        types = node.get('type')
+        if isinstance(types, string_types):
+            types = [types]
+        if isinstance(types, list) \
+                and all(name in types for name in self.everything):
+            del node['type']
+        return node
+
+    def collapse(self, node):
+        """Turns a node which only references another into a reference."""
+        conjuncts = node.get(self.conjunction)
+        # the id of the reference would change the uri it resolves
+        if isinstance(conjuncts, list) and len(conjuncts) == 1 \
+                and isinstance(conjuncts[0], dict) \
+                and '$ref' in conjuncts[0] and 'id' not in conjuncts[0] \
+                and annotations.issuperset(set(node) - set([self.conjunction])):  # noqa
+            reference = {'$ref': conjuncts[0]['$ref']}
+            if 'id' in node:
+                reference['id'] = node['id']
+            return reference
+        return node
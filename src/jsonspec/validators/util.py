@@ -11,13 +11,16 @@ __all__ = []
 import logging
 import re
 import time
-from copy import deepcopy
+from collections import OrderedDict
+from copy import copy, deepcopy
 from decimal import Decimal
 from datetime import tzinfo, timedelta, datetime, date
 from six import text_type
 from six import integer_types
+from six import string_types
 from six.moves.urllib.parse import urlparse
-from .exceptions import ValidationError
+from threading import Lock
+from .exceptions import CompilationError, ValidationError
 
 number_types = (integer_types, float, Decimal)
 
@@ -77,6 +80,466 @@ def uncamel(name):
     return response
 
 
+#: tags of the canonical forms of scalars, by type.
+#: strings and null are their own canonical form.
+scalar_tags = {bool: bool, type(None): None, float: Decimal, Decimal: Decimal}
+scalar_tags.update((cls, None) for cls in string_types)
+scalar_tags.update((cls, Decimal) for cls in integer_types)
+
+
+def canonical(obj):
+    """returns a hashable form of a json value
+
+    Two values have the same canonical form when they are equal for json
+    schema: objects regardless of the order of their keys, numbers by
+    their value (``1 == 1.0``), but booleans are not numbers.
+
+    >>> canonical({'a': [1, True]}) == canonical({'a': [1.0, True]})
+    True
+    >>> canonical(True) == canonical(1)
+    False
+    """
+    cls = obj.__class__
+    if cls in scalar_tags:
+        tag = scalar_tags[cls]
+        return obj if tag is None else (tag, obj)
+    if isinstance(obj, dict):
+        return (dict, frozenset([(key, canonical(value))
+                                 for key, value in obj.items()]))
+    if isinstance(obj, (list, tuple)):
+        return (list, tuple([canonical(element) for element in obj]))
+    if isinstance(obj, string_types):
+        return obj
+    if isinstance(obj, bool):
+        return (bool, obj)
+    if isinstance(obj, number_types):
+        return (Decimal, obj)
+    try:
+        hash(obj)
+    except TypeError:
+        return (cls, repr(obj))
+    return (cls, obj)
+
+
+def has_duplicates(elements):
+    """tells if some elements are equal, in one pass
+
+    >>> has_duplicates([{'a': 1, 'b': 2}, {'b': 2, 'a': 1.0}])
+    True
+    >>> has_duplicates([1, True, '1'])
+    False
+    """
+    seen = set()
+    for element in elements:
+        key = canonical(element)
+        if key in seen:
+            return True
+        seen.add(key)
+    return False
+
+
+class ValueSet(object):
+    """set of json values, with constant time membership
+
+    Scalars are looked up by their canonical form, objects and arrays into
+    a separate index, so that looking up a scalar never hashes a container.
+
+    >>> values = ValueSet([1, 'foo', {'bar': [2]}])
+    >>> 1.0 in values, True in values, {'bar': [2.0]} in values
+    (True, False, True)
+
+    :ivar values: the original values, in order
+    """
+
+    __slots__ = ('values', 'scalars', 'containers')
+
+    def __init__(self, values):
+        self.values = list(values)
+        scalars, containers = set(), set()
+        for value in self.values:
+            if isinstance(value, (dict, list, tuple)):
+                containers.add(canonical(value))
+            else:
+                scalars.add(canonical(value))
+        self.scalars = frozenset(scalars)
+        self.containers = frozenset(containers)
+
+    def __contains__(self, obj):
+        if isinstance(obj, (dict, list, tuple)):
+            return bool(self.containers) and canonical(obj) in self.containers
+        return canonical(obj) in self.scalars
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'ValueSet({!r})'.format(self.values)
+
+
+#: json type names of the instances of python types.
+#: it is extended the first time an other type is looked up.
+json_types = {
+    bool: frozenset(['boolean']),
+    float: frozenset(['number']),
+    Decimal: frozenset(['number']),
+    dict: frozenset(['object']),
+    list: frozenset(['array']),
+    set: frozenset(['array']),
+    tuple: frozenset(['array']),
+    type(None): frozenset(['null']),
+}
+json_types.update((cls, frozenset(['integer', 'number']))
+                  for cls in integer_types)
+json_types.update((cls, frozenset(['string'])) for cls in string_types)
+
+
+def types_of(cls):
+    """returns the json type names of the instances of cls
+
+    >>> sorted(types_of(int)), sorted(types_of(bool))
+    (['integer', 'number'], ['boolean'])
+    """
+    try:
+        return json_types[cls]
+    except KeyError:
+        pass
+    if issubclass(cls, bool):
+        names = ['boolean']
+    elif issubclass(cls, integer_types):
+        names = ['integer', 'number']
+    elif issubclass(cls, number_types):
+        names = ['number']
+    elif issubclass(cls, (list, set, tuple)):
+        names = ['array']
+    elif issubclass(cls, dict):
+        names = ['object']
+    elif issubclass(cls, string_types):
+        names = ['string']
+    else:
+        names = []
+    json_types[cls] = frozenset(names)
+    return json_types[cls]
+
+
+class TypeMatcher(object):
+    """tells if instances match some json type names
+
+    The verdict of each python type is computed once, booleans being told
+    apart from integers at that time, so that matching an instance is a
+    single lookup.
+
+    >>> matcher = TypeMatcher(['integer', 'null'])
+    >>> matcher.matches(12), matcher.matches(True), matcher.matches(None)
+    (True, False, True)
+
+    :param names: the json type names
+    :param wildcard: a name which matches every instance, like ``any``
+    """
+
+    __slots__ = ('names', 'everything', 'allowed')
+
+    def __init__(self, names, wildcard=None):
+        self.names = frozenset(names)
+        self.everything = wildcard is not None and wildcard in self.names
+        self.allowed = {}
+        for cls in list(json_types):
+            self.allow(cls)
+
+    def allow(self, cls):
+        allowed = self.everything or not self.names.isdisjoint(types_of(cls))
+        self.allowed[cls] = allowed
+        return allowed
+
+    def matches(self, obj):
+        try:
+            return self.allowed[obj.__class__]
+        except KeyError:
+            return self.allow(obj.__class__)
+
+
+#: type matchers shared by validators, by names and wildcard
+type_matchers = {}
+
+
+def type_matcher(names, wildcard=None):
+    """returns the shared :class:`TypeMatcher` of names
+
+    >>> type_matcher(['null']) is type_matcher(('null',))
+    True
+    """
+    key = frozenset(names), wildcard
+    try:
+        return type_matchers[key]
+    except KeyError:
+        return type_matchers.setdefault(key, TypeMatcher(*key))
+
+
+class EmptyMapping(dict):
+    """an empty dict which cannot be filled
+
+    It stands for the missing mappings of validators, like ``properties``,
+    so that they all share the same one.
+
+    >>> empty['foo'] = 'bar'
+    Traceback (most recent call last):
+        ...
+    TypeError: empty mapping is read only
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('empty mapping is read only')
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+#: shared by the validators which do not declare a mapping
+empty = EmptyMapping()
+
+
+class Divisor(object):
+    """tells if numbers are multiple of a factor, as decimals would
+
+    The factor is written as ``units / scale`` once, so that integers are
+    checked with integer arithmetic, and floats which are close enough to
+    a multiple of ``1 / scale`` by comparing their scaled integers. Other
+    values fall back to :class:`~decimal.Decimal`.
+
+    >>> divisor = Divisor(0.01)
+    >>> divisor.divides(12), divisor.divides(0.07), divisor.divides(0.075)
+    (True, True, False)
+
+    :ivar factor: the original factor
+    """
+
+    #: floats are scaled only while their integer part is exact enough
+    #: to tell apart every multiple of ``1 / scale``.
+    max_scaled = 2 ** 50
+
+    __slots__ = ('factor', 'decimal', 'scale', 'units', 'fast')
+
+    def __init__(self, factor):
+        self.factor = factor
+        self.decimal = Decimal(str(factor))
+        exponent = self.decimal.as_tuple()[2]
+        if isinstance(exponent, integer_types) and exponent < 0:
+            self.scale = 10 ** -exponent
+        else:
+            self.scale = 1
+        self.units = int(self.decimal * self.scale)
+        self.fast = self.units != 0 and self.scale <= 10 ** 15
+
+    def divides(self, obj):
+        cls = obj.__class__
+        if cls is float and self.fast:
+            scaled = obj * self.scale
+            if -self.max_scaled < scaled < self.max_scaled:
+                rounded = round(scaled)
+                # only an exact decimal of scale digits can be a multiple
+                if rounded / self.scale != obj:
+                    return False
+                return rounded % self.units == 0
+        elif cls in integer_types and self.fast:
+            return obj * self.scale % self.units == 0
+        return Decimal(str(obj)) % self.decimal == 0
+
+    def __repr__(self):
+        return 'Divisor({!r})'.format(self.factor)
+
+
+class Numbering(object):
+    """
+    Numbers json values by structure.
+
+    Each value is numbered from its keys, scalars and the numbers of its
+    members, so that structurally identical values get the same number,
+    and each value is numbered once whatever the number of values it
+    belongs to. Values are kept, so that their ids are not reused.
+
+    :ivar mark: tells if a value is marked. The values containing a marked
+                value are marked too.
+    :ivar structures: numbers by structure
+    :ivar numbers: numbers by id of value, with the value they belong to
+    """
+
+    # 1, 1.0 and true are equal, but they are not the same json
+    scalars = tuple(set(string_types + integer_types +
+                        (text_type, float, bool, type(None))))
+
+    def __init__(self, mark=None):
+        self.mark = mark
+        self.structures = {}
+        self.numbers = {}
+
+    def number(self, obj):
+        """
+        Returns the number of obj, and tells if it is marked,
+        or None if obj is not plain json.
+        """
+        entry = self.numbers.get(id(obj))
+        if entry is not None:
+            return entry[1]
+        # recursive values are not plain json
+        self.numbers[id(obj)] = obj, None
+
+        parts = []
+        marked = bool(self.mark and self.mark(obj))
+        if isinstance(obj, dict):
+            items = obj.items()
+        else:
+            items = enumerate(obj)
+        for key, member in items:
+            if member.__class__ in self.scalars:
+                parts.append((key, member.__class__, member))
+            elif isinstance(member, (dict, list, tuple)):
+                numbered = self.number(member)
+                if numbered is None:
+                    return None
+                parts.append((key, numbered[0]))
+                marked = marked or numbered[1]
+            else:
+                return None
+
+        structure = isinstance(obj, dict), frozenset(parts)
+        number = self.structures.setdefault(structure, len(self.structures))
+        self.numbers[id(obj)] = obj, (number, marked)
+        return number, marked
+
+
+def set_item(obj, source, key, value):
+    """sets key of obj to value, without altering source
+
+    obj is shallow copied from source the first time it is written, so
+    that only the modified paths of a document are ever copied.
+
+    >>> source = {'foo': 1}
+    >>> obj = set_item(source, source, 'bar', 2)
+    >>> obj == {'foo': 1, 'bar': 2}, source == {'foo': 1}
+    (True, True)
+    >>> set_item(obj, source, 'baz', 3) is obj
+    True
+    """
+    if obj is source:
+        if isinstance(obj, dict):
+            obj = copy(obj)
+        else:
+            obj = list(obj)
+    obj[key] = value
+    return obj
+
+
+class RegexCache(object):
+    """Bounded cache of compiled regular expressions.
+
+    It is shared by every validator of the process, so that a pattern used
+    by many schemas is compiled once, without relying on the small cache of
+    the re module.
+
+    :ivar maxsize: the maximum number of regexes kept
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.regexes = OrderedDict()
+        self.lock = Lock()
+
+    def __call__(self, pattern):
+        """returns the compiled regex of pattern
+
+        :raises re.error: pattern is invalid
+        """
+        if not isinstance(pattern, string_types):
+            # already compiled
+            return pattern
+        with self.lock:
+            regex = self.regexes.pop(pattern, None)
+            if regex is not None:
+                self.regexes[pattern] = regex
+                return regex
+        regex = re.compile(pattern)
+        with self.lock:
+            self.regexes[pattern] = regex
+            while len(self.regexes) > self.maxsize:
+                self.regexes.popitem(last=False)
+        return regex
+
+    def __len__(self):
+        return len(self.regexes)
+
+    def clear(self):
+        with self.lock:
+            self.regexes.clear()
+
+
+#: regexes shared by validators
+regexes = RegexCache()
+
+
+def compile_regex(pattern, schema=None):
+    """compiles pattern, through the shared cache
+
+    >>> compile_regex('^foo').search('foobar') is not None
+    True
+
+    :raises CompilationError: pattern is invalid
+    """
+    try:
+        return regexes(pattern)
+    except re.error as error:
+        raise CompilationError('invalid pattern {!r}: {}'.format(pattern,
+                                                                 error),
+                               schema)
+
+
+class KeyMatcher(object):
+    """Classifies property names against the regexes of patternProperties.
+
+    Objects of a kind tend to reuse the same property names, so the
+    values matching a name are memoized, and each regex runs once per
+    distinct name instead of once per property of every object.
+
+    >>> matcher = KeyMatcher([(compile_regex('^a'), 1),
+    ...                       (compile_regex('b$'), 2)])
+    >>> matcher('ab'), matcher('ac'), matcher('cd')
+    ((1, 2), (1,), ())
+
+    :ivar patterns: list of (regex, value)
+    :ivar maxsize: the maximum number of memoized names
+    """
+
+    __slots__ = ('patterns', 'maxsize', 'memo')
+
+    def __init__(self, patterns, maxsize=4096):
+        self.patterns = list(patterns)
+        self.maxsize = maxsize
+        self.memo = {}
+
+    def __call__(self, name):
+        """returns the values which regex matches name, in order"""
+        try:
+            return self.memo[name]
+        except KeyError:
+            pass
+        matches = tuple(value for regex, value in self.patterns
+                        if regex.search(name))
+        if len(self.memo) >= self.maxsize:
+            self.memo.clear()
+        self.memo[name] = matches
+        return matches
+
+    def __len__(self):
+        return len(self.patterns)
+
+
+#: shared by the validators without patternProperties
+no_patterns = KeyMatcher([])
+
+
 class offset(tzinfo):
     def __init__(self, value):
         self.value = value
@@ -3,7 +3,7 @@
     ~~~~~
 """
 
-__all__ = ['fixture', 'fixture_dirname', 'TestCase']
+__all__ = ['fixture', 'fixture_dirname', 'outcome', 'TestCase']
 
 import json
 import logging
@@ -11,6 +11,7 @@ import os.path
 import unittest
 from functools import wraps
 from contextlib import contextmanager
+from jsonspec.validators import ValidationError
 
 logging.basicConfig(level=logging.INFO)
 
@@ -32,5 +33,14 @@ def move_cwd():
     os.chdir(cwd)
 
 
+def outcome(func, *args, **kwargs):
+    """Returns the result of func, or the errors that it raises, so that
+    validators can be compared."""
+    try:
+        return 'valid', func(*args, **kwargs)
+    except ValidationError as error:
+        return 'invalid', error.flatten()
+
+
 class TestCase(unittest.TestCase):
     pass
@@ -0,0 +1,78 @@
+"""
+    tests.tests_branches
+    ~~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import pytest
+from jsonspec.validators import load
+from jsonspec.validators.closures import build
+
+
+schema = {
+    'oneOf': [
+        {
+            'type': 'object',
+            'properties': {'kind': {'enum': ['circle']}},
+            'required': ['kind', 'radius'],
+        },
+        {
+            'type': 'object',
+            'properties': {'kind': {'enum': ['square', 'rect']}},
+            'required': ['kind'],
+        },
+        {
+            'type': 'object',
+            'properties': {'size': {'type': 'integer'}},
+            'required': ['size'],
+        },
+        {'type': 'string'},
+    ]
+}
+
+
+def test_select():
+    index = load(schema).branch_indexes['one_of']
+    assert index.key == 'kind'
+    assert index.select({'kind': 'circle', 'radius': 1}) == [0]
+    assert index.select({'kind': 'circle'}) == []
+    assert index.select({'kind': 'rect', 'size': 2}) == [1, 2]
+    assert index.select({'kind': 'triangle', 'size': 2}) == [2]
+    assert index.select({'size': 2}) == [2]
+    assert index.select('foo') == [3]
+    assert index.select(12) == []
+
+
+@pytest.mark.parametrize('engine', [lambda v: v, build])
+@pytest.mark.parametrize('document, valid', [
+    ({'kind': 'circle', 'radius': 1}, True),
+    ({'kind': 'circle'}, False),
+    ({'kind': 'rect'}, True),
+    ({'kind': 'rect', 'size': 2}, False),
+    ({'kind': 'triangle', 'size': 2}, True),
+    ('foo', True),
+    (12, False),
+])
+def test_one_of(engine, document, valid):
+    assert engine(load(schema)).is_valid(document) == valid
+
+
+def test_any_of_defaults():
+    validator = load({
+        'anyOf': [
+            {
+                'properties': {
+                    'kind': {'enum': ['a']},
+                    'foo': {'default': 'a'},
+                },
+            },
+            {
+                'properties': {
+                    'kind': {'enum': ['b']},
+                    'foo': {'default': 'b'},
+                },
+            },
+        ]
+    })
+    assert validator.validate({'kind': 'b'}) == {'kind': 'b', 'foo': 'b'}
+    assert validator.validate({}) == {'foo': 'a'}
@@ -0,0 +1,96 @@
+"""
+    tests.tests_cache
+    ~~~~~~~~~~~~~~~~~
+
+"""
+
+from jsonspec.validators import load, Factory, ValidatorCache
+
+
+def test_hits():
+    cache = ValidatorCache()
+    factory = Factory(cache=cache)
+    first = factory({'type': 'string', 'minLength': 2}, '#')
+    second = factory({'minLength': 2, 'type': 'string'}, '#')
+    assert first is second
+    assert factory({'type': 'string', 'minLength': 3}, '#') is not first
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['entries'] == 2
+
+
+def test_identity():
+    cache = ValidatorCache()
+    schema = {'$ref': 'http://example.com/foo'}
+    first = Factory({'http://example.com/foo': {}}, cache=cache)(schema, '#')
+    second = Factory({'http://example.com/foo': {}}, cache=cache)(schema, '#')
+    assert first is not second
+    assert Factory(cache=cache)(schema, '#') is Factory(cache=cache)(schema, '#')  # noqa
+    draft03 = 'http://json-schema.org/draft-03/schema#'
+    assert Factory(spec=draft03, cache=cache)({}, '#') is not \
+        Factory(cache=cache)({}, '#')
+
+
+def test_eviction():
+    cache = ValidatorCache(maxsize=2)
+    factory = Factory(cache=cache)
+    for length in range(4):
+        factory({'minLength': length}, '#')
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 2
+
+    cache = ValidatorCache(maxbytes=40)
+    factory = Factory(cache=cache)
+    factory({'minLength': 1}, '#')
+    factory({'enum': ['a' * 20]}, '#')
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] <= 40
+
+
+def test_isolation():
+    schema = {
+        'definitions': {'foo': {'type': 'string'}},
+        'properties': {'bar': {'$ref': '#/definitions/foo'}},
+    }
+    validator = load(schema, cache=True)
+    schema['definitions']['foo']['type'] = 'integer'
+    assert validator.is_valid({'bar': 'baz'})
+    assert not load(schema, cache=True).is_valid({'bar': 'baz'})
+
+
+def test_disabled():
+    factory = Factory(cache=False)
+    assert factory({}, '#') is not factory({}, '#')
+
+
+def test_opt_in():
+    schema = {'type': 'string', 'minLength': 2}
+    assert Factory()(schema, '#') is not Factory()(schema, '#')
+    assert load(schema) is not load(schema)
+    assert Factory(cache=True)(schema, '#') is Factory(cache=True)(schema, '#')  # noqa
+    assert load(schema, cache=True) is load(schema, cache=True)
+    assert load(schema, cache=True) is not load(schema)
+
+
+def test_shared_references():
+    schema = {
+        'definitions': {
+            'address': {'type': 'string'},
+            'node': {
+                'properties': {
+                    'next': {'$ref': '#/definitions/node'},
+                },
+            },
+        },
+        'properties': dict(('a%d' % i, {'$ref': '#/definitions/address'})
+                           for i in range(20)),
+        'items': {'$ref': '#/definitions/node'},
+    }
+    validator = Factory(cache=False)(schema, '#')
+    targets = set(id(v.validator)
+                  for v in validator.attrs['properties'].values())
+    assert len(targets) == 1
+
+    node = validator.attrs['items'].validator
+    assert node.attrs['properties']['next'].validator is node
@@ -0,0 +1,100 @@
+"""
+    tests.tests_closures
+    ~~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import pytest
+from jsonspec.validators import load, ValidationError, CompilationError
+from jsonspec.validators.closures import build
+from .test_draft04 import provider, scenarios
+
+
+@pytest.mark.parametrize('schema, description, data, valid, src', scenarios('draft4'))
+def test_common(schema, description, data, valid, src):
+    try:
+        build(load(schema, provider=provider)).validate(data)
+        if not valid:
+            assert False, description
+    except (ValidationError, CompilationError) as error:
+        if valid:
+            assert False, description
+
+
+schema = {
+    'definitions': {
+        'node': {
+            'type': 'object',
+            'properties': {
+                'foo': {
+                    'type': 'integer',
+                    'minimum': -2,
+                    'maximum': 12,
+                },
+                'bar': {
+                    'type': 'string',
+                    'default': 'baz'
+                },
+                'next': {'$ref': '#/definitions/node'},
+            },
+            'required': ['foo'],
+        }
+    },
+    'allOf': [{'$ref': '#/definitions/node'}],
+    'properties': {
+        'foo': {},
+        'bar': {},
+        'next': {},
+    },
+    'additionalProperties': False
+}
+
+scenarii = [
+    ({'foo': 1}, True),
+    ({'foo': 1, 'next': {'foo': 2, 'next': {'foo': 3}}}, True),
+    ({'foo': 1, 'next': {'foo': 42}}, False),
+    ({'foo': 1, 'quux': True}, False),
+    ({'bar': 'foo'}, False),
+    ('foo', False),
+]
+
+
+@pytest.mark.parametrize('document, valid', scenarii)
+def test_same_results(document, valid):
+    validator = load(schema)
+    compiled = build(validator)
+    try:
+        expected = validator.validate(document)
+    except ValidationError as error:
+        assert not valid
+        with pytest.raises(ValidationError) as info:
+            compiled.validate(document)
+        assert info.value.flatten() == error.flatten()
+    else:
+        assert valid
+        assert compiled.validate(document) == expected
+
+
+def test_defaults():
+    validator = build(load({
+        'anyOf': [
+            {'properties': {'foo': {'default': 1}}, 'required': ['bar']},
+            {'properties': {'baz': {'default': 2}}},
+        ]
+    }))
+    document = {}
+    assert validator.validate(document) == {'baz': 2}
+    assert document == {}
+
+
+def test_nested_one_of():
+    validator = load({
+        'properties': {
+            'foo': {'oneOf': [{'type': 'string'}, {'type': 'integer'}]},
+        },
+    })
+    with pytest.raises(ValidationError) as expected:
+        validator.validate({'foo': None})
+    with pytest.raises(ValidationError) as info:
+        build(validator).validate({'foo': None})
+    assert info.value.flatten() == expected.value.flatten()
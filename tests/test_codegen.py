@@ -0,0 +1,113 @@
+"""
+    tests.tests_codegen
+    ~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import types
+import pytest
+from jsonspec.validators import load, ValidationError, CompilationError
+from jsonspec.validators.codegen import generate
+from .test_draft04 import provider, scenarios
+from . import outcome
+
+
+def module(validator):
+    mod = types.ModuleType('generated')
+    exec(compile(generate(validator), 'generated', 'exec'), mod.__dict__)
+    return mod
+
+
+@pytest.mark.parametrize('schema, description, data, valid, src', scenarios('draft4'))
+def test_common(schema, description, data, valid, src):
+    try:
+        module(load(schema, provider=provider)).validate(data)
+        if not valid:
+            assert False, description
+    except (ValidationError, CompilationError) as error:
+        if valid:
+            assert False, description
+
+
+@pytest.mark.parametrize('schema, description, data, valid, src', scenarios('draft4'))
+def test_same_errors(schema, description, data, valid, src):
+    try:
+        validator = load(schema, provider=provider)
+        expected = outcome(validator.validate, data)
+    except (CompilationError, ValidationError):
+        pytest.skip('not supported')
+    mod = module(validator)
+    assert outcome(mod.validate, data) == expected, description
+
+
+def test_generate():
+    mod = module(load({
+        'definitions': {
+            'node': {
+                'type': 'object',
+                'properties': {
+                    'value': {'type': 'integer', 'default': 0},
+                    'next': {'$ref': '#/definitions/node'},
+                },
+                'maxProperties': 2
+            }
+        },
+        '$ref': '#/definitions/node'
+    }))
+
+    document = {'next': {'next': {}}}
+    assert mod.validate(document) == {
+        'value': 0,
+        'next': {'value': 0, 'next': {'value': 0}}
+    }
+    assert document == {'next': {'next': {}}}
+    with pytest.raises(ValidationError) as info:
+        mod.validate({'next': {'value': 'foo', 'bar': 'baz', 'next': {}}})
+    assert info.value.flatten() == {
+        '#/next': {'Too many properties'},
+        '#/next/value': {'Wrong type'},
+    }
+
+
+def test_invalid_pattern():
+    with pytest.raises(CompilationError):
+        generate(load({'pattern': '('}))
+
+
+def test_one_of_errors():
+    validator = load({
+        'properties': {
+            'foo': {'oneOf': [{'type': 'string'}, {'type': 'integer'}]},
+            'bar': {'oneOf': [{}, {'type': 'integer'}]},
+        },
+    })
+    document = {'foo': None, 'bar': 1}
+    with pytest.raises(ValidationError) as expected:
+        validator.validate(document)
+    with pytest.raises(ValidationError) as info:
+        module(validator).validate(document)
+    assert sorted((error.pointer, error.args[0])
+                  for error in info.value.errors) == \
+        sorted((error.pointer, error.args[0])
+               for error in expected.value.errors)
+
+
+def test_pattern_properties():
+    validator = load({
+        'patternProperties': {'^a': {'type': 'integer'}, 'b$': {'minimum': 2}},
+        'additionalProperties': {'type': 'string'},
+    })
+    source = generate(validator)
+    assert source.count('KeyMatcher([') == 1
+    assert '.search(name)' not in source
+
+    document = {'ab': 1, 'a': 'foo', 'c': 2, 'd': 'bar'}
+    with pytest.raises(ValidationError) as expected:
+        validator.validate(document)
+    with pytest.raises(ValidationError) as info:
+        module(validator).validate(document)
+    assert info.value.flatten() == expected.value.flatten() == {
+        '#/ab': {'Too small'},
+        '#/a': {'Wrong type'},
+        '#/c': {'Wrong type'},
+    }
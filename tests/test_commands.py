@@ -54,6 +54,8 @@ scenarii = [
     #
     ("""json validate --schema-file=fixtures/three.schema.json < fixtures/three.data1.json""", False),
     ("""json validate --schema-file=fixtures/three.schema.json < fixtures/three.data2.json""", True),
+    ("""json compile --schema-file=fixtures/three.schema.json""", True),
+    ("""json compile --schema-json='{"pattern": "("}'""", False),
 ]
 
 
@@ -133,3 +135,16 @@ def test_cli_copy(pointer, document, target, success, result):
     doc = json.dumps(document)
     cmd = cli.CopyCommand()
     runner(cmd, [pointer, '--document-json', doc, '--target-pointer', target], success, result)
+
+
+def test_cli_compile(capsys, tmpdir):
+    schema = json.dumps({'type': 'string'})
+    cmd = cli.CompileCommand()
+    source = cmd(cmd.parse_args(['--schema-json', schema]))
+    assert capsys.readouterr()[0] == source
+    assert 'def validate(' in source
+
+    output = tmpdir.join('validator.py')
+    cmd(cmd.parse_args(['--schema-json', schema, '--output', str(output)]))
+    assert capsys.readouterr()[0] == ''
+    assert output.read() == source
@@ -0,0 +1,58 @@
+"""
+    tests.tests_compile
+    ~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import json
+import pytest
+from jsonspec.validators import Factory, load
+
+draft03 = 'http://json-schema.org/draft-03/schema#'
+
+
+@pytest.mark.parametrize('spec, schema', [
+    (None, {
+        'properties': {'foo': {'type': ['string'], 'default': {'a': []}}},
+        'patternProperties': {'^q': {'enum': [[1], {'c': 2}]}},
+        'dependencies': {'foo': ['bar'], 'bar': {'required': ['baz']}},
+        'items': [{'allOf': [{'not': {'type': 'null'}}]}],
+    }),
+    (draft03, {
+        'properties': {'foo': {'type': ['string', {'minLength': 2}]}},
+        'dependencies': {'foo': ['bar'], 'bar': {'extends': [{}]}},
+        'disallow': [{'type': 'null'}],
+        'patternProperties': {'^q': {'enum': [[1], {'c': 2}]}},
+    }),
+])
+def test_schema_is_not_altered(spec, schema):
+    dumped = json.dumps(schema, sort_keys=True)
+    validator = Factory(spec=spec, cache=False)(schema, '#')
+    assert json.dumps(schema, sort_keys=True) == dumped
+
+    validator.validate({'foo': 'bar', 'bar': 1, 'baz': 2})
+    schema['properties']['foo']['type'].append('integer')
+    schema['dependencies']['foo'].append('qux')
+    assert not validator.is_valid({'foo': 1})
+    assert validator.is_valid({'foo': 'bar', 'bar': 1, 'baz': 2})
+
+
+def test_deep_schema():
+    schema = {'type': 'integer'}
+    for i in range(300):
+        schema = {'properties': {'foo': schema}}
+    validator = Factory(cache=False)(schema, '#')
+    document = 1
+    for i in range(300):
+        document = {'foo': document}
+    assert validator.is_valid(document)
+
+
+@pytest.mark.parametrize('spec', [None, draft03])
+def test_recursive_reference(spec):
+    validator = load({
+        'type': 'object',
+        'properties': {'foo': {'$ref': '#'}},
+    }, spec=spec)
+    assert validator.is_valid({'foo': {'foo': {}}})
+    assert not validator.is_valid({'foo': {'foo': 1}})
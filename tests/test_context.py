@@ -0,0 +1,228 @@
+"""
+    tests.tests_context
+    ~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import threading
+import pytest
+from jsonspec.validators import load, Factory, ValidationError
+from jsonspec.validators.closures import build
+
+
+schema = {
+    'type': 'object',
+    'properties': {
+        'foo': {'type': 'integer', 'maximum': 12},
+        'bar': {'type': 'string', 'default': 'baz'},
+    },
+    'required': ['foo'],
+}
+
+draft03_schema = {
+    '$schema': 'http://json-schema.org/draft-03/schema#',
+    'type': 'object',
+    'properties': {
+        'foo': {'type': 'integer', 'maximum': 12, 'required': True},
+        'bar': {'type': 'string'},
+    },
+}
+
+scenarii = [
+    ({'foo': 1}, set()),
+    ({'foo': 42}, {'#/foo'}),
+    ({'foo': 'bar'}, {'#/foo'}),
+    ({'bar': 42}, {'#/', '#/bar'}),
+]
+
+
+def errors(validator, document):
+    try:
+        validator.validate(document)
+    except ValidationError as error:
+        return error.flatten()
+    return {}
+
+
+@pytest.mark.parametrize('schema', [schema, draft03_schema])
+def test_validator_is_stateless(schema):
+    validator = load(schema)
+    attrs = dict(validator.attrs)
+    for document, expected in scenarii:
+        assert set(errors(validator, document)) == expected
+    assert validator.attrs == attrs
+    assert not hasattr(validator, 'errors')
+
+
+def test_threads():
+    validator = load(schema)
+    expectations = [(document, errors(validator, document))
+                    for document, _ in scenarii]
+    failures = []
+
+    def run():
+        for _ in range(50):
+            for document, expected in expectations:
+                if errors(validator, document) != expected:
+                    failures.append(document)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not failures
+
+
+def test_all_of_collects_errors():
+    validator = load({
+        'allOf': [{'required': ['foo']}],
+        'properties': {'bar': {'type': 'string'}},
+    })
+    assert errors(validator, {'bar': 42}) == {
+        '#/': {'Missing property'},
+        '#/bar': {'Wrong type'},
+    }
+
+
+def test_no_copy_without_defaults():
+    validator = load(schema)
+    document = {'foo': 1, 'bar': 'qux', 'baz': [{'a': 1}]}
+    assert validator.validate(document) is document
+
+
+def test_copy_on_write():
+    validator = load({
+        'properties': {
+            'foo': {
+                'properties': {'bar': {'default': 42}},
+            },
+            'qux': {'type': 'array'},
+        },
+    })
+    document = {'foo': {}, 'qux': [{'a': 1}]}
+    validated = validator.validate(document)
+    assert validated == {'foo': {'bar': 42}, 'qux': [{'a': 1}]}
+    assert document == {'foo': {}, 'qux': [{'a': 1}]}
+    assert validated['qux'] is document['qux']
+
+
+@pytest.mark.parametrize('schema', [schema, draft03_schema])
+def test_is_valid(schema, monkeypatch):
+    validator = load(schema)
+    created = []
+
+    def init(self, *args, **kwargs):
+        created.append(args)
+    monkeypatch.setattr(ValidationError, '__init__', init)
+
+    for document, expected in scenarii:
+        assert validator.is_valid(document) == (not expected)
+    assert not created
+
+
+def test_is_valid_skips_defaults():
+    validator = load({
+        'allOf': [
+            {'properties': {'foo': {'default': 42}}},
+            {'required': ['foo']},
+        ]
+    })
+    assert validator.validate({}) == {'foo': 42}
+    assert not validator.is_valid({})
+
+
+@pytest.mark.parametrize('engine', [lambda v: v, build])
+def test_one_of_stops_at_second_match(engine):
+    calls = []
+
+    def counted(obj):
+        calls.append(obj)
+        return obj
+    factory = Factory(formats={'counted': counted}, cache=False)
+    validator = engine(factory({
+        'oneOf': [{'format': 'counted'}] * 4,
+        'anyOf': [{'type': 'integer'}, {'format': 'counted'}],
+    }, '#'))
+    with pytest.raises(ValidationError):
+        validator.validate('foo')
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize('schema', [schema, draft03_schema])
+def test_paths(schema):
+    validator = load({
+        '$schema': schema.get('$schema', 'http://json-schema.org/draft-04/schema#'),  # noqa
+        'items': {
+            'properties': {'baz': schema},
+            'additionalProperties': {'items': {'type': 'string'}},
+        },
+    })
+    document = [{'baz': {'foo': 1}}, {'baz': {'foo': 42}, 'qux': ['a', 2]}]
+    assert set(errors(validator, document)) == {'#/1/baz/foo', '#/1/qux/1'}
+    assert validator.validate([{'baz': {'foo': 1}}])
+
+
+def test_message():
+    error = ValidationError('{!r} is not a valid date', 'foo')
+    assert error.message == "'foo' is not a valid date"
+    assert ValidationError('Wrong type', 42).message == 'Wrong type'
+    assert ValidationError('{', 42).message == '{'
+
+
+@pytest.mark.parametrize('schema', [schema, draft03_schema])
+def test_max_errors(schema):
+    validator = load({
+        '$schema': schema.get('$schema', 'http://json-schema.org/draft-04/schema#'),  # noqa
+        'items': schema,
+    })
+    document = [{'foo': 42}] * 1000
+    with pytest.raises(ValidationError) as info:
+        validator.validate(document, max_errors=3)
+    assert len(info.value.errors) == 3
+    assert len(errors(validator, document)) == 1000
+
+
+def test_iter_errors():
+    validator = load({'items': schema})
+    errors = validator.iter_errors([{'foo': 1}, {'foo': 42}, {'foo': 'bar'}])
+    assert sorted(error.pointer for error in errors) == ['#/1/foo', '#/2/foo']
+    assert len(list(validator.iter_errors([{'foo': 42}] * 10, max_errors=4))) == 4  # noqa
+    assert not list(validator.iter_errors([{'foo': 1}]))
+
+
+draft03 = 'http://json-schema.org/draft-03/schema#'
+names = ['p%d' % i for i in range(1000)]
+
+
+@pytest.mark.parametrize('spec, schema, document', [
+    (None, {'required': names}, {}),
+    (None, {'dependencies': {'foo': names[:100]}}, {'foo': 1}),
+    (None, {'items': [{'type': 'string'}], 'additionalItems': False},
+     ['a'] + list(range(1000))),
+    (draft03, {'properties': dict((name, {'required': True})
+                                  for name in names)}, {}),
+    (draft03, {'items': [{'type': 'string'}], 'additionalItems': False},
+     ['a'] + list(range(1000))),
+])
+def test_max_errors_keywords(spec, schema, document):
+    validator = load(schema, spec=spec)
+    with pytest.raises(ValidationError) as info:
+        validator.validate(document, max_errors=3)
+    assert len(info.value.errors) <= 3
+    assert len(list(validator.iter_errors(document, max_errors=3))) <= 3
+
+
+def test_iter_errors_streams():
+    calls = []
+
+    def counted(obj):
+        calls.append(obj)
+        raise ValidationError('Forbidden value', obj)
+    factory = Factory(formats={'counted': counted})
+    validator = factory({'items': {'format': 'counted'}}, '#')
+    errors = validator.iter_errors(['foo'] * 1000)
+    assert not calls
+    assert next(errors).pointer == '#/0'
+    assert len(calls) == 1
+    assert len(list(errors)) == 999
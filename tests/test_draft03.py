@@ -62,3 +62,12 @@ def test_common(schema, description, data, valid, src):
         if valid:
             logger.exception(error)
             assert False, description
+
+
+@pytest.mark.parametrize('schema, description, data, valid, src', scenarios('draft3'))
+def test_is_valid(schema, description, data, valid, src):
+    try:
+        validator = load(schema, provider=provider, spec='http://json-schema.org/draft-03/schema#')
+        assert validator.is_valid(data) == valid, description
+    except CompilationError:
+        assert not valid, description
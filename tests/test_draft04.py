@@ -61,3 +61,11 @@ def test_common(schema, description, data, valid, src):
         if valid:
             logger.exception(error)
             assert False, description
+
+
+@pytest.mark.parametrize('schema, description, data, valid, src', scenarios('draft4'))
+def test_is_valid(schema, description, data, valid, src):
+    try:
+        assert load(schema, provider=provider).is_valid(data) == valid, description
+    except CompilationError:
+        assert not valid, description
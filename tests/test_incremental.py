@@ -0,0 +1,169 @@
+"""
+    tests.tests_incremental
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import json
+import pytest
+from jsonspec import operations
+from jsonspec.operations import Error, NonexistentTarget
+from jsonspec.operations.patch import UnknownOperation
+from jsonspec.validators import load, ValidationError
+from jsonspec.validators.incremental import revalidate
+from . import outcome
+
+draft03 = 'http://json-schema.org/draft-03/schema#'
+
+schema = {
+    'type': 'object',
+    'required': ['name', 'tags'],
+    'maxProperties': 6,
+    'properties': {
+        'name': {'type': 'string', 'minLength': 1},
+        'tags': {'type': 'array', 'items': {'type': 'string'},
+                 'uniqueItems': True, 'maxItems': 3},
+        'point': {'items': [{'type': 'integer'}, {'type': 'string'}],
+                  'additionalItems': False},
+        'owner': {'$ref': '#/definitions/person'},
+        'kind': {'enum': ['a', 'b']},
+        'extra': {'anyOf': [{'type': 'string'},
+                            {'properties': {'id': {'type': 'integer'}}}]},
+    },
+    'patternProperties': {'^x-': {'type': 'integer'}},
+    'additionalProperties': False,
+    'dependencies': {'kind': ['owner'], 'point': {'required': ['owner']}},
+    'definitions': {
+        'person': {
+            'type': 'object',
+            'required': ['id'],
+            'properties': {'id': {'type': 'integer'},
+                           'role': {'default': 'user'}},
+            'allOf': [{'properties': {'id': {'minimum': 1}}}],
+        },
+    },
+}
+
+document = {'name': 'foo', 'tags': ['a', 'b'], 'point': [1, 'a'],
+            'owner': {'id': 1}, 'x-count': 1}
+
+
+def apply(document, patch):
+    for operation in patch:
+        op, path = operation['op'], operation['path']
+        if op == 'add':
+            document = operations.add(document, path, operation['value'])
+        elif op == 'remove':
+            document = operations.remove(document, path)
+        elif op == 'replace':
+            document = operations.replace(document, path, operation['value'])
+        elif op == 'move':
+            document = operations.move(document, path, operation['from'])
+        elif op == 'copy':
+            document = operations.copy(document, path, operation['from'])
+    return document
+
+
+@pytest.mark.parametrize('options', [{}, {'lazy': True}])
+@pytest.mark.parametrize('patch', [
+    [],
+    [{'op': 'replace', 'path': '/name', 'value': ''}],
+    [{'op': 'replace', 'path': '/name', 'value': 'bar'}],
+    [{'op': 'remove', 'path': '/name'}],
+    [{'op': 'add', 'path': '/tags/-', 'value': 'a'}],
+    [{'op': 'add', 'path': '/tags/1', 'value': 1}],
+    [{'op': 'add', 'path': '/tags/0', 'value': 'c'},
+     {'op': 'add', 'path': '/tags/0', 'value': 'd'}],
+    [{'op': 'add', 'path': '/tags/0', 'value': 'c'},
+     {'op': 'replace', 'path': '/tags/2', 'value': 2},
+     {'op': 'remove', 'path': '/tags/0'}],
+    [{'op': 'add', 'path': '/point/-', 'value': 1}],
+    [{'op': 'add', 'path': '/point/0', 'value': 'a'}],
+    [{'op': 'remove', 'path': '/point/0'}],
+    [{'op': 'replace', 'path': '/owner/id', 'value': 0}],
+    [{'op': 'remove', 'path': '/owner/role'}],
+    [{'op': 'remove', 'path': '/owner/id'}],
+    [{'op': 'add', 'path': '/kind', 'value': 'c'}],
+    [{'op': 'add', 'path': '/kind', 'value': 'a'}],
+    [{'op': 'add', 'path': '/kind', 'value': 'a'},
+     {'op': 'add', 'path': '/x-foo', 'value': 2}],
+    [{'op': 'remove', 'path': '/owner'}],
+    [{'op': 'add', 'path': '/foo', 'value': 1}],
+    [{'op': 'add', 'path': '/x-foo', 'value': 'a'}],
+    [{'op': 'add', 'path': '/extra', 'value': {'id': 'a'}}],
+    [{'op': 'move', 'from': '/x-count', 'path': '/x-other'}],
+    [{'op': 'move', 'from': '/tags/0', 'path': '/tags/-'}],
+    [{'op': 'copy', 'from': '/name', 'path': '/x-name'}],
+    [{'op': 'copy', 'from': '/owner', 'path': '/owner/friend'},
+     {'op': 'replace', 'path': '/owner/friend/id', 'value': 'bar'}],
+    [{'op': 'test', 'path': '/name', 'value': 'foo'}],
+])
+def test_same_results(options, patch):
+    validator = load(schema, **options)
+    valid = validator.validate(document)
+    dumped = json.dumps([valid, patch], sort_keys=True)
+
+    expected = outcome(validator.validate, apply(valid, patch))
+    assert outcome(revalidate, validator, valid, patch) == expected
+    assert json.dumps([valid, patch], sort_keys=True) == dumped
+
+
+def test_only_changes_are_validated():
+    validator = load({'items': {'type': 'integer'}, 'uniqueItems': True})
+    # the document must be valid, and its old elements are not checked again
+    document = list(range(1000)) + ['foo']
+    assert revalidate(validator, document, [
+        {'op': 'replace', 'path': '/10', 'value': -1},
+    ])[10] == -1
+    with pytest.raises(ValidationError) as error:
+        revalidate(validator, document, [
+            {'op': 'replace', 'path': '/10', 'value': 'bar'},
+            {'op': 'add', 'path': '/-', 'value': 1},
+        ])
+    assert error.value.flatten() == {
+        '#/10': set(['Wrong type']),
+        '#/': set(['Elements must be unique']),
+    }
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('/0', [2, 3, 4]),
+    ('/2', [1, 2, 4]),
+])
+def test_root_removals(path, expected):
+    validator = load({'minItems': 3})
+    operation = {'op': 'remove', 'path': path}
+    with pytest.raises(ValidationError) as error:
+        revalidate(validator, [1, 2, 3], [operation])
+    assert error.value.flatten() == {'#/': set(['Too few elements'])}
+    assert revalidate(validator, [1, 2, 3, 4], [operation]) == expected
+
+
+def test_whole_document():
+    validator = load({'properties': {'foo': {'default': 42}}})
+    patch = [{'op': 'replace', 'path': '', 'value': {}}]
+    assert revalidate(validator, {'foo': 1}, patch) == {'foo': 42}
+
+
+def test_other_drafts():
+    validator = load({'properties': {'foo': {'required': True}}}, spec=draft03)
+    assert revalidate(validator, {'foo': 1}, [
+        {'op': 'add', 'path': '/bar', 'value': 2},
+    ]) == {'foo': 1, 'bar': 2}
+    with pytest.raises(ValidationError):
+        revalidate(validator, {'foo': 1}, [{'op': 'remove', 'path': '/foo'}])
+
+
+@pytest.mark.parametrize('operation, error', [
+    ({'op': 'remove', 'path': '/bar'}, NonexistentTarget),
+    ({'op': 'add', 'path': '/bar/baz', 'value': 1}, NonexistentTarget),
+    ({'op': 'add', 'path': '/foo/2', 'value': 1}, NonexistentTarget),
+    ({'op': 'test', 'path': '/foo/0', 'value': 2}, Error),
+    ({'op': 'remove', 'path': ''}, Error),
+    ({'op': 'frobnicate', 'path': '/foo'}, UnknownOperation),
+])
+def test_wrong_operations(operation, error):
+    document = {'foo': [1]}
+    with pytest.raises(error):
+        revalidate(load({}), document, [operation])
+    assert document == {'foo': [1]}
@@ -0,0 +1,87 @@
+"""
+    tests.tests_iterative
+    ~~~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import pytest
+from jsonspec.validators import load, ValidationError
+from jsonspec.validators.iterative import build
+from . import outcome
+
+draft03 = 'http://json-schema.org/draft-03/schema#'
+
+
+@pytest.mark.parametrize('schema, document', [
+    ({'properties': {'foo': {'default': 42}}}, {}),
+    ({'items': [{'type': 'string'}], 'additionalItems': False}, ['a', 1, 2]),
+    ({'items': {'properties': {'bar': {'minimum': 2}}}},
+     [{'bar': 1}, {'bar': 3}, {'bar': 0}]),
+    ({'allOf': [{'required': ['foo']}, {'properties': {'foo': {'type': 'string'}}}]},  # noqa
+     {'foo': 1}),
+    ({'properties': {'foo': {'oneOf': [{'type': 'string'}, {'minLength': 1}]}}},  # noqa
+     {'foo': 'bar'}),
+    ({'patternProperties': {'^a': {'type': 'integer'}},
+      'additionalProperties': {'type': 'string'}},
+     {'ab': 'c', 'b': 1, 'c': 'd'}),
+    ({'dependencies': {'foo': {'required': ['bar']}, 'baz': ['qux']}},
+     {'foo': 1, 'baz': 2}),
+    ({'not': {'anyOf': [{'type': 'integer'}, {'type': 'null'}]}}, None),
+])
+def test_draft04(schema, document):
+    validator = load(schema)
+    assert outcome(build(validator).validate, document) == \
+        outcome(validator.validate, document)
+
+
+@pytest.mark.parametrize('schema, document', [
+    ({'type': ['integer', {'properties': {'foo': {'type': 'string'}}}]},
+     {'foo': 1}),
+    ({'disallow': [{'type': 'string'}]}, 'foo'),
+    ({'extends': {'properties': {'foo': {'required': True}}}}, {}),
+    ({'items': [{'type': 'string'}], 'additionalItems': False}, ['a', 1]),
+    ({'properties': {'foo': {'properties': {'bar': {'type': 'null'}}}},
+      'additionalProperties': {'type': 'boolean'}},
+     {'foo': {'bar': 1}, 'baz': 2}),
+    ({'dependencies': {'foo': {'properties': {'bar': {'type': 'string'}}}}},
+     {'foo': 1, 'bar': 2}),
+])
+def test_draft03(schema, document):
+    validator = load(schema, spec=draft03)
+    assert outcome(build(validator).validate, document) == \
+        outcome(validator.validate, document)
+
+
+def test_deep_document():
+    validator = build(load({
+        'type': 'object',
+        'properties': {
+            'child': {'$ref': '#'},
+            'name': {'type': 'string', 'default': 'leaf'},
+        },
+    }))
+    document = {}
+    node = document
+    for i in range(5000):
+        node['child'] = {}
+        node = node['child']
+    node['name'] = 1
+
+    assert not validator.is_valid(document)
+    with pytest.raises(ValidationError) as info:
+        validator.validate(document)
+    pointer = '#/' + '/'.join(['child'] * 5000) + '/name'
+    assert list(info.value.flatten()) == [pointer]
+
+    node['name'] = 'foo'
+    validated = validator.validate(document)
+    assert validated['name'] == 'leaf'
+    assert 'name' not in document
+
+
+def test_max_errors():
+    validator = build(load({'items': {'type': 'string'}}))
+    with pytest.raises(ValidationError) as info:
+        validator.validate(list(range(100)), max_errors=3)
+    assert len(info.value.flatten()) == 3
+    assert len(list(validator.iter_errors(list(range(100)), max_errors=5))) == 5  # noqa
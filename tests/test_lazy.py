@@ -0,0 +1,96 @@
+"""
+    tests.tests_lazy
+    ~~~~~~~~~~~~~~~~
+
+"""
+
+import pytest
+from threading import Thread
+from jsonspec.validators import load, memory_report, LazyValidator
+from jsonspec.validators import CompilationError
+from jsonspec.validators.closures import build
+from jsonspec.validators.iterative import build as build_iterative
+from . import outcome
+
+schema = {
+    'definitions': {
+        'name': {'type': 'string', 'minLength': 1},
+    },
+    'properties': {
+        'foo': {
+            'properties': {
+                'bar': {'items': {'type': 'integer'}},
+                'baz': {'default': 42},
+            },
+        },
+        'qux': {
+            'oneOf': [
+                {'type': 'object', 'required': ['name'],
+                 'properties': {'name': {'$ref': '#/definitions/name'}}},
+                {'type': 'string'},
+            ],
+        },
+    },
+}
+
+
+def test_compiled_on_demand():
+    validator = load(schema, lazy=True)
+    foo = validator.attrs['properties']['foo']
+    assert isinstance(foo, LazyValidator)
+    nodes = memory_report(validator)['nodes']
+    assert nodes < memory_report(load(schema))['nodes']
+
+    validator.validate({'qux': 'quux'})
+    assert memory_report(validator)['nodes'] > nodes
+    assert not hasattr(foo, '_validator')
+
+    assert validator.validate({'foo': {}}) == {'foo': {'baz': 42}}
+    assert foo.validator.attrs['properties']['baz'].default == 42
+    assert not hasattr(foo.validator.attrs['properties']['bar'], '_validator')
+
+
+@pytest.mark.parametrize('engine', [lambda v: v, build, build_iterative])
+@pytest.mark.parametrize('document', [
+    {'foo': {'bar': [1, 2, 'a']}},
+    {'foo': {}, 'qux': {'name': ''}},
+    {'qux': {'name': 'quux'}},
+    {'qux': 12},
+])
+def test_same_results(engine, document):
+    expected = outcome(load(schema).validate, document)
+    assert outcome(engine(load(schema, lazy=True)).validate, document) == \
+        expected
+
+
+def test_threads():
+    validator = load({'items': {'properties': {'foo': {'type': 'integer'}}}},
+                     lazy=True)
+    results = []
+
+    def validate():
+        results.append(validator.is_valid([{'foo': 1}]))
+        results.append(validator.attrs['items'].validator)
+
+    threads = [Thread(target=validate) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results[::2] == [True] * 8
+    assert len(set(id(compiled) for compiled in results[1::2])) == 1
+
+
+def test_errors_are_deferred():
+    validator = load({'properties': {'foo': {'minLength': 'a'}}}, lazy=True)
+    assert validator.is_valid({'bar': 1})
+    with pytest.raises(CompilationError):
+        validator.is_valid({'foo': 'bar'})
+
+
+def test_identical_subschemas():
+    validator = load({'properties': {'foo': {'type': 'integer'},
+                                     'bar': {'type': 'integer'}}}, lazy=True)
+    validator.validate({'foo': 1, 'bar': 2})
+    properties = validator.attrs['properties']
+    assert properties['foo'].validator is properties['bar'].validator
@@ -0,0 +1,65 @@
+"""
+    tests.tests_memo
+    ~~~~~~~~~~~~~~~~
+
+"""
+
+import pytest
+from jsonspec.validators import load, ValidationContext, ValidationMemo
+from . import outcome
+
+draft03 = 'http://json-schema.org/draft-03/schema#'
+
+address = {
+    'type': 'object',
+    'properties': {
+        'city': {'type': 'string', 'minLength': 1},
+        'zip': {'type': 'string', 'pattern': '^[0-9]{5}$'},
+    },
+}
+
+
+@pytest.mark.parametrize('spec', [None, draft03])
+@pytest.mark.parametrize('document', [
+    [{'city': 'Paris', 'zip': '75001'}] * 3,
+    [{'city': 'Paris', 'zip': '75001'}, {'city': 'Paris', 'zip': '75001'},
+     {'city': '', 'zip': '75001'}, {'city': '', 'zip': '75001'}],
+    [{'city': 'Paris', 'zip': '7500'}] * 2 + [[], {'city': 'Paris'}],
+])
+def test_same_results(spec, document):
+    validator = load({'items': address}, spec=spec)
+    expected = outcome(validator.validate, document)
+    assert outcome(validator.validate, document, memo=100) == expected
+    assert outcome(validator.validate, document, memo=1) == expected
+    assert validator.is_valid(document, memo=100) == (expected[0] == 'valid')
+
+
+def test_repeated_subtrees():
+    validator = load({'items': {'properties': {'shipping': address,
+                                               'billing': address}}})
+    block = {'city': 'Paris', 'zip': '75001'}
+    document = [{'shipping': block, 'billing': dict(block)}
+                for i in range(10)]
+
+    memo = ValidationMemo(100)
+    context = ValidationContext(memo=memo)
+    assert validator.evaluate(document, '#', context) is document
+    assert not context.errors
+    # identical subschemas share their validator: the billing block of the
+    # first item is skipped, then the nine other items
+    assert memo.hits == 10
+
+    memo = ValidationMemo(1)
+    validator.evaluate(document, '#', ValidationContext(memo=memo))
+    assert len(memo.valid) == 1
+
+
+def test_defaults():
+    validator = load({'items': {'properties': {'currency': {'default': 'EUR'}}}})  # noqa
+    document = [{'price': 1}, {'price': 1}]
+    memo = ValidationMemo(100)
+    validated = validator.evaluate(document, '#', ValidationContext(memo=memo))
+    assert validated == [{'price': 1, 'currency': 'EUR'}] * 2
+    assert document == [{'price': 1}] * 2
+    assert memo.hits == 0
+    assert validator.validate(document, memo=100) == validated
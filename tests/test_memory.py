@@ -0,0 +1,102 @@
+"""
+    tests.tests_memory
+    ~~~~~~~~~~~~~~~~~~
+
+"""
+
+import pytest
+from jsonspec.validators import load, memory_report, ValidationError
+from jsonspec.validators.util import empty
+
+draft03 = 'http://json-schema.org/draft-03/schema#'
+
+
+@pytest.mark.parametrize('spec', [None, draft03])
+def test_slots(spec):
+    validator = load({'properties': {'foo': {'type': 'string'}}}, spec=spec)
+    subvalidator = validator.attrs['properties']['foo']
+    assert not hasattr(validator, '__dict__')
+    assert subvalidator.attrs['properties'] is empty
+    assert subvalidator.attrs['pattern_properties'] is empty
+    assert subvalidator.key_matcher is validator.key_matcher
+    other = load({'type': 'string'}, spec=spec)
+    assert other.type_matcher is subvalidator.type_matcher
+
+
+def test_empty():
+    with pytest.raises(TypeError):
+        empty['foo'] = 'bar'
+    with pytest.raises(TypeError):
+        empty.setdefault('foo', 'bar')
+    assert empty == {}
+
+
+def test_memory_report():
+    report = memory_report(load({'type': 'string'}))
+    assert report['nodes'] == 1
+    assert report['bytes'] == report['bytes_per_node'] > 0
+
+    schema = {'properties': {str(i): {'type': 'string', 'maxLength': i}
+                             for i in range(10)}}
+    report = memory_report(load(schema))
+    assert report['nodes'] == 11
+    assert report['reused'] == 0
+    assert report['bytes'] < 11 * memory_report(load({'type': 'string'}))['bytes']  # noqa
+
+
+def test_memory_report_references():
+    validator = load({
+        'definitions': {'foo': {'type': 'string'}},
+        'items': {'$ref': '#/definitions/foo'},
+    })
+    assert memory_report(validator)['nodes'] == 2
+    validator.validate(['bar'])
+    assert memory_report(validator)['nodes'] == 3
+
+
+def test_identical_subschemas():
+    item = {'type': 'object', 'properties': {'id': {'type': 'integer'}}}
+    validator = load({
+        'properties': dict(('prop%d' % i, dict(item)) for i in range(10)),
+        'items': [{'type': 'integer'}, item],
+    })
+    report = memory_report(validator)
+    assert report['nodes'] == 3
+    assert report['reused'] == 11
+    properties = validator.attrs['properties']
+    assert properties['prop0'] is properties['prop9']
+    assert validator.attrs['items'][1] is properties['prop0']
+    assert properties['prop0'].attrs['properties']['id'] \
+        is validator.attrs['items'][0]
+
+
+def test_located_subschemas():
+    # additionalItems errors are reported against their schema location
+    validator = load({'properties': {
+        'foo': {'items': [{}], 'additionalItems': False},
+        'bar': {'items': [{}], 'additionalItems': False},
+    }})
+    with pytest.raises(ValidationError) as info:
+        validator.validate({'foo': [1, 2], 'bar': [1, 2]})
+    assert info.value.flatten() == {
+        '#/foo/1': set(['Forbidden value']),
+        '#/bar/1': set(['Forbidden value']),
+    }
+
+
+def test_scoped_subschemas():
+    reference = {'properties': {'qux': {'$ref': '#/definitions/quux'}}}
+    validator = load({
+        'definitions': {'quux': {'type': 'integer'}},
+        'properties': {
+            'foo': dict(reference, id='http://example.com/foo.json'),
+            'bar': reference,
+        },
+    }, provider={
+        'http://example.com/foo.json': {
+            'definitions': {'quux': {'type': 'string'}},
+        },
+    })
+    assert validator.is_valid({'foo': {'qux': 'a'}, 'bar': {'qux': 1}})
+    assert not validator.is_valid({'foo': {'qux': 1}})
+    assert not validator.is_valid({'bar': {'qux': 'a'}})
@@ -0,0 +1,149 @@
+"""
+    tests.tests_optimize
+    ~~~~~~~~~~~~~~~~~~~~
+
+"""
+
+import json
+import pytest
+from jsonspec.validators import load, memory_report
+from jsonspec.validators import Draft04Validator
+from jsonspec.validators import draft03, draft04
+from jsonspec.reference import NotFound
+from . import outcome
+
+draft03_uri = 'http://json-schema.org/draft-03/schema#'
+
+
+@pytest.mark.parametrize('schema, expected', [
+    ({'allOf': [{}, {'$ref': '#/definitions/foo'}]},
+     {'$ref': '#/definitions/foo'}),
+    ({'id': 'foo.json', 'allOf': [{'title': 'foo'}, {'$ref': '#bar'}]},
+     {'id': 'foo.json', '$ref': '#bar'}),
+    ({'type': 'object', 'allOf': [{'required': ['foo']},
+                                  {'allOf': [{'required': ['bar']}]}]},
+     {'type': 'object', 'required': ['foo', 'bar']}),
+    ({'properties': {'foo': {'type': 'string'}, 'bar': {}},
+      'allOf': [{'properties': {'baz': {'type': 'null'}}}]},
+     {'properties': {'foo': {'type': 'string'}, 'baz': {'type': 'null'}}}),
+    ({'allOf': [{'type': 'string'}, {'type': 'integer', 'default': 1}]},
+     {'type': 'string', 'allOf': [{'type': 'integer'}]}),
+    ({'additionalProperties': False,
+      'allOf': [{'properties': {'foo': {'type': 'string'}}}]},
+     {'additionalProperties': False,
+      'allOf': [{'properties': {'foo': {'type': 'string'}}}]}),
+    ({'anyOf': [{'minLength': 1}], 'oneOf': [{'maxLength': 3}]},
+     {'minLength': 1, 'maxLength': 3}),
+    ({'anyOf': [{}, {'type': 'null'}], 'items': {'default': 1},
+      'additionalItems': False, 'dependencies': {'foo': {}}},
+     {}),
+    ({'minLength': 0, 'uniqueItems': False, 'additionalProperties': True,
+      'type': ['array', 'boolean', 'null', 'number', 'object', 'string']},
+     {}),
+    ({'minLength': 1, 'maxProperties': 0, 'uniqueItems': True},
+     {'minLength': 1, 'maxProperties': 0, 'uniqueItems': True}),
+    ({'$ref': '#/definitions/foo', 'allOf': [{}]},
+     {'$ref': '#/definitions/foo', 'allOf': [{}]}),
+    ({'id': 'http://example.com/base/',
+      'allOf': [{'id': 'http://example.com/', '$ref': 'foo.json'}]},
+     {'id': 'http://example.com/base/',
+      'allOf': [{'id': 'http://example.com/', '$ref': 'foo.json'}]}),
+    ({'exclusiveMaximum': True, 'allOf': [{'maximum': 3}]},
+     {'exclusiveMaximum': True, 'allOf': [{'maximum': 3}]}),
+])
+def test_draft04_passes(schema, expected):
+    dumped = json.dumps(schema, sort_keys=True)
+    assert draft04.compile.optimizer(schema) == expected
+    assert json.dumps(schema, sort_keys=True) == dumped
+
+
+@pytest.mark.parametrize('schema, expected', [
+    ({'extends': {'properties': {'foo': {'required': True}}}},
+     {'properties': {'foo': {'required': True}}}),
+    ({'required': True, 'extends': [{'required': True, 'type': 'string'}]},
+     {'required': True, 'type': 'string'}),
+    ({'type': ['string', 'any', {'type': 'null'}], 'minItems': 0}, {}),
+])
+def test_draft03_passes(schema, expected):
+    assert draft03.compile.optimizer(schema) == expected
+
+
+@pytest.mark.parametrize('spec, schema, documents', [
+    (None, {
+        'definitions': {'name': {'type': 'string', 'minLength': 1}},
+        'type': 'object',
+        'allOf': [
+            {},
+            {'required': ['name']},
+            {'properties': {'name': {'allOf': [{'$ref': '#/definitions/name'},
+                                               {'default': 'foo'}]}}},
+            {'properties': {'age': {'anyOf': [{'type': 'integer'}]}}},
+        ],
+        'properties': {'tags': {'default': []}},
+    }, [{}, {'name': ''}, {'name': 'foo', 'age': 'bar'}, {'name': 'foo'}]),
+    (draft03_uri, {
+        'extends': [{'properties': {'foo': {'required': True}}},
+                    {'type': 'object'}],
+        'additionalProperties': {'extends': {}},
+    }, [{}, {'foo': 1, 'bar': 2}, 12]),
+])
+def test_same_verdicts(spec, schema, documents):
+    validator = load(schema, spec=spec)
+    optimized = load(schema, spec=spec, optimize=True)
+    for document in documents:
+        # errors of merged subschemas are reported elsewhere
+        expected = outcome(validator.validate, document)
+        result = outcome(optimized.validate, document)
+        assert result[0] == expected[0]
+        if expected[0] == 'valid':
+            assert result == expected
+    assert memory_report(optimized)['nodes'] < memory_report(validator)['nodes']  # noqa
+
+
+@pytest.mark.parametrize('spec, schema, documents', [
+    (None, {'exclusiveMaximum': True, 'allOf': [{'maximum': 3}]},
+     [2, 3, 4]),
+    (None, {'minimum': 5, 'allOf': [{'exclusiveMinimum': True}]},
+     [4, 5, 6]),
+    (draft03_uri, {'maximum': 3, 'extends': {'exclusiveMaximum': True}},
+     [2, 3, 4]),
+])
+def test_same_verdicts_unmerged(spec, schema, documents):
+    validator = load(schema, spec=spec)
+    optimized = load(schema, spec=spec, optimize=True)
+    for document in documents:
+        assert outcome(optimized.validate, document) == \
+            outcome(validator.validate, document)
+
+
+def test_sibling_id_unmerged():
+    schema = {
+        'id': 'http://localhost:1234/sibling_id/base/',
+        'definitions': {
+            'foo': {'id': 'http://localhost:1234/sibling_id/foo.json',
+                    'type': 'string'},
+            'base_foo': {'id': 'foo.json', 'type': 'number'},
+        },
+        'allOf': [{'id': 'http://localhost:1234/sibling_id/',
+                   '$ref': 'foo.json'}],
+    }
+    # ids of definitions are not indexed, the reference is not resolved
+    for validator in (load(schema), load(schema, optimize=True)):
+        for document in ('a', 1):
+            with pytest.raises(NotFound):
+                validator.is_valid(document)
+
+
+def test_reference_chain():
+    validator = load({
+        'definitions': {
+            'foo': {'$ref': '#/definitions/bar'},
+            'bar': {'$ref': '#/definitions/baz'},
+            'baz': {'type': 'integer'},
+        },
+        'properties': {'foo': {'$ref': '#/definitions/foo'}},
+    })
+    reference = validator.attrs['properties']['foo']
+    assert isinstance(reference.validator, Draft04Validator)
+    assert reference.validator.attrs['type'] == ['integer']
+    assert not validator.is_valid({'foo': 'bar'})
@@ -6,7 +6,12 @@
 
 from jsonspec.validators.util import rfc3339_to_datetime, validate_email
 from jsonspec.validators.util import validate_ipv4, validate_hostname
-from jsonspec.validators.exceptions import ValidationError
+from jsonspec.validators.util import KeyMatcher, RegexCache, compile_regex
+from jsonspec.validators.util import Divisor, TypeMatcher, ValueSet, types_of
+from jsonspec.validators.util import has_duplicates
+from jsonspec.validators.exceptions import CompilationError, ValidationError
+from jsonspec.validators import load
+from decimal import Decimal
 from . import TestCase
 
 
@@ -51,3 +56,149 @@ class TestDates(TestCase):
             validate_email('example.com')
         with self.assertRaises(ValidationError):
             validate_email('127.0.0.1')
+
+
+class TestRegexes(TestCase):
+    def test_cache(self):
+        cache = RegexCache(maxsize=2)
+        regex = cache('^foo')
+        assert cache('^foo') is regex
+        assert cache(regex) is regex
+        cache('^bar')
+        cache('^baz')
+        assert len(cache) == 2
+        assert '^foo' not in cache.regexes
+
+    def test_invalid(self):
+        with self.assertRaises(CompilationError):
+            compile_regex('(')
+
+    def test_compile(self):
+        for spec in ('http://json-schema.org/draft-03/schema#',
+                     'http://json-schema.org/draft-04/schema#'):
+            with self.assertRaises(CompilationError):
+                load({'pattern': '('}, spec=spec)
+            with self.assertRaises(CompilationError):
+                load({'patternProperties': {'(': {}}}, spec=spec)
+            first = load({'pattern': '^[a-z]+$'}, spec=spec)
+            second = load({'pattern': '^[a-z]+$'}, spec=spec)
+            assert first.attrs['pattern'] is second.attrs['pattern']
+
+    def test_key_matcher(self):
+        matcher = KeyMatcher([(compile_regex('^x-'), 'ext'),
+                              (compile_regex('id$'), 'id')], maxsize=2)
+        assert matcher('x-id') == ('ext', 'id')
+        assert matcher('foo') == ()
+        assert matcher('x-foo') == ('ext',)
+        assert len(matcher.memo) <= 2
+
+    def test_overlapping_patterns(self):
+        validator = load({
+            'patternProperties': {
+                '^x-': {'type': 'integer'},
+                'id$': {'minimum': 10},
+            },
+            'additionalProperties': False,
+        })
+        assert validator.is_valid({'x-id': 12, 'id': 11, 'x-foo': 1})
+        assert not validator.is_valid({'x-id': 1})
+        assert not validator.is_valid({'x-id': 'foo'})
+        assert not validator.is_valid({'foo': 1})
+
+
+class TestDuplicates(TestCase):
+    def test_duplicates(self):
+        assert has_duplicates([{'a': 1, 'b': [1, 2]}, {'b': [1.0, 2], 'a': 1}])
+        assert has_duplicates([Decimal('1.10'), 1.1, Decimal('1.1')])
+        assert has_duplicates([1, 2, 1.0])
+        assert not has_duplicates([1, True, '1', [1], {'1': 1}])
+        assert not has_duplicates([0, False, None, [], {}])
+        assert not has_duplicates([[1, 2], [2, 1]])
+
+    def test_unique_items(self):
+        validator = load({'uniqueItems': True})
+        assert validator.is_valid([{'a': 1, 'b': 2}, {'a': 2, 'b': 1}])
+        assert not validator.is_valid([{'a': 1, 'b': 2}, {'b': 2, 'a': 1}])
+        assert not validator.is_valid([Decimal('2.5'), Decimal('2.50')])
+
+
+class TestValueSet(TestCase):
+    def test_lookup(self):
+        values = ValueSet(['foo', 1, None, 2.5, {'a': [1, 2]}, [True]])
+        assert 'foo' in values
+        assert 1.0 in values
+        assert Decimal('2.50') in values
+        assert None in values
+        assert {'a': [1.0, 2]} in values
+        assert [True] in values
+        assert True not in values
+        assert [1] not in values
+        assert {'a': [2, 1]} not in values
+        assert 'bar' not in values
+        assert list(values) == ['foo', 1, None, 2.5, {'a': [1, 2]}, [True]]
+
+    def test_enum(self):
+        validator = load({'enum': [1, 'foo', {'bar': 2}]})
+        assert validator.is_valid(1.0)
+        assert validator.is_valid({'bar': 2})
+        assert not validator.is_valid(True)
+        assert not validator.is_valid({'bar': 3})
+        assert not load({'enum': [False]}).is_valid(0)
+
+
+class TestDivisor(TestCase):
+    def test_divides(self):
+        divisor = Divisor(0.01)
+        assert divisor.divides(12)
+        assert divisor.divides(19.99)
+        assert divisor.divides(-0.07)
+        assert divisor.divides(Decimal('4.20'))
+        assert not divisor.divides(0.075)
+        assert not divisor.divides(0.1 + 0.2)
+        assert not divisor.divides(1e-20)
+        assert Divisor(3).divides(-9)
+        assert not Divisor(3).divides(10)
+        assert Divisor(0.5).divides(1e20)
+        assert not Divisor(2).divides(1e15 + 1)
+
+    def test_multiple_of(self):
+        validator = load({'items': {'multipleOf': 0.01}})
+        assert validator.is_valid([1, 0.5, 12.34])
+        assert not validator.is_valid([1, 0.5, 12.345])
+        draft03 = load({
+            '$schema': 'http://json-schema.org/draft-03/schema#',
+            'divisibleBy': 1.5,
+        })
+        assert draft03.is_valid(4.5)
+        assert not draft03.is_valid(4)
+
+
+class TestTypes(TestCase):
+    def test_matcher(self):
+        matcher = TypeMatcher(['integer', 'string'])
+        assert matcher.matches(12)
+        assert matcher.matches('foo')
+        assert not matcher.matches(True)
+        assert not matcher.matches(1.0)
+        assert not matcher.matches(None)
+        assert TypeMatcher(['number']).matches(Decimal('1.5'))
+        assert not TypeMatcher(['any']).matches(12)
+        assert TypeMatcher(['any'], wildcard='any').matches(object())
+
+    def test_subclasses(self):
+        class Mapping(dict):
+            pass
+        assert types_of(Mapping) == frozenset(['object'])
+        assert TypeMatcher(['object']).matches(Mapping())
+
+    def test_union(self):
+        validator = load({
+            '$schema': 'http://json-schema.org/draft-03/schema#',
+            'type': ['null', {'type': 'integer', 'minimum': 2}],
+            'disallow': [{'type': 'integer', 'maximum': 3}],
+        })
+        assert validator.is_valid(None)
+        assert validator.is_valid(4)
+        assert not validator.is_valid(3)
+        assert not validator.is_valid(1)
+        assert not validator.is_valid('foo')